@@ -0,0 +1,16 @@
+# Copyright (c) 2026, Kisan Warehouse and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+
+class CustomerPurchaseTotal(Document):
+	"""
+	Cumulative purchases from one customer in one fiscal year, for the
+	TDS section 194Q threshold.
+
+	Named "<customer>|<fiscal year>" and maintained by
+	kisan_warehouse.utils.purchase_ledger from Inward document events.
+	"""
+
+	pass
@@ -7,7 +7,8 @@ app_license = "mit"
 
 
 after_migrate = [
-    "kisan_warehouse.utils.workflow_cleanup.setup_workflows"
+    "kisan_warehouse.utils.workflow_cleanup.setup_workflows",
+    "kisan_warehouse.utils.report_filters.add_report_indexes"
 ]
 
 # Export Enhanced fixtures
@@ -181,6 +182,7 @@ fixtures = [
 # include js, css files in header of desk.html
 # app_include_css = "/assets/kisan_warehouse/css/kisan_warehouse.css"
 # app_include_js = "/assets/kisan_warehouse/js/kisan_warehouse.js"
+app_include_js = "/assets/kisan_warehouse/js/link_titles.js"
 
 # include js, css files in header of web template
 # web_include_css = "/assets/kisan_warehouse/css/kisan_warehouse.css"
@@ -199,6 +201,12 @@ fixtures = [
 # include js in doctype views
 # doctype_js = {"doctype" : "public/js/doctype.js"}
 # doctype_list_js = {"doctype" : "public/js/doctype_list.js"}
+doctype_list_js = {
+	"Inward": ["public/js/print_job.js", "public/js/inward_list.js"],
+	"Outward": "public/js/print_job.js",
+	"Inward Aawak": "public/js/print_job.js",
+	"Outward Jawak": "public/js/print_job.js",
+}
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
 # doctype_calendar_js = {"doctype" : "public/js/doctype_calendar.js"}
 
@@ -299,6 +307,53 @@ fixtures = [
 # 	}
 # }
 
+doc_events = {
+	"App Settings": {
+		"on_update": "kisan_warehouse.utils.rent_settings.clear_rent_settings_cache",
+	},
+	"Sauda": {
+		"before_insert": "kisan_warehouse.utils.invoice_number.before_insert",
+		"before_save": "kisan_warehouse.saudas.doctype.sauda.sauda.before_save",
+		"on_update": "kisan_warehouse.utils.report_cache.invalidate",
+		"on_cancel": "kisan_warehouse.utils.report_cache.invalidate",
+		"on_trash": "kisan_warehouse.utils.report_cache.invalidate",
+	},
+	"Inward": {
+		"before_insert": "kisan_warehouse.utils.invoice_number.before_insert",
+		"validate": "kisan_warehouse.utils.inward_calculations.validate",
+		"on_update": [
+			"kisan_warehouse.utils.stock_ledger.on_update",
+			"kisan_warehouse.utils.purchase_ledger.on_update",
+			"kisan_warehouse.utils.report_cache.invalidate",
+		],
+		"on_cancel": [
+			"kisan_warehouse.utils.stock_ledger.on_cancel",
+			"kisan_warehouse.utils.purchase_ledger.on_cancel",
+			"kisan_warehouse.utils.report_cache.invalidate",
+		],
+		"on_trash": [
+			"kisan_warehouse.utils.stock_ledger.on_trash",
+			"kisan_warehouse.utils.purchase_ledger.on_trash",
+			"kisan_warehouse.utils.report_cache.invalidate",
+		],
+	},
+	"Outward": {
+		"on_update": [
+			"kisan_warehouse.utils.stock_ledger.on_update",
+			"kisan_warehouse.utils.report_cache.invalidate",
+		],
+		"on_update_after_submit": "kisan_warehouse.utils.report_cache.invalidate",
+		"on_cancel": [
+			"kisan_warehouse.utils.stock_ledger.on_cancel",
+			"kisan_warehouse.utils.report_cache.invalidate",
+		],
+		"on_trash": [
+			"kisan_warehouse.utils.stock_ledger.on_trash",
+			"kisan_warehouse.utils.report_cache.invalidate",
+		],
+	},
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -320,6 +375,12 @@ fixtures = [
 # 	],
 # }
 
+scheduler_events = {
+	"daily": [
+		"kisan_warehouse.warehouse_rent.rent.run_rent_accrual",
+	],
+}
+
 # Testing
 # -------
 
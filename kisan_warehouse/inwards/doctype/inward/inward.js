@@ -50,74 +50,53 @@ frappe.ui.form.on('Debit Note', {
     }
 });
 
-function populateRealNames(frm) {
-    // Populate customer name
-    if (frm.doc.customer && !frm.doc.customer_name) {
-        frappe.call({
-            method: 'frappe.client.get_value',
-            args: {
-                doctype: 'Customer',
-                filters: { name: frm.doc.customer },
-                fieldname: 'customer_name'
-            },
-            callback: function(r) {
-                if (r.message && r.message.customer_name) {
-                    frm.set_value('customer_name', r.message.customer_name);
-                }
-            }
-        });
-    }
-    
-    // Populate broker name
-    if (frm.doc.broker && !frm.doc.broker_name) {
-        frappe.call({
-            method: 'frappe.client.get_value',
-            args: {
-                doctype: 'Broker',
-                filters: { name: frm.doc.broker },
-                fieldname: 'first_name'
-            },
-            callback: function(r) {
-                if (r.message && r.message.first_name) {
-                    frm.set_value('broker_name', r.message.first_name);
-                }
-            }
-        });
-    }
-    
-    // Populate warehouse name
-    if (frm.doc.warehouse && !frm.doc.warehouse_name) {
-        frappe.call({
-            method: 'frappe.client.get_value',
-            args: {
-                doctype: 'Warehouse',
-                filters: { name: frm.doc.warehouse },
-                fieldname: 'warehouse_name'
-            },
-            callback: function(r) {
-                if (r.message && r.message.warehouse_name) {
-                    frm.set_value('warehouse_name', r.message.warehouse_name);
-                }
-            }
-        });
+// Sauda prefill, customer, broker, App Settings and link titles in one call.
+// The promise is kept on the form and reused by every handler until another
+// Sauda is picked or another document is opened.
+function load_inward_form_data(frm, sauda) {
+    if (sauda || !frm._inward_form_data || frm._inward_form_data.docname !== frm.doc.name) {
+        let args = sauda ? { sauda: sauda } : {
+            customer: frm.doc.customer,
+            broker: frm.doc.broker,
+            warehouse: frm.doc.warehouse,
+            product: frm.doc.product
+        };
+        args.bill_date = frm.doc.bill_date;
+        
+        frm._inward_form_data = {
+            docname: frm.doc.name,
+            promise: frappe.xcall('kisan_warehouse.utils.inward_form.get_inward_form_data', args)
+                .then(function(data) {
+                    // Link fields show these titles without fetching them again
+                    kisan_warehouse.link_titles.add(data.titles);
+                    return data;
+                })
+        };
     }
     
-    // Populate product name
-    if (frm.doc.product && !frm.doc.product_name) {
-        frappe.call({
-            method: 'frappe.client.get_value',
-            args: {
-                doctype: 'Product',
-                filters: { name: frm.doc.product },
-                fieldname: 'product_name'
-            },
-            callback: function(r) {
-                if (r.message && r.message.product_name) {
-                    frm.set_value('product_name', r.message.product_name);
-                }
+    return frm._inward_form_data.promise;
+}
+
+function populateRealNames(frm) {
+    // The payload's titles are cached first, the form's other links come in one more request at most
+    load_inward_form_data(frm).then(function() {
+        return kisan_warehouse.link_titles.load_form(frm);
+    }).then(function(titles) {
+        let names = {
+            customer_name: ['Customer', frm.doc.customer],
+            broker_name: ['Broker', frm.doc.broker],
+            warehouse_name: ['Warehouse', frm.doc.warehouse],
+            product_name: ['Product', frm.doc.product]
+        };
+        
+        Object.keys(names).forEach(function(fieldname) {
+            let [doctype, name] = names[fieldname];
+            let title = name && titles[doctype] && titles[doctype][name];
+            if (title && !frm.doc[fieldname]) {
+                frm.set_value(fieldname, title);
             }
         });
-    }
+    });
 }
 
 function calculateDebitNoteValues(frm) {
@@ -131,37 +110,27 @@ function calculateDebitNoteValues(frm) {
     
     frm.set_value('debit_note_basic_value', basicValue);
     
-    // Get GST rates from App Settings
-    frappe.call({
-        method: 'frappe.client.get_value',
-        args: {
-            doctype: 'App Settings',
-            filters: { name: 'App Settings' },
-            fieldname: ['debit_note_cgst_rate', 'debit_note_sgst_rate', 'debit_note_igst_rate']
-        },
-        callback: function(r) {
-            if (r.message) {
-                let cgstRate = flt(r.message.debit_note_cgst_rate) || 0;
-                let sgstRate = flt(r.message.debit_note_sgst_rate) || 0;
-                let igstRate = flt(r.message.debit_note_igst_rate) || 0;
-                
-                // Determine which GST scenario to use based on current Inward record
-                let gstAmount = 0;
-                
-                if ((flt(frm.doc.cgst_amount) > 0) || (flt(frm.doc.sgst_amount) > 0)) {
-                    // Scenario 1: CGST + SGST (Intra-state)
-                    gstAmount = basicValue * (cgstRate + sgstRate) / 100;
-                } else if ((flt(frm.doc.cgst_amount) === 0) && (flt(frm.doc.sgst_amount) === 0) && (flt(frm.doc.igst_amount) > 0)) {
-                    // Scenario 2: IGST Only (Inter-state)
-                    gstAmount = basicValue * igstRate / 100;
-                }
-                
-                let netPayable = basicValue + gstAmount;
-                
-                frm.set_value('debit_note_gst_amount', gstAmount);
-                frm.set_value('debit_note_net_payable', netPayable);
-            }
+    // GST rates from App Settings
+    load_inward_form_data(frm).then(function(data) {
+        let cgstRate = flt(data.settings.debit_note_cgst_rate) || 0;
+        let sgstRate = flt(data.settings.debit_note_sgst_rate) || 0;
+        let igstRate = flt(data.settings.debit_note_igst_rate) || 0;
+        
+        // Determine which GST scenario to use based on current Inward record
+        let gstAmount = 0;
+        
+        if ((flt(frm.doc.cgst_amount) > 0) || (flt(frm.doc.sgst_amount) > 0)) {
+            // Scenario 1: CGST + SGST (Intra-state)
+            gstAmount = basicValue * (cgstRate + sgstRate) / 100;
+        } else if ((flt(frm.doc.cgst_amount) === 0) && (flt(frm.doc.sgst_amount) === 0) && (flt(frm.doc.igst_amount) > 0)) {
+            // Scenario 2: IGST Only (Inter-state)
+            gstAmount = basicValue * igstRate / 100;
         }
+        
+        let netPayable = basicValue + gstAmount;
+        
+        frm.set_value('debit_note_gst_amount', gstAmount);
+        frm.set_value('debit_note_net_payable', netPayable);
     });
 }
 
@@ -192,6 +161,7 @@ function calculate_and_update_debit_note(frm) {
     calculateDebitNoteValues(frm);
 }
 
-// Make the function available globally
+// Make the functions available globally (the Inward Client Scripts use them)
 window.calculate_and_update_debit_note = calculate_and_update_debit_note;
+window.load_inward_form_data = load_inward_form_data;
 
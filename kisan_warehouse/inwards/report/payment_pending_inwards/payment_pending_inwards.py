@@ -5,6 +5,10 @@ import frappe
 from frappe import _
 from frappe.utils import getdate, today, formatdate, flt
 
+from kisan_warehouse.utils.report_cache import cache_report
+from kisan_warehouse.utils.report_filters import get_date_condition
+
+@cache_report("Payment Pending Inwards")
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
@@ -120,14 +124,11 @@ def get_data(filters):
             i.arrival_date,
             i.net_total,
             COALESCE(i.total_amount_paid, 0) as total_amount_paid,
-            COALESCE(i.total_amount_pending, i.net_total) as total_amount_pending,
+            COALESCE(i.total_amount_pending, 0) as total_amount_pending,
             i.payment_due_date,
             COALESCE(i.inward_payment_status, 'pending') as inward_payment_status,
             DATEDIFF(CURDATE(), i.payment_due_date) as days_difference,
-            (SELECT ip.payment_note FROM `tabInward Payment` ip 
-             WHERE ip.parent = i.name 
-             ORDER BY ip.payment_date DESC 
-             LIMIT 1) as payment_notes,
+            i.last_payment_note as payment_notes,
             -- ADDED: Bank details for export (but not displayed in report)
             i.customer as customer_id,
             COALESCE(c.bank_account_name, '') as bank_account_name,
@@ -135,13 +136,12 @@ def get_data(filters):
             COALESCE(c.ifsc_code, '') as ifsc_code,
             COALESCE(c.bank_name, '') as bank_name
         FROM `tabInward` i
+        INNER JOIN `tabSauda` s ON i.sauda = s.name AND s.booking_type = 'Inward / Purchase'
         LEFT JOIN `tabCustomer` c ON i.customer = c.name
         LEFT JOIN `tabBroker` b ON i.broker = b.name  
         LEFT JOIN `tabProduct` p ON i.product = p.name
         LEFT JOIN `tabWarehouse` w ON i.warehouse = w.name
-        LEFT JOIN `tabSauda` s ON i.sauda = s.name
-        WHERE i.docstatus < 2 
-        AND s.booking_type = 'Inward / Purchase' {conditions}
+        WHERE i.docstatus < 2 {conditions}
         ORDER BY i.payment_due_date ASC, i.total_amount_pending DESC
     """.format(conditions=conditions)
     
@@ -150,16 +150,6 @@ def get_data(filters):
     
     # Process calculations and formatting
     for row in data:
-        # Handle null values
-        if not row.total_amount_paid:
-            row.total_amount_paid = 0
-            
-        if not row.total_amount_pending:
-            row.total_amount_pending = row.net_total
-            
-        # Calculate actual pending amount
-        row.total_amount_pending = flt(row.net_total - row.total_amount_paid, 2)
-        
         # CORRECT Days Logic (as you suggested)
         days_diff = row.days_difference
         if days_diff > 0:
@@ -221,11 +211,14 @@ def get_conditions(filters):
         conditions.append("i.warehouse = %(warehouse)s")
     
     # Payment due date range filters
-    if filters.get("payment_due_date_from"):
-        conditions.append("i.payment_due_date >= %(payment_due_date_from)s")
-    
-    if filters.get("payment_due_date_to"):
-        conditions.append("i.payment_due_date <= %(payment_due_date_to)s")
+    if filters.get("payment_due_date_from") or filters.get("payment_due_date_to"):
+        conditions.append(get_date_condition(
+            "i.payment_due_date",
+            filters.get("payment_due_date_from"),
+            filters.get("payment_due_date_to"),
+            filters,
+            key="due_date",
+        ))
     
     # Payment status filter (updated logic)
     if filters.get("payment_status"):
@@ -14,6 +14,12 @@ frappe.query_reports["Tally Inward Report"] = {
             "default": frappe.datetime.get_today(),
             "reqd": 1
         },
+        {
+            "fieldname": "company",
+            "label": __("Company"),
+            "fieldtype": "Link",
+            "options": "Company"
+        },
         {
             "fieldname": "customer",
             "label": __("Customer"),
@@ -70,6 +76,7 @@ frappe.query_reports["Tally Inward Report"] = {
             // Reset all filters to default values
             report.set_filter_value('from_date', frappe.datetime.add_months(frappe.datetime.get_today(), -1));
             report.set_filter_value('to_date', frappe.datetime.get_today());
+            report.set_filter_value('company', '');
             report.set_filter_value('customer', '');
             report.set_filter_value('warehouse', '');
             report.set_filter_value('product', '');
@@ -85,44 +92,53 @@ frappe.query_reports["Tally Inward Report"] = {
             });
         });
 
-        // Add Export to Tally button
-        report.page.add_inner_button(__("Export to Tally"), function() {
+        // Add Export to Tally buttons: the file is streamed by the server as a download
+        const export_to_tally = function(compress) {
             let filters = report.get_filter_values();
             if (!filters.from_date || !filters.to_date) {
                 frappe.msgprint(__('Please select From Date and To Date'));
                 return;
             }
 
-            frappe.show_alert({
-                message: __('Preparing Tally Export...'),
-                indicator: 'blue'
+            open_url_post('/api/method/kisan_warehouse.inwards.report.tally_inward_report.tally_inward_report.export_to_tally', {
+                filters: JSON.stringify(filters),
+                compress: compress ? 1 : 0
             });
+        };
 
-            frappe.call({
-                method: "kisan_warehouse.inwards.report.tally_inward_report.tally_inward_report.export_to_tally",
-                args: {
-                    filters: filters
-                },
-                callback: function(r) {
-                    if (r.message) {
-                        frappe.show_alert({
-                            message: __('Tally Export Ready!'),
-                            indicator: 'green'
-                        });
-                        
-                        // Create download link
-                        let a = document.createElement('a');
-                        a.href = 'data:text/csv;charset=utf-8,' + encodeURIComponent(r.message);
-                        a.download = 'tally_inward_export_' + frappe.datetime.get_today() + '.csv';
-                        a.click();
-                    }
-                },
-                error: function(r) {
-                    console.log("Export Error:", r);
-                    frappe.msgprint(__('Error generating Tally export. Please try again.'));
-                }
+        report.page.add_inner_button(__("CSV"), function() {
+            export_to_tally(false);
+        }, __("Export to Tally"));
+
+        report.page.add_inner_button(__("CSV (gzip)"), function() {
+            export_to_tally(true);
+        }, __("Export to Tally"));
+
+        // Tally XML vouchers, either for the filters or everything changed since the last export
+        const export_tally_xml = function(since_last_export) {
+            let filters = report.get_filter_values();
+            open_url_post('/api/method/kisan_warehouse.inwards.report.tally_inward_report.tally_inward_report.export_tally_xml', {
+                filters: JSON.stringify(filters),
+                since_last_export: since_last_export ? 1 : 0
             });
-        });
+        };
+
+        report.page.add_inner_button(__("Purchase Vouchers (XML)"), function() {
+            export_tally_xml(false);
+        }, __("Export to Tally"));
+
+        report.page.add_inner_button(__("Changes Since Last Export (XML)"), function() {
+            let company = report.get_filter_value('company');
+            frappe.confirm(
+                company
+                    ? __('Export Purchase vouchers of {0} created or changed since the last export? The date and other filters are ignored.', [frappe.utils.get_link_title('Company', company) || company])
+                    : __('Export Purchase vouchers of all companies created or changed since their last export? The date and other filters are ignored.'),
+                function() {
+                    export_tally_xml(true);
+                }
+            );
+        }, __("Export to Tally"));
+
 
         // Add Summary button
         report.page.add_inner_button(__("Show Summary"), function() {
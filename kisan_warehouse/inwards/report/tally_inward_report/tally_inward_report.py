@@ -1,7 +1,26 @@
+from itertools import groupby
+
 import frappe
 from frappe import _
-from frappe.utils import flt, getdate, formatdate, nowdate
+from frappe.utils import cint, flt, getdate, formatdate, now, nowdate
+
+from kisan_warehouse.utils.report_cache import cache_report
+from kisan_warehouse.utils.report_filters import get_date_condition
+from kisan_warehouse.utils.tally_export import (
+    TALLY_LEDGERS,
+    csv_download,
+    get_voucher_action,
+    get_watermark_join,
+    iter_deleted_vouchers,
+    iter_rows,
+    update_watermarks,
+    xml_download,
+)
+
+# Inwards take the Sauda's company when they have none of their own
+COMPANY_COLUMN = "COALESCE(NULLIF(i.company, ''), s.company)"
 
+@cache_report("Tally Inward Report")
 def execute(filters=None):
     """Main function to execute the report"""
     if not filters:
@@ -149,16 +168,24 @@ def get_columns():
 
 def get_data(filters):
     """Fetch and format data based on filters"""
+    query, values = get_query(filters)
+    return [format_row(row) for row in frappe.db.sql(query, values, as_dict=1)]
+
+def get_conditions(filters):
+    """WHERE conditions and their values for the report filters"""
     
     # Build WHERE conditions
     conditions = []
     values = []
     
     # Date filters
-    conditions.append("i.arrival_date BETWEEN %s AND %s")
-    values.extend([filters["from_date"], filters["to_date"]])
+    conditions.append(get_date_condition("i.arrival_date", filters["from_date"], filters["to_date"], values))
     
     # Optional filters
+    if filters.get("company"):
+        conditions.append(f"{COMPANY_COLUMN} = %s")
+        values.append(filters["company"])
+        
     if filters.get("customer"):
         conditions.append("i.customer = %s")
         values.append(filters["customer"])
@@ -179,6 +206,12 @@ def get_data(filters):
         conditions.append("i.inward_status = %s")
         values.append(filters["inward_status"])
     
+    return conditions, values
+
+def get_query(filters):
+    """Report query and its values for the filters"""
+    
+    conditions, values = get_conditions(filters)
     where_clause = " AND ".join(conditions)
     
     # SQL Query with proper COALESCE and formatting - Using actual GST amount fields
@@ -214,94 +247,247 @@ def get_data(filters):
             i.arrival_date DESC, i.name DESC
     """
     
-    data = frappe.db.sql(query, values, as_dict=1)
+    return query, values
+
+def format_row(row):
+    """Format one row for display and export"""
+    # Ensure numeric values are properly formatted
+    row['quantity'] = flt(row['quantity'], 2)
+    row['rate'] = flt(row['rate'], 2) 
+    row['amount'] = flt(row['amount'], 2)
+    row['cgst_percent'] = flt(row['cgst_percent'], 2)
+    row['cgst_amount'] = flt(row['cgst_amount'], 2)
+    row['sgst_percent'] = flt(row['sgst_percent'], 2)
+    row['sgst_amount'] = flt(row['sgst_amount'], 2)
+    row['igst_percent'] = flt(row['igst_percent'], 2)
+    row['igst_amount'] = flt(row['igst_amount'], 2)
     
-    # Format data for better display
-    formatted_data = []
-    for row in data:
-        # Ensure numeric values are properly formatted
-        row['quantity'] = flt(row['quantity'], 2)
-        row['rate'] = flt(row['rate'], 2) 
-        row['amount'] = flt(row['amount'], 2)
-        row['cgst_percent'] = flt(row['cgst_percent'], 2)
-        row['cgst_amount'] = flt(row['cgst_amount'], 2)
-        row['sgst_percent'] = flt(row['sgst_percent'], 2)
-        row['sgst_amount'] = flt(row['sgst_amount'], 2)
-        row['igst_percent'] = flt(row['igst_percent'], 2)
-        row['igst_amount'] = flt(row['igst_amount'], 2)
-        
-        # Clean up text fields and handle empty values
-        row['supplier_name'] = (row['supplier_name'] or '').strip().replace('  ', ' ')
-        row['customer_name'] = (row['customer_name'] or '').strip().replace('  ', ' ')
-        row['product_name'] = (row['product_name'] or '').strip()
-        row['supplier_account'] = (row['supplier_account'] or '').strip().replace('  ', ' ')
-        
-        # Ensure no empty strings become None
-        for key, value in row.items():
-            if value is None or value == '':
-                if key in ['quantity', 'rate', 'amount', 'cgst_percent', 'cgst_amount', 'sgst_percent', 'sgst_amount', 'igst_percent', 'igst_amount']:
-                    row[key] = 0.0
-                else:
-                    row[key] = ''
-        
-        formatted_data.append(row)
+    # Clean up text fields and handle empty values
+    row['supplier_name'] = (row['supplier_name'] or '').strip().replace('  ', ' ')
+    row['customer_name'] = (row['customer_name'] or '').strip().replace('  ', ' ')
+    row['product_name'] = (row['product_name'] or '').strip()
+    row['supplier_account'] = (row['supplier_account'] or '').strip().replace('  ', ' ')
+    
+    # Ensure no empty strings become None
+    for key, value in row.items():
+        if value is None or value == '':
+            if key in ['quantity', 'rate', 'amount', 'cgst_percent', 'cgst_amount', 'sgst_percent', 'sgst_amount', 'igst_percent', 'igst_amount']:
+                row[key] = 0.0
+            else:
+                row[key] = ''
     
-    return formatted_data
+    return row
+
+# Tally import columns: (CSV header, report fieldname) - EXACT Excel format
+TALLY_EXPORT_COLUMNS = [
+    ("Supplier A/c", "supplier_account"),
+    ("Supplier Name", "supplier_name"),
+    ("State Name", "state"),
+    ("GSTIN", "gstin"),
+    ("Customer Name", "customer_name"),
+    ("Voucher Type", "voucher_type"),
+    ("Product Name", "product_name"),
+    ("Quantity", "quantity"),
+    ("Rate", "rate"),
+    ("Amount", "amount"),
+    ("CGST %", "cgst_percent"),
+    ("CGST", "cgst_amount"),
+    ("SGST %", "sgst_percent"),
+    ("SGST", "sgst_amount"),
+    ("IGST %", "igst_percent"),
+    ("IGST", "igst_amount"),
+    ("Voucher No", "voucher_no"),
+    ("HSN", "hsn_code"),
+    ("UNIT", "uom"),
+]
 
 @frappe.whitelist()
-def export_to_tally(filters):
-    """Server-side method to export data for Tally"""
-    try:
-        # Convert string filters to dict if needed
-        if isinstance(filters, str):
-            import json
-            filters = json.loads(filters)
-        
-        # Get report data
-        columns, data = execute(filters)
-        
-        if not data:
-            frappe.throw(_("No data found for the selected filters"))
-        
-        # Create CSV content for Tally import
-        csv_content = []
-        
-        # Add headers - EXACT Excel format
-        headers = [
-            "Supplier A/c", "Supplier Name", "State Name", "GSTIN", "Customer Name", 
-            "Voucher Type", "Product Name", "Quantity", "Rate", "Amount",
-            "CGST %", "CGST", "SGST %", "SGST", "IGST %", "IGST",
-            "Voucher No", "HSN", "UNIT"
-        ]
-        csv_content.append(",".join(f'"{header}"' for header in headers))
-        
-        # Add data rows
-        for row in data:
-            csv_row = [
-                f'"{row.get("supplier_account", "")}"',
-                f'"{row.get("supplier_name", "")}"', 
-                f'"{row.get("state", "")}"',
-                f'"{row.get("gstin", "")}"',
-                f'"{row.get("customer_name", "")}"',
-                f'"{row.get("voucher_type", "")}"',
-                f'"{row.get("product_name", "")}"',
-                f'"{flt(row.get("quantity", 0), 2)}"',
-                f'"{flt(row.get("rate", 0), 2)}"',
-                f'"{flt(row.get("amount", 0), 2)}"',
-                f'"{flt(row.get("cgst_percent", 0), 2)}"',
-                f'"{flt(row.get("cgst_amount", 0), 2)}"',
-                f'"{flt(row.get("sgst_percent", 0), 2)}"',
-                f'"{flt(row.get("sgst_amount", 0), 2)}"',
-                f'"{flt(row.get("igst_percent", 0), 2)}"',
-                f'"{flt(row.get("igst_amount", 0), 2)}"',
-                f'"{row.get("voucher_no", "")}"',
-                f'"{row.get("hsn_code", "")}"',
-                f'"{row.get("uom", "")}"'
-            ]
-            csv_content.append(",".join(csv_row))
-        
-        return "\n".join(csv_content)
-        
-    except Exception as e:
-        frappe.log_error(f"Tally Export Error: {str(e)}")
-        frappe.throw(_("Error generating Tally export: {0}").format(str(e)))
\ No newline at end of file
+def export_to_tally(filters, compress=0):
+    """
+    Download the report as a CSV for Tally import (gzipped when compress is set).
+    Rows are streamed from the database into the file, so any date range exports in constant memory.
+    """
+    frappe.has_permission("Inward", "read", throw=True)
+    filters = get_export_filters(filters)
+
+    query, values = get_query(filters)
+    rows = (format_row(row) for row in iter_rows(query, values))
+
+    return csv_download(
+        rows,
+        TALLY_EXPORT_COLUMNS,
+        "tally_inward_export_" + nowdate(),
+        compress=cint(compress),
+    )
+
+@frappe.whitelist()
+def export_tally_xml(filters, since_last_export=0, compress=0):
+    """
+    Download Inwards as Tally Purchase vouchers in an XML import envelope.
+
+    With since_last_export set, only Inwards created or changed since the last such
+    export of their company are included (the date and other filters, apart from
+    Company, are ignored so nothing is skipped), deleted ones are sent as Cancel
+    vouchers, and the company's Tally Export Watermark is moved forward to just
+    before the start of this export.
+    """
+    frappe.has_permission("Inward", "read", throw=True)
+    filters = get_export_filters(filters)
+    since_last_export = cint(since_last_export)
+
+    as_of = now()
+    query, values = get_voucher_query(filters, as_of if since_last_export else None)
+
+    # Vouchers exported per company, seeded so an empty export still moves the watermark
+    voucher_counts = {filters["company"]: 0} if filters.get("company") else {}
+
+    def vouchers():
+        for name, rows in groupby(iter_rows(query, values), key=lambda row: row.name):
+            voucher = get_purchase_voucher(list(rows))
+            if voucher:
+                voucher_counts[voucher.company] = voucher_counts.get(voucher.company, 0) + 1
+                yield voucher
+
+        if since_last_export:
+            for voucher in iter_deleted_vouchers(
+                "Inward", "Purchase", as_of, ("bill_date", "arrival_date"), company=filters.get("company"), company_field="company"
+            ):
+                voucher_counts[voucher.company] = voucher_counts.get(voucher.company, 0) + 1
+                yield voucher
+
+    response = xml_download(
+        vouchers(),
+        "tally_purchase_vouchers_" + nowdate(),
+        company=frappe.db.get_value("Company", filters.get("company"), "company_name") if filters.get("company") else None,
+        compress=cint(compress),
+    )
+
+    if since_last_export:
+        update_watermarks("Purchase", voucher_counts, as_of)
+
+    return response
+
+def get_export_filters(filters):
+    """Export filters as a dict, with the same default dates as the report"""
+    # Convert string filters to dict if needed
+    if isinstance(filters, str):
+        import json
+        filters = json.loads(filters)
+
+    # Same defaults as the report
+    if not filters.get("from_date"):
+        filters["from_date"] = frappe.utils.add_months(nowdate(), -1)
+    if not filters.get("to_date"):
+        filters["to_date"] = nowdate()
+
+    return filters
+
+def get_voucher_query(filters, as_of=None):
+    """
+    One row per Inward item (one row for Inwards without items), grouped by Inward.
+    With as_of, the Inwards changed after their company's watermark up to as_of;
+    otherwise the Inwards matching the report filters.
+    """
+    if as_of:
+        conditions = ["i.modified > COALESCE(wm.last_exported_on, '2000-01-01')", "i.modified <= %s"]
+        values = [as_of]
+        if filters.get("company"):
+            conditions.append(f"{COMPANY_COLUMN} = %s")
+            values.append(filters["company"])
+    else:
+        conditions, values = get_conditions(filters)
+
+    query = f"""
+        SELECT
+            i.name, i.creation, i.modified, i.docstatus,
+            {COMPANY_COLUMN} as company,
+            COALESCE(i.bill_date, i.arrival_date) as voucher_date,
+            i.inward_invoice_no, i.vendor_doc_no,
+            TRIM(REPLACE(COALESCE(CONCAT(c.first_name, ' ', COALESCE(c.last_name, '')), c.first_name, ''), '  ', ' ')) as party,
+            COALESCE(c.gstin, '') as gstin,
+            COALESCE(c.state, 'Maharashtra') as state,
+            TRIM(COALESCE(p.product_name, '')) as product_name,
+            COALESCE(i.total_arrival_weight, 0) as total_arrival_weight,
+            COALESCE(i.total_amount, 0) as total_amount,
+            COALESCE(i.total_deductions, 0) as total_deductions,
+            COALESCE(i.cgst_amount, 0) as cgst_amount,
+            COALESCE(i.sgst_amount, 0) as sgst_amount,
+            COALESCE(i.igst_amount, 0) as igst_amount,
+            COALESCE(i.tcs_amount, 0) as tcs_amount,
+            COALESCE(i.tds_amount, 0) as tds_amount,
+            COALESCE(i.net_total, 0) as net_total,
+            wm.last_exported_on,
+            it.item_arrival_weight, it.item_rate, it.item_amount
+        FROM 
+            `tabInward` i
+        INNER JOIN `tabSauda` s ON i.sauda = s.name
+        LEFT JOIN `tabCustomer` c ON i.customer = c.name
+        LEFT JOIN `tabProduct` p ON i.product = p.name
+        LEFT JOIN `tabInward Item Detail` it
+            ON it.parent = i.name AND it.parenttype = 'Inward' AND it.parentfield = 'inward_items'
+        {get_watermark_join("Purchase", COMPANY_COLUMN)}
+        WHERE 
+            s.booking_type = 'Inward / Purchase' AND {" AND ".join(conditions)}
+        ORDER BY 
+            i.name, it.idx
+    """
+
+    return query, values
+
+def get_purchase_voucher(rows):
+    """
+    Purchase voucher of one Inward: the items are debited to Purchase with GST and TCS,
+    the supplier is credited the net total, deductions and TDS are credited to their
+    own ledgers and the rounding of the net total goes to Round Off.
+    """
+    inward = rows[0]
+    action = get_voucher_action(inward)
+
+    inventory = [
+        {
+            "stock_item": inward.product_name,
+            "quantity": row.item_arrival_weight,
+            "rate": flt(row.item_rate) / 100,
+            "amount": flt(row.item_amount, 2),
+            "ledger": TALLY_LEDGERS["purchase"],
+        }
+        for row in rows
+        if row.item_amount is not None
+    ] or [
+        {
+            "stock_item": inward.product_name,
+            "quantity": inward.total_arrival_weight,
+            "rate": flt(inward.total_amount) / flt(inward.total_arrival_weight) if flt(inward.total_arrival_weight) else 0,
+            "amount": flt(inward.total_amount, 2),
+            "ledger": TALLY_LEDGERS["purchase"],
+        }
+    ]
+
+    ledgers = [
+        (inward.party, -flt(inward.net_total, 2)),
+        (TALLY_LEDGERS["cgst"], flt(inward.cgst_amount, 2)),
+        (TALLY_LEDGERS["sgst"], flt(inward.sgst_amount, 2)),
+        (TALLY_LEDGERS["igst"], flt(inward.igst_amount, 2)),
+        (TALLY_LEDGERS["tcs"], flt(inward.tcs_amount, 2)),
+        (TALLY_LEDGERS["deductions"], -flt(inward.total_deductions, 2)),
+        (TALLY_LEDGERS["tds"], -flt(inward.tds_amount, 2)),
+    ]
+
+    # Whatever keeps debits and credits equal (the net total is rounded down)
+    balance = sum(item["amount"] for item in inventory) + sum(amount for ledger, amount in ledgers)
+    ledgers.append((TALLY_LEDGERS["round_off"], -flt(balance, 2)))
+
+    return frappe._dict(
+        name=inward.name,
+        company=inward.company,
+        voucher_type="Purchase",
+        action=action,
+        date=inward.voucher_date,
+        voucher_number=inward.inward_invoice_no or inward.name,
+        reference=cint(inward.vendor_doc_no) or None,
+        party=inward.party,
+        party_gstin=inward.gstin,
+        state=inward.state,
+        inventory=inventory,
+        ledgers=ledgers,
+    )
@@ -142,18 +142,19 @@ frappe.ui.form.on('Outward', {
     // Auto-populate fields when Sauda is selected
     sauda: function (frm) {
         if (frm.doc.sauda) {
-            // Use frappe.db.get_doc to fetch complete Sauda document
-            frappe.db.get_doc('Sauda', frm.doc.sauda)
-                .then(function (sauda_doc) {
+            // Sauda header, remaining quantity, broker commission, link titles
+            // and item rows come back from one call
+            load_outward_prefill(frm, true)
+                .then(function (data) {
                     // Manually set values to ensure proper population
-                    frm.set_value('customer', sauda_doc.customer);
-                    frm.set_value('warehouse', sauda_doc.warehouse);
-                    frm.set_value('product', sauda_doc.product);
-                    frm.set_value('broker', sauda_doc.broker || '');
+                    frm.set_value('customer', data.sauda.customer);
+                    frm.set_value('warehouse', data.sauda.warehouse);
+                    frm.set_value('product', data.sauda.product);
+                    frm.set_value('broker', data.sauda.broker);
 
                     // Auto-populate payment due date from Sauda payment_end_date
-                    if (sauda_doc.payment_end_date) {
-                        frm.set_value('payment_due_date', sauda_doc.payment_end_date);
+                    if (data.sauda.payment_due_date) {
+                        frm.set_value('payment_due_date', data.sauda.payment_due_date);
                     }
 
                     // Refresh fields after setting values
@@ -161,11 +162,11 @@ frappe.ui.form.on('Outward', {
                         refreshAllLinkFields(frm);
 
                         // Pre-fill child table
-                        prefill_outward_items(frm, sauda_doc);
+                        prefill_outward_items(frm, data.items);
 
                         // Auto-populate broker commission
-                        if (sauda_doc.broker) {
-                            populate_broker_commission(frm, sauda_doc.broker);
+                        if (data.sauda.broker) {
+                            populate_broker_commission(frm, data.sauda.broker);
                         } else {
                             // If no broker, set commission to 0
                             frm.set_value('broker_commission_percent', 0);
@@ -245,12 +246,16 @@ frappe.ui.form.on('Outward Payment', {
 // Helper Functions
 
 function refreshAllLinkFields(frm) {
-    // Refresh all link fields to display actual names
-    frm.refresh_field('sauda');
-    frm.refresh_field('customer');
-    frm.refresh_field('warehouse');
-    frm.refresh_field('product');
-    frm.refresh_field('broker');
+    // Titles of all links come from the shared cache, fetched in one request when missing
+    kisan_warehouse.link_titles.load_form(frm).then(function () {
+        frm.refresh_field('sauda');
+        frm.refresh_field('customer');
+        frm.refresh_field('warehouse');
+        frm.refresh_field('product');
+        frm.refresh_field('broker');
+    });
+
+    // Refresh the other fields right away
     frm.refresh_field('vehicle');
     frm.refresh_field('outward_items');
     frm.refresh_field('net_total');
@@ -263,24 +268,29 @@ function refreshAllLinkFields(frm) {
     frm.refresh_field('outward_payments');
 }
 
-function prefill_outward_items(frm, sauda_doc) {
+function prefill_outward_items(frm, items) {
     // Clear existing items
     frm.clear_table('outward_items');
 
-    // Add one row with Sauda data
-    let child = frm.add_child('outward_items');
-    child.item_gross_weight = sauda_doc.expected_quantity || sauda_doc.pending_quantity || 0;
-    child.item_rate = sauda_doc.sauda_rate || 0;
-    child.item_bags = 0; // User needs to enter this
+    // Add the suggested rows (the Sauda's remaining quantity at the Sauda rate)
+    let children = (items || []).map(function (item) {
+        let child = frm.add_child('outward_items');
+        child.item_gross_weight = item.item_gross_weight;
+        child.item_rate = item.item_rate;
+        child.item_bags = item.item_bags; // User needs to enter this
+        return child;
+    });
 
     // Refresh the child table
     frm.refresh_field('outward_items');
 
-    // Calculate item amount for the new row
+    // Calculate item amount for the new rows
     setTimeout(function () {
-        if (child.name) {
-            calculate_item_amount(frm, child.doctype, child.name);
-        }
+        children.forEach(function (child) {
+            if (child.name) {
+                calculate_item_amount(frm, child.doctype, child.name);
+            }
+        });
     }, 200);
 }
 
@@ -291,20 +301,16 @@ function populate_broker_commission(frm, broker_name) {
         return;
     }
 
-    frappe.db.get_doc('Broker', broker_name)
-        .then(function (broker_doc) {
-            let commission_rate = 0;
-
-            // Try different possible field names for commission
-            if (broker_doc.commission_rate) {
-                commission_rate = broker_doc.commission_rate;
-            } else if (broker_doc.commission_percent) {
-                commission_rate = broker_doc.commission_percent;
-            } else if (broker_doc.default_commission_percent) {
-                commission_rate = broker_doc.default_commission_percent;
-            } else if (broker_doc.commission) {
-                commission_rate = broker_doc.commission;
-            }
+    // The Sauda's own broker comes with the prefill, any other one is fetched
+    let commission = frm.doc.sauda
+        ? load_outward_prefill(frm).then(function (data) {
+            return data.sauda.broker === broker_name ? data.broker : get_broker_commission(broker_name);
+        })
+        : get_broker_commission(broker_name);
+
+    commission
+        .then(function (broker) {
+            let commission_rate = (broker && broker.commission_rate) || 0;
 
             frm.set_value('broker_commission_percent', commission_rate);
             calculate_broker_commission(frm);
@@ -316,6 +322,35 @@ function populate_broker_commission(frm, broker_name) {
         });
 }
 
+function get_broker_commission(broker_name) {
+    return frappe.db.get_value('Broker', broker_name, 'commission_rate').then(function (r) {
+        return r.message;
+    });
+}
+
+// Sauda header, remaining quantity, broker commission defaults, link titles and
+// suggested item rows from one call. The promise is kept on the form and reused
+// until another Sauda is picked (reload) or another document is opened.
+function load_outward_prefill(frm, reload) {
+    let key = frm.doc.name + '|' + frm.doc.sauda;
+
+    if (reload || !frm._outward_prefill || frm._outward_prefill.key !== key) {
+        frm._outward_prefill = {
+            key: key,
+            promise: frappe.xcall('kisan_warehouse.outwards.doctype.outward.outward.get_outward_prefill', {
+                sauda: frm.doc.sauda,
+                outward: frm.is_new() ? null : frm.doc.name
+            }).then(function (data) {
+                // Link fields show these titles without fetching them again
+                kisan_warehouse.link_titles.add(data.titles);
+                return data;
+            })
+        };
+    }
+
+    return frm._outward_prefill.promise;
+}
+
 function calculate_item_amount(frm, cdt, cdn) {
     let row = locals[cdt][cdn];
 
@@ -343,11 +378,15 @@ function calculate_item_amount(frm, cdt, cdn) {
 
 function calculate_net_total(frm) {
     let net_total = 0;
+    let total_quantity = 0;
+    let weighted_amount = 0;
 
     // Loop through all rows in outward_items child table
     if (frm.doc.outward_items && frm.doc.outward_items.length > 0) {
         frm.doc.outward_items.forEach(function (row) {
             net_total += flt(row.item_amount) || 0;
+            total_quantity += flt(row.item_gross_weight) || 0;
+            weighted_amount += (flt(row.item_gross_weight) || 0) * (flt(row.item_rate) || 0);
         });
     }
 
@@ -357,6 +396,10 @@ function calculate_net_total(frm) {
     // Set net total
     frm.set_value('net_total', net_total);
 
+    // Same totals the server keeps on save (Outward.set_totals)
+    frm.set_value('total_quantity', total_quantity);
+    frm.set_value('weighted_rate', total_quantity ? weighted_amount / total_quantity : 0);
+
     // Trigger broker commission and payment pending calculations
     calculate_broker_commission(frm);
     calculate_payment_pending(frm);
@@ -468,50 +511,40 @@ function clearForm(frm) {
 function calculate_remaining_and_add_row(frm) {
     if (!frm.doc.sauda) return;
 
-    frappe.call({
-        method: 'frappe.client.get',
-        args: {
-            doctype: 'Sauda',
-            name: frm.doc.sauda
-        },
-        callback: function (r) {
-            if (r.message) {
-                let expected_qty = r.message.expected_quantity;
-                let total_in_rows = 0;
+    load_outward_prefill(frm).then(function (data) {
+        let total_in_rows = 0;
 
-                // Calculate total from all rows
-                if (frm.doc.outward_items) {
-                    frm.doc.outward_items.forEach(item => {
-                        total_in_rows += flt(item.item_gross_weight) || 0;
-                    });
-                }
+        // Calculate total from all rows
+        if (frm.doc.outward_items) {
+            frm.doc.outward_items.forEach(item => {
+                total_in_rows += flt(item.item_gross_weight) || 0;
+            });
+        }
 
-                let remaining = expected_qty - total_in_rows;
-
-                // If there's remaining quantity and last row is filled
-                if (remaining > 0) {
-                    let last_row = frm.doc.outward_items ? frm.doc.outward_items[frm.doc.outward_items.length - 1] : null;
-
-                    // Only auto-add if last row has weight entered
-                    if (last_row && flt(last_row.item_gross_weight) > 0) {
-                        // Check if there's already an empty row at the end
-                        let has_empty_row = frm.doc.outward_items.some(item =>
-                            !item.item_gross_weight || item.item_gross_weight === 0
-                        );
-
-                        if (!has_empty_row) {
-                            let new_row = frm.add_child('outward_items');
-                            new_row.item_gross_weight = remaining;
-                            new_row.item_rate = r.message.sauda_rate || 0;
-                            new_row.item_bags = 0;
-                            frm.refresh_field('outward_items');
-
-                            // Calculate amount for new row
-                            frappe.model.set_value(new_row.doctype, new_row.name, 'item_amount',
-                                (remaining / 100) * (new_row.item_rate || 0)
-                            );
-                        }
-                    }
+        let remaining = data.remaining_quantity - total_in_rows;
+
+        // If there's remaining quantity and last row is filled
+        if (remaining > 0) {
+            let last_row = frm.doc.outward_items ? frm.doc.outward_items[frm.doc.outward_items.length - 1] : null;
+
+            // Only auto-add if last row has weight entered
+            if (last_row && flt(last_row.item_gross_weight) > 0) {
+                // Check if there's already an empty row at the end
+                let has_empty_row = frm.doc.outward_items.some(item =>
+                    !item.item_gross_weight || item.item_gross_weight === 0
+                );
+
+                if (!has_empty_row) {
+                    let new_row = frm.add_child('outward_items');
+                    new_row.item_gross_weight = remaining;
+                    new_row.item_rate = data.sauda.sauda_rate || 0;
+                    new_row.item_bags = 0;
+                    frm.refresh_field('outward_items');
+
+                    // Calculate amount for new row
+                    frappe.model.set_value(new_row.doctype, new_row.name, 'item_amount',
+                        (remaining / 100) * (new_row.item_rate || 0)
+                    );
                 }
             }
         }
@@ -528,42 +561,29 @@ function validate_sauda_quantity(frm) {
         });
     }
 
+    // Fresh figures (not the form's cached prefill), other Outwards may have been saved since
     frappe.call({
-        method: 'kisan_warehouse.outwards.doctype.outward.outward.get_sauda_dispatched_quantity',
+        method: 'kisan_warehouse.outwards.doctype.outward.outward.get_outward_prefill',
         args: {
-            sauda_name: frm.doc.sauda,
-            exclude_outward: frm.doc.name
+            sauda: frm.doc.sauda,
+            outward: frm.is_new() ? null : frm.doc.name
         },
         async: false,
         callback: function (r) {
-            if (r.message !== undefined) {
-                let already_dispatched = r.message;
-
-                frappe.call({
-                    method: 'frappe.client.get_value',
-                    args: {
-                        doctype: 'Sauda',
-                        filters: { name: frm.doc.sauda },
-                        fieldname: 'expected_quantity'
-                    },
-                    async: false,
-                    callback: function (resp) {
-                        if (resp.message) {
-                            let expected = resp.message.expected_quantity;
-                            let total = already_dispatched + current_total;
-
-                            // Allow small tolerance
-                            if (total > expected + 0.01) {
-                                frappe.msgprint({
-                                    title: __('Quantity Limit Exceeded'),
-                                    message: __('Total quantity ({0} kg) exceeds Sauda limit ({1} kg)', [total, expected]),
-                                    indicator: 'red'
-                                });
-                                frappe.validated = false;
-                            }
-                        }
-                    }
-                });
+            if (r.message) {
+                let expected = r.message.sauda.expected_quantity;
+                let already_dispatched = expected - r.message.remaining_quantity;
+                let total = already_dispatched + current_total;
+
+                // Allow small tolerance
+                if (total > expected + 0.01) {
+                    frappe.msgprint({
+                        title: __('Quantity Limit Exceeded'),
+                        message: __('Total quantity ({0} kg) exceeds Sauda limit ({1} kg)', [total, expected]),
+                        indicator: 'red'
+                    });
+                    frappe.validated = false;
+                }
             }
         }
     });
@@ -3,24 +3,45 @@
 
 import frappe
 from frappe.model.document import Document
+from frappe.utils import flt, getdate
+
+from kisan_warehouse.saudas.doctype.sauda.sauda import lock_sauda, update_dispatched_quantity
+from kisan_warehouse.utils.link_titles import get_doc_link_titles
 
 class Outward(Document):
     def validate(self):
+        self.set_totals()
+        self.set_payment_summary()
         self.validate_sauda_quantity()
 
+    def on_update(self):
+        self.update_sauda_dispatched_quantity()
+
+    def on_cancel(self):
+        update_dispatched_quantity(self.sauda, -self.get_dispatch_quantity())
+
+    def on_trash(self):
+        # Cancelled Outwards were already taken off the Sauda in on_cancel
+        if self.docstatus < 2:
+            update_dispatched_quantity(self.sauda, -self.get_dispatch_quantity())
+
     def validate_sauda_quantity(self):
         """Validate that total quantity doesn't exceed Sauda expected quantity"""
         if not self.sauda:
             return
             
-        sauda = frappe.get_doc('Sauda', self.sauda)
-        expected_qty = sauda.expected_quantity
+        # Lock the Sauda row so concurrent Outwards against it are checked one at a time
+        sauda = lock_sauda(self.sauda)
+        if not sauda:
+            return
+
+        expected_qty = flt(sauda.expected_quantity)
         
         # Calculate current outward total
-        current_total = sum([item.item_gross_weight for item in self.outward_items])
+        current_total = self.get_dispatch_quantity()
         
-        # Get already dispatched quantity (excluding current doc)
-        already_dispatched = get_sauda_dispatched_quantity(self.sauda, self.name)
+        # Get already dispatched quantity (excluding what this doc had posted before)
+        already_dispatched = flt(sauda.dispatched_quantity) - self.get_posted_quantity(self.sauda)
         
         # Total = already dispatched + current
         total_quantity = already_dispatched + current_total
@@ -45,6 +66,63 @@ class Outward(Document):
                 )
             )
 
+    def update_sauda_dispatched_quantity(self):
+        """Move this Outward's quantity on the Sauda from the saved version to the current one"""
+        previous = self.get_doc_before_save()
+        if previous and previous.docstatus < 2:
+            update_dispatched_quantity(previous.sauda, -previous.get_dispatch_quantity())
+
+        update_dispatched_quantity(self.sauda, self.get_dispatch_quantity())
+
+    def set_totals(self):
+        """Total quantity and gross-weight weighted rate, kept on the header for reports"""
+        self.total_quantity = self.get_dispatch_quantity()
+        self.weighted_rate = (
+            sum(flt(item.item_gross_weight) * flt(item.item_rate) for item in self.outward_items) / self.total_quantity
+            if self.total_quantity else 0
+        )
+
+    def set_payment_summary(self):
+        """
+        Paid and pending amounts and payment status from successful Outward Payment
+        rows (same rules as the form), the latest successful payment date and the
+        note of the latest payment row whatever its status
+        """
+        net_total = flt(self.net_total)
+        successful = [
+            payment for payment in self.outward_payments
+            if payment.payment_status == 'success' and flt(payment.payment_amount)
+        ]
+
+        self.total_amount_paid = flt(sum(flt(payment.payment_amount) for payment in successful), 2)
+        self.total_amount_pending = max(flt(net_total - self.total_amount_paid, 2), 0)
+
+        if net_total and self.total_amount_paid > 0:
+            self.payment_status = 'success' if not self.total_amount_pending else 'processing'
+        else:
+            self.payment_status = 'pending'
+
+        dated = [payment for payment in successful if payment.payment_date]
+        self.last_payment_date = max(getdate(payment.payment_date) for payment in dated) if dated else None
+
+        latest_payment = None
+        for payment in self.outward_payments:
+            if payment.payment_date and (
+                not latest_payment or getdate(payment.payment_date) >= getdate(latest_payment.payment_date)
+            ):
+                latest_payment = payment
+        self.last_payment_note = latest_payment.notes if latest_payment else None
+
+    def get_dispatch_quantity(self):
+        return sum(flt(item.item_gross_weight) for item in self.outward_items)
+
+    def get_posted_quantity(self, sauda_name):
+        """Quantity this Outward already contributes to the given Sauda's dispatched quantity"""
+        previous = self.get_doc_before_save()
+        if previous and previous.docstatus < 2 and previous.sauda == sauda_name:
+            return previous.get_dispatch_quantity()
+        return 0.0
+
 @frappe.whitelist()
 def get_sauda_dispatched_quantity(sauda_name, exclude_outward=None):
     """
@@ -57,28 +135,140 @@ def get_sauda_dispatched_quantity(sauda_name, exclude_outward=None):
     Returns:
         Float: Total gross weight dispatched
     """
-    filters = {
-        'sauda': sauda_name,
-        'docstatus': ['in', [0, 1]]  # Draft and Submitted
+    total_dispatched = flt(frappe.db.get_value("Sauda", sauda_name, "dispatched_quantity"))
+    return total_dispatched - get_outward_quantity(exclude_outward, sauda_name)
+
+@frappe.whitelist()
+def get_outward_prefill(sauda, outward=None):
+    """
+    Everything the form fills in when a Sauda is picked, in one call, read from
+    the quantities kept on the Sauda and Outward headers
+
+    Args:
+        sauda: Name of the Sauda
+        outward: Current Outward, whose own quantity still counts as remaining
+
+    Returns:
+        dict: sauda (header values for the form), remaining_quantity,
+            broker (commission defaults), titles ({doctype: {name: title}},
+            for the links the user's User Permissions allow) and items
+            (suggested Outward Item Detail rows)
+    """
+    frappe.has_permission("Sauda", "read", sauda, throw=True)
+
+    values = frappe.db.get_value(
+        "Sauda",
+        sauda,
+        ["customer", "warehouse", "product", "broker", "payment_end_date",
+         "expected_quantity", "pending_quantity", "sauda_rate"],
+        as_dict=True,
+    )
+    if not values:
+        frappe.throw(frappe._("Sauda {0} not found").format(sauda))
+
+    remaining_quantity = max(flt(values.pending_quantity) + get_outward_quantity(outward, sauda), 0)
+
+    broker = {"commission_rate": 0}
+    if values.broker:
+        broker["commission_rate"] = flt(frappe.db.get_value("Broker", values.broker, "commission_rate"))
+
+    return {
+        "sauda": {
+            "customer": values.customer,
+            "warehouse": values.warehouse,
+            "product": values.product,
+            "broker": values.broker or "",
+            "payment_due_date": values.payment_end_date,
+            "expected_quantity": flt(values.expected_quantity),
+            "sauda_rate": flt(values.sauda_rate),
+        },
+        "remaining_quantity": remaining_quantity,
+        "broker": broker,
+        "titles": get_doc_link_titles("Outward", values, check_permissions=True),
+        "items": get_suggested_items(remaining_quantity, values.sauda_rate),
     }
-    
-    if exclude_outward:
-        filters['name'] = ['!=', exclude_outward]
-    
-    outwards = frappe.get_all('Outward', filters=filters, fields=['name'])
-    
-    if not outwards:
+
+def get_suggested_items(remaining_quantity, rate):
+    """One row for the whole remaining quantity at the Sauda rate; bags are left to the user"""
+    if remaining_quantity <= 0:
+        return []
+
+    return [
+        {
+            "item_gross_weight": remaining_quantity,
+            "item_rate": flt(rate),
+            "item_bags": 0,
+            "item_amount": flt(remaining_quantity / 100 * flt(rate), 2),
+        }
+    ]
+
+def get_outward_quantity(outward, sauda_name):
+    """Quantity a saved, uncancelled Outward contributes to the Sauda's dispatched quantity"""
+    if not outward:
         return 0.0
-        
-    total_dispatched = 0.0
-    for outward in outwards:
-        items_weight = frappe.db.sql("""
-            SELECT sum(item_gross_weight) 
-            FROM `tabOutward Item Detail` 
-            WHERE parent = %s
-        """, (outward.name))
-        
-        if items_weight and items_weight[0][0]:
-            total_dispatched += items_weight[0][0]
-    
-    return total_dispatched
\ No newline at end of file
+
+    return flt(
+        frappe.db.get_value(
+            "Outward",
+            {"name": outward, "sauda": sauda_name, "docstatus": ("<", 2)},
+            "total_quantity",
+        )
+    )
+
+def rebuild_outward_totals():
+    """
+    Recompute total quantity and weighted rate of every Outward from its items.
+    bench --site [sitename] execute kisan_warehouse.outwards.doctype.outward.outward.rebuild_outward_totals
+    """
+    frappe.db.sql(
+        """
+        UPDATE `tabOutward` o
+        LEFT JOIN (
+            SELECT oid.parent,
+                SUM(oid.item_gross_weight) as total_quantity,
+                SUM(oid.item_gross_weight * oid.item_rate) / NULLIF(SUM(oid.item_gross_weight), 0) as weighted_rate
+            FROM `tabOutward Item Detail` oid
+            WHERE oid.parenttype = 'Outward'
+            GROUP BY oid.parent
+        ) t ON t.parent = o.name
+        SET o.total_quantity = COALESCE(t.total_quantity, 0),
+            o.weighted_rate = COALESCE(t.weighted_rate, 0)
+        """
+    )
+    frappe.db.commit()
+
+def rebuild_payment_summary():
+    """
+    Recompute the payment summary of every Outward from its payment rows, as
+    Outward.set_payment_summary does on save.
+    bench --site [sitename] execute kisan_warehouse.outwards.doctype.outward.outward.rebuild_payment_summary
+    """
+    frappe.db.sql(
+        """
+        UPDATE `tabOutward` o
+        LEFT JOIN (
+            SELECT parent,
+                ROUND(SUM(IF(payment_status = 'success', payment_amount, 0)), 2) as paid,
+                MAX(IF(payment_status = 'success' AND payment_amount != 0, payment_date, NULL)) as last_payment_date
+            FROM `tabOutward Payment`
+            WHERE parenttype = 'Outward'
+            GROUP BY parent
+        ) p ON p.parent = o.name
+        LEFT JOIN (
+            SELECT parent, notes,
+                ROW_NUMBER() OVER (PARTITION BY parent ORDER BY payment_date DESC, idx DESC) as row_no
+            FROM `tabOutward Payment`
+            WHERE parenttype = 'Outward' AND payment_date IS NOT NULL
+        ) n ON n.parent = o.name AND n.row_no = 1
+        SET o.total_amount_paid = COALESCE(p.paid, 0),
+            o.total_amount_pending = GREATEST(ROUND(COALESCE(o.net_total, 0) - COALESCE(p.paid, 0), 2), 0),
+            o.last_payment_date = p.last_payment_date,
+            o.last_payment_note = n.notes,
+            o.payment_status = CASE
+                WHEN COALESCE(o.net_total, 0) = 0 OR COALESCE(p.paid, 0) <= 0 THEN 'pending'
+                WHEN ROUND(o.net_total - p.paid, 2) <= 0 THEN 'success'
+                ELSE 'processing'
+            END
+        """
+    )
+    frappe.db.commit()
@@ -5,6 +5,10 @@ import frappe
 from frappe import _
 from frappe.utils import getdate, today, formatdate, flt
 
+from kisan_warehouse.utils.report_cache import cache_report
+from kisan_warehouse.utils.report_filters import get_date_condition
+
+@cache_report("Payment Pending Outwards")
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
@@ -112,7 +116,7 @@ def get_data(filters):
             o.outward_date,
             COALESCE(o.net_total, 0) as net_total,
             COALESCE(o.total_amount_paid, 0) as total_amount_paid,
-            COALESCE(o.total_amount_pending, o.net_total) as total_amount_pending,
+            COALESCE(o.total_amount_pending, 0) as total_amount_pending,
             o.payment_due_date,
             COALESCE(o.payment_status, 'pending') as payment_status,
             DATEDIFF(CURDATE(), o.payment_due_date) as days_difference,
@@ -122,27 +126,18 @@ def get_data(filters):
             COALESCE(c.ifsc_code, '') as ifsc_code,
             COALESCE(c.bank_name, '') as bank_name
         FROM `tabOutward` o
+        INNER JOIN `tabSauda` s ON o.sauda = s.name AND s.booking_type = 'Outward / Sales'
         LEFT JOIN `tabCustomer` c ON o.customer = c.name
         LEFT JOIN `tabBroker` b ON o.broker = b.name  
         LEFT JOIN `tabProduct` p ON o.product = p.name
         LEFT JOIN `tabWarehouse` w ON o.warehouse = w.name
-        LEFT JOIN `tabSauda` s ON o.sauda = s.name
-        WHERE o.docstatus < 2 
-        AND s.booking_type = 'Outward / Sales' {conditions}
+        WHERE o.docstatus < 2 {conditions}
         ORDER BY o.payment_due_date ASC, o.total_amount_pending DESC
     """.format(conditions=conditions)
     
     data = frappe.db.sql(query, filters, as_dict=1)
     
     for row in data:
-        if not row.total_amount_paid:
-            row.total_amount_paid = 0
-            
-        if not row.total_amount_pending:
-            row.total_amount_pending = row.net_total
-            
-        row.total_amount_pending = flt(row.net_total - row.total_amount_paid, 2)
-        
         days_diff = row.days_difference
         if days_diff > 0:
             row.days_status = f"{days_diff} Days Overdue"
@@ -188,11 +183,14 @@ def get_conditions(filters):
     if filters.get("warehouse"):
         conditions.append("o.warehouse = %(warehouse)s")
     
-    if filters.get("payment_due_date_from"):
-        conditions.append("o.payment_due_date >= %(payment_due_date_from)s")
-    
-    if filters.get("payment_due_date_to"):
-        conditions.append("o.payment_due_date <= %(payment_due_date_to)s")
+    if filters.get("payment_due_date_from") or filters.get("payment_due_date_to"):
+        conditions.append(get_date_condition(
+            "o.payment_due_date",
+            filters.get("payment_due_date_from"),
+            filters.get("payment_due_date_to"),
+            filters,
+            key="due_date",
+        ))
     
     if filters.get("payment_status"):
         if filters.get("payment_status") == "Pending":
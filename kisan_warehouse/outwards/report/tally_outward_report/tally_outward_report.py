@@ -1,7 +1,26 @@
+from itertools import groupby
+
 import frappe
 from frappe import _
-from frappe.utils import flt, getdate, formatdate, nowdate
+from frappe.utils import cint, flt, getdate, formatdate, now, nowdate
+
+from kisan_warehouse.utils.report_cache import cache_report
+from kisan_warehouse.utils.report_filters import get_date_condition
+from kisan_warehouse.utils.tally_export import (
+    TALLY_LEDGERS,
+    csv_download,
+    get_voucher_action,
+    get_watermark_join,
+    iter_deleted_vouchers,
+    iter_rows,
+    update_watermarks,
+    xml_download,
+)
+
+# Outwards belong to the company of their Sauda
+COMPANY_COLUMN = "s.company"
 
+@cache_report("Tally Outward Report")
 def execute(filters=None):
     """Main function to execute the report"""
     if not filters:
@@ -138,13 +157,21 @@ def get_columns():
 
 def get_data(filters):
     """Fetch and format data based on filters"""
+    query, values = get_query(filters)
+    return [format_row(row) for row in frappe.db.sql(query, values, as_dict=1)]
+
+def get_conditions(filters):
+    """WHERE conditions and their values for the report filters"""
     
     conditions = []
     values = []
     
-    conditions.append("o.outward_date BETWEEN %s AND %s")
-    values.extend([filters["from_date"], filters["to_date"]])
+    conditions.append(get_date_condition("o.outward_date", filters["from_date"], filters["to_date"], values))
     
+    if filters.get("company"):
+        conditions.append(f"{COMPANY_COLUMN} = %s")
+        values.append(filters["company"])
+        
     if filters.get("customer"):
         conditions.append("o.customer = %s")
         values.append(filters["customer"])
@@ -165,6 +192,12 @@ def get_data(filters):
         conditions.append("o.outward_status = %s")
         values.append(filters["outward_status"])
     
+    return conditions, values
+
+def get_query(filters):
+    """Report query and its values for the filters"""
+    
+    conditions, values = get_conditions(filters)
     where_clause = " AND ".join(conditions)
     
     query = f"""
@@ -176,16 +209,8 @@ def get_data(filters):
             'Sales Export' as voucher_type,
             COALESCE(p.product_name, '') as product_name,
             COALESCE(w.warehouse_name, '') as warehouse_name,
-            COALESCE((
-                SELECT SUM(oi.item_gross_weight)
-                FROM `tabOutward Item Detail` oi
-                WHERE oi.parent = o.name
-            ), 0) as quantity,
-            COALESCE((
-                SELECT AVG(oi.item_rate)
-                FROM `tabOutward Item Detail` oi
-                WHERE oi.parent = o.name
-            ), 0) as rate,
+            COALESCE(o.total_quantity, 0) as quantity,
+            COALESCE(o.weighted_rate, 0) as rate,
             COALESCE(o.net_total, 0) as amount,
             COALESCE(o.broker_commission_percent, 0) as broker_commission_percent,
             COALESCE(o.broker_commission_amount, 0) as broker_commission_amount,
@@ -197,92 +222,227 @@ def get_data(filters):
             'Kg' as uom
         FROM 
             `tabOutward` o
+        INNER JOIN `tabSauda` s ON o.sauda = s.name AND s.booking_type = 'Outward / Sales'
         LEFT JOIN `tabCustomer` c ON o.customer = c.name
         LEFT JOIN `tabProduct` p ON o.product = p.name
         LEFT JOIN `tabWarehouse` w ON o.warehouse = w.name
         LEFT JOIN `tabVehicle` v ON o.vehicle = v.name
-        LEFT JOIN `tabSauda` s ON o.sauda = s.name
         WHERE 
-            s.booking_type = 'Outward / Sales' AND {where_clause}
+            {where_clause}
         ORDER BY 
             o.outward_date DESC, o.name DESC
     """
     
-    data = frappe.db.sql(query, values, as_dict=1)
+    return query, values
+
+def format_row(row):
+    """Format one row for display and export"""
+    row['quantity'] = flt(row['quantity'], 2)
+    row['rate'] = flt(row['rate'], 2) 
+    row['amount'] = flt(row['amount'], 2)
+    row['broker_commission_percent'] = flt(row['broker_commission_percent'], 2)
+    row['broker_commission_amount'] = flt(row['broker_commission_amount'], 2)
     
-    formatted_data = []
-    for row in data:
-        row['quantity'] = flt(row['quantity'], 2)
-        row['rate'] = flt(row['rate'], 2) 
-        row['amount'] = flt(row['amount'], 2)
-        row['broker_commission_percent'] = flt(row['broker_commission_percent'], 2)
-        row['broker_commission_amount'] = flt(row['broker_commission_amount'], 2)
-        
-        row['customer_name'] = (row['customer_name'] or '').strip().replace('  ', ' ')
-        row['customer_account'] = (row['customer_account'] or '').strip().replace('  ', ' ')
-        row['product_name'] = (row['product_name'] or '').strip()
-        row['warehouse_name'] = (row['warehouse_name'] or '').strip()
-        row['vehicle'] = (row['vehicle'] or '').strip()
-        
-        for key, value in row.items():
-            if value is None or value == '':
-                if key in ['quantity', 'rate', 'amount', 'broker_commission_percent', 'broker_commission_amount']:
-                    row[key] = 0.0
-                else:
-                    row[key] = ''
-        
-        formatted_data.append(row)
+    row['customer_name'] = (row['customer_name'] or '').strip().replace('  ', ' ')
+    row['customer_account'] = (row['customer_account'] or '').strip().replace('  ', ' ')
+    row['product_name'] = (row['product_name'] or '').strip()
+    row['warehouse_name'] = (row['warehouse_name'] or '').strip()
+    row['vehicle'] = (row['vehicle'] or '').strip()
     
-    return formatted_data
+    for key, value in row.items():
+        if value is None or value == '':
+            if key in ['quantity', 'rate', 'amount', 'broker_commission_percent', 'broker_commission_amount']:
+                row[key] = 0.0
+            else:
+                row[key] = ''
+    
+    return row
+
+# Tally import columns: (CSV header, report fieldname) - EXACT Excel format
+TALLY_EXPORT_COLUMNS = [
+    ("Customer A/c", "customer_account"),
+    ("Customer Name", "customer_name"),
+    ("State Name", "state"),
+    ("GSTIN", "gstin"),
+    ("Voucher Type", "voucher_type"),
+    ("Product Name", "product_name"),
+    ("Warehouse", "warehouse_name"),
+    ("Quantity", "quantity"),
+    ("Rate", "rate"),
+    ("Amount", "amount"),
+    ("Broker Commission %", "broker_commission_percent"),
+    ("Broker Commission", "broker_commission_amount"),
+    ("Voucher No", "voucher_no"),
+    ("Outward Date", "outward_date"),
+    ("Status", "status"),
+    ("Vehicle", "vehicle"),
+    ("HSN", "hsn_code"),
+    ("UNIT", "uom"),
+]
 
 @frappe.whitelist()
-def export_to_tally(filters):
-    """Server-side method to export data for Tally"""
-    try:
-        if isinstance(filters, str):
-            import json
-            filters = json.loads(filters)
-        
-        columns, data = execute(filters)
-        
-        if not data:
-            frappe.throw(_("No data found for the selected filters"))
-        
-        csv_content = []
-        
-        headers = [
-            "Customer A/c", "Customer Name", "State Name", "GSTIN", "Voucher Type", 
-            "Product Name", "Warehouse", "Quantity", "Rate", "Amount",
-            "Broker Commission %", "Broker Commission", "Voucher No", "Outward Date",
-            "Status", "Vehicle", "HSN", "UNIT"
-        ]
-        csv_content.append(",".join(f'"{header}"' for header in headers))
-        
-        for row in data:
-            csv_row = [
-                f'"{row.get("customer_account", "")}"',
-                f'"{row.get("customer_name", "")}"', 
-                f'"{row.get("state", "")}"',
-                f'"{row.get("gstin", "")}"',
-                f'"{row.get("voucher_type", "")}"',
-                f'"{row.get("product_name", "")}"',
-                f'"{row.get("warehouse_name", "")}"',
-                f'"{flt(row.get("quantity", 0), 2)}"',
-                f'"{flt(row.get("rate", 0), 2)}"',
-                f'"{flt(row.get("amount", 0), 2)}"',
-                f'"{flt(row.get("broker_commission_percent", 0), 2)}"',
-                f'"{flt(row.get("broker_commission_amount", 0), 2)}"',
-                f'"{row.get("voucher_no", "")}"',
-                f'"{row.get("outward_date", "")}"',
-                f'"{row.get("status", "")}"',
-                f'"{row.get("vehicle", "")}"',
-                f'"{row.get("hsn_code", "")}"',
-                f'"{row.get("uom", "")}"'
-            ]
-            csv_content.append(",".join(csv_row))
-        
-        return "\n".join(csv_content)
-        
-    except Exception as e:
-        frappe.log_error(f"Tally Outward Export Error: {str(e)}")
-        frappe.throw(_("Error generating Tally export: {0}").format(str(e)))
\ No newline at end of file
+def export_to_tally(filters, compress=0):
+    """
+    Download the report as a CSV for Tally import (gzipped when compress is set).
+    Rows are streamed from the database into the file, so any date range exports in constant memory.
+    """
+    frappe.has_permission("Outward", "read", throw=True)
+    filters = get_export_filters(filters)
+
+    query, values = get_query(filters)
+    rows = (format_row(row) for row in iter_rows(query, values))
+
+    return csv_download(
+        rows,
+        TALLY_EXPORT_COLUMNS,
+        "tally_outward_export_" + nowdate(),
+        compress=cint(compress),
+    )
+
+@frappe.whitelist()
+def export_tally_xml(filters, since_last_export=0, compress=0):
+    """
+    Download Outwards as Tally Sales vouchers in an XML import envelope.
+
+    With since_last_export set, only Outwards created or changed since the last such
+    export of their company are included (the date and other filters, apart from
+    Company, are ignored so nothing is skipped), deleted ones are sent as Cancel
+    vouchers, and the company's Tally Export Watermark is moved forward to just
+    before the start of this export.
+    """
+    frappe.has_permission("Outward", "read", throw=True)
+    filters = get_export_filters(filters)
+    since_last_export = cint(since_last_export)
+
+    as_of = now()
+    query, values = get_voucher_query(filters, as_of if since_last_export else None)
+
+    # Vouchers exported per company, seeded so an empty export still moves the watermark
+    voucher_counts = {filters["company"]: 0} if filters.get("company") else {}
+
+    def vouchers():
+        for name, rows in groupby(iter_rows(query, values), key=lambda row: row.name):
+            voucher = get_sales_voucher(list(rows))
+            if voucher:
+                voucher_counts[voucher.company] = voucher_counts.get(voucher.company, 0) + 1
+                yield voucher
+
+        if since_last_export:
+            for voucher in iter_deleted_vouchers(
+                "Outward", "Sales", as_of, ("outward_date",), company=filters.get("company")
+            ):
+                voucher_counts[voucher.company] = voucher_counts.get(voucher.company, 0) + 1
+                yield voucher
+
+    response = xml_download(
+        vouchers(),
+        "tally_sales_vouchers_" + nowdate(),
+        company=frappe.db.get_value("Company", filters.get("company"), "company_name") if filters.get("company") else None,
+        compress=cint(compress),
+    )
+
+    if since_last_export:
+        update_watermarks("Sales", voucher_counts, as_of)
+
+    return response
+
+def get_export_filters(filters):
+    """Export filters as a dict, with the same default dates as the report"""
+    # Convert string filters to dict if needed
+    if isinstance(filters, str):
+        import json
+        filters = json.loads(filters)
+
+    # Same defaults as the report
+    if not filters.get("from_date"):
+        filters["from_date"] = frappe.utils.add_months(nowdate(), -1)
+    if not filters.get("to_date"):
+        filters["to_date"] = nowdate()
+
+    return filters
+
+def get_voucher_query(filters, as_of=None):
+    """
+    One row per Outward item, grouped by Outward. The Outward approval workflow
+    keeps every state at docstatus 0, so all uncancelled Outwards are included.
+    With as_of, the Outwards changed after their company's watermark up to as_of;
+    otherwise the Outwards matching the report filters.
+    """
+    if as_of:
+        conditions = ["o.modified > COALESCE(wm.last_exported_on, '2000-01-01')", "o.modified <= %s"]
+        values = [as_of]
+        if filters.get("company"):
+            conditions.append(f"{COMPANY_COLUMN} = %s")
+            values.append(filters["company"])
+    else:
+        conditions, values = get_conditions(filters)
+
+    query = f"""
+        SELECT
+            o.name, o.creation, o.modified, o.docstatus,
+            {COMPANY_COLUMN} as company,
+            o.outward_date as voucher_date,
+            o.sauda,
+            TRIM(REPLACE(COALESCE(CONCAT(c.first_name, ' ', COALESCE(c.last_name, '')), c.first_name, ''), '  ', ' ')) as party,
+            COALESCE(c.gstin, '') as gstin,
+            COALESCE(c.state, 'Maharashtra') as state,
+            TRIM(COALESCE(p.product_name, '')) as product_name,
+            COALESCE(o.net_total, 0) as net_total,
+            wm.last_exported_on,
+            oi.item_gross_weight, oi.item_rate, oi.item_amount
+        FROM 
+            `tabOutward` o
+        INNER JOIN `tabSauda` s ON o.sauda = s.name
+        LEFT JOIN `tabCustomer` c ON o.customer = c.name
+        LEFT JOIN `tabProduct` p ON o.product = p.name
+        LEFT JOIN `tabOutward Item Detail` oi
+            ON oi.parent = o.name AND oi.parenttype = 'Outward' AND oi.parentfield = 'outward_items'
+        {get_watermark_join("Sales", COMPANY_COLUMN)}
+        WHERE 
+            s.booking_type = 'Outward / Sales' AND o.docstatus < 2 AND {" AND ".join(conditions)}
+        ORDER BY 
+            o.name, oi.idx
+    """
+
+    return query, values
+
+def get_sales_voucher(rows):
+    """
+    Sales voucher of one Outward: the customer is debited the net total, the items
+    are credited to Sales and any difference goes to Round Off.
+    """
+    outward = rows[0]
+    action = get_voucher_action(outward)
+
+    inventory = [
+        {
+            "stock_item": outward.product_name,
+            "quantity": row.item_gross_weight,
+            "rate": flt(row.item_rate) / 100,
+            "amount": -flt(row.item_amount, 2),
+            "ledger": TALLY_LEDGERS["sales"],
+        }
+        for row in rows
+        if row.item_amount is not None
+    ]
+
+    ledgers = [(outward.party, flt(outward.net_total, 2))]
+
+    # Whatever keeps debits and credits equal
+    balance = sum(item["amount"] for item in inventory) + sum(amount for ledger, amount in ledgers)
+    ledgers.append((TALLY_LEDGERS["round_off"], -flt(balance, 2)))
+
+    return frappe._dict(
+        name=outward.name,
+        company=outward.company,
+        voucher_type="Sales",
+        action=action,
+        date=outward.voucher_date,
+        voucher_number=outward.name,
+        reference=outward.sauda,
+        party=outward.party,
+        party_gstin=outward.gstin,
+        state=outward.state,
+        inventory=inventory,
+        ledgers=ledgers,
+    )
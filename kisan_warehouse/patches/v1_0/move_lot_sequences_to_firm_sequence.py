@@ -0,0 +1,7 @@
+from kisan_warehouse.warehouse_rent.sequence import rebuild_lot_years
+
+
+def execute():
+	"""Fill in lot_year, carry the firm-wise tabSeries counters over and add the unique lot index."""
+	rebuild_lot_years("Inward Aawak", "AAWAK")
+	rebuild_lot_years("Outward Jawak", "JAWAK")
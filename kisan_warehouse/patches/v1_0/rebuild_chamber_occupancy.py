@@ -0,0 +1,6 @@
+from kisan_warehouse.warehouse_rent.occupancy import rebuild_chamber_occupancy
+
+
+def execute():
+	"""Backfill Chamber Occupancy from existing Inward Aawaks and Outward Jawaks."""
+	rebuild_chamber_occupancy()
@@ -0,0 +1,6 @@
+from kisan_warehouse.utils.purchase_ledger import rebuild_purchase_totals
+
+
+def execute():
+	"""Backfill Customer Purchase Totals for all fiscal years from existing Inwards."""
+	rebuild_purchase_totals()
@@ -0,0 +1,6 @@
+from kisan_warehouse.warehouse_rent.bag_balance import rebuild_bag_balances
+
+
+def execute():
+	"""Backfill Lot Bag Balances from existing Inward Aawaks and Outward Jawaks."""
+	rebuild_bag_balances()
@@ -0,0 +1,8 @@
+from kisan_warehouse.outwards.doctype.outward.outward import rebuild_payment_summary as rebuild_outward_payments
+from kisan_warehouse.utils.inward_calculations import rebuild_payment_summary as rebuild_inward_payments
+
+
+def execute():
+	"""Backfill paid/pending amounts, payment status and last payment date and note on Inwards and Outwards."""
+	rebuild_inward_payments()
+	rebuild_outward_payments()
@@ -0,0 +1,6 @@
+from kisan_warehouse.saudas.doctype.sauda.sauda import rebuild_dispatched_quantity
+
+
+def execute():
+	"""Backfill dispatched and pending quantity on sales Saudas from existing Outwards."""
+	rebuild_dispatched_quantity()
@@ -0,0 +1,6 @@
+from kisan_warehouse.utils.stock_ledger import rebuild_stock_ledger
+
+
+def execute():
+	"""Backfill the Stock Ledger from existing Inward and Outward records."""
+	rebuild_stock_ledger()
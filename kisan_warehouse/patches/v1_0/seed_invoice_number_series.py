@@ -0,0 +1,6 @@
+from kisan_warehouse.utils.invoice_number import seed_invoice_number_series
+
+
+def execute():
+	"""Continue Sauda / Inward invoice numbers from the highest number issued so far."""
+	seed_invoice_number_series()
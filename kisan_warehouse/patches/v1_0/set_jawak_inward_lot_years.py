@@ -0,0 +1,27 @@
+import frappe
+
+from kisan_warehouse.warehouse_rent.bag_balance import rebuild_bag_balances
+
+
+def execute():
+	"""
+	Fill in inward_lot_year of existing Outward Jawaks, then rebuild Lot Bag
+	Balances per (firm, lot number, lot year). A lot number used in several
+	years is taken from the latest Aawak that arrived by the Jawak date.
+	"""
+	frappe.db.sql(
+		"""
+		UPDATE `tabOutward Jawak` j
+		SET j.inward_lot_year = (
+			SELECT a.lot_year
+			FROM `tabInward Aawak` a
+			WHERE a.firm = j.firm AND a.lot_number = j.inward_lot_no AND a.docstatus < 2
+			ORDER BY DATE(a.aawak_date) <= DATE(j.jawak_date) DESC, a.aawak_date DESC
+			LIMIT 1
+		)
+		WHERE IFNULL(j.inward_lot_year, 0) = 0
+			AND IFNULL(j.inward_lot_no, '') != ''
+		"""
+	)
+
+	rebuild_bag_balances()
@@ -0,0 +1,6 @@
+from kisan_warehouse.outwards.doctype.outward.outward import rebuild_outward_totals
+
+
+def execute():
+	"""Backfill total quantity and weighted rate on existing Outwards."""
+	rebuild_outward_totals()
@@ -5,6 +5,10 @@ import frappe
 from frappe import _
 from frappe.utils import getdate, today, formatdate, flt, add_days
 
+from kisan_warehouse.utils.report_cache import cache_report
+from kisan_warehouse.utils.report_filters import get_date_range, get_range_condition
+
+@cache_report("Stock by Product")
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
@@ -60,47 +64,28 @@ def get_data(filters):
     
     # Build WHERE conditions based on filters
     conditions = get_conditions(filters)
+    inward_condition = get_date_condition(filters) or "1 = 1"
     
-    # Main SQL query - Net stock = Inward - Outward
+    # Main SQL query - Net stock = Inward - Outward, read from the Stock Ledger
+    # (one row per warehouse/product/day) instead of every item row.
+    # The date filter applies to the inward side only.
     query = """
         SELECT 
             p.name as product_name,
             p.product_name as product_display_name,
-            (COALESCE(inward_data.total_bags, 0) - COALESCE(outward_data.total_bags, 0)) as total_bags,
-            (COALESCE(inward_data.total_weight, 0) - COALESCE(outward_data.total_weight, 0)) as stock_kg,
-            (COALESCE(inward_data.total_amount, 0) - COALESCE(outward_data.total_amount, 0)) as total_value,
-            COALESCE(inward_data.warehouse_count, 0) as warehouse_count
-        FROM `tabProduct` p
-        LEFT JOIN (
-            SELECT 
-                i.product,
-                SUM(iid.item_bags) as total_bags,
-                SUM(iid.item_arrival_weight) as total_weight,
-                SUM(iid.item_amount) as total_amount,
-                COUNT(DISTINCT i.warehouse) as warehouse_count
-            FROM `tabInward Item Detail` iid
-            INNER JOIN `tabInward` i ON iid.parent = i.name
-            WHERE i.docstatus < 2 {conditions}
-            GROUP BY i.product
-        ) as inward_data ON p.name = inward_data.product
-        LEFT JOIN (
-            SELECT 
-                o.product,
-                SUM(oid.item_bags) as total_bags,
-                SUM(oid.item_gross_weight) as total_weight,
-                SUM(oid.item_amount) as total_amount
-            FROM `tabOutward Item Detail` oid
-            INNER JOIN `tabOutward` o ON oid.parent = o.name
-            WHERE o.docstatus < 2
-            GROUP BY o.product
-        ) as outward_data ON p.name = outward_data.product
-        WHERE (inward_data.product IS NOT NULL OR outward_data.product IS NOT NULL)
-        {product_filter}
+            (SUM(CASE WHEN {inward_condition} THEN sle.in_bags ELSE 0 END) - SUM(sle.out_bags)) as total_bags,
+            (SUM(CASE WHEN {inward_condition} THEN sle.in_qty ELSE 0 END) - SUM(sle.out_qty)) as stock_kg,
+            (SUM(CASE WHEN {inward_condition} THEN sle.in_value ELSE 0 END) - SUM(sle.out_value)) as total_value,
+            COUNT(DISTINCT CASE WHEN sle.inward_count > 0 AND {inward_condition} THEN sle.warehouse END) as warehouse_count
+        FROM `tabStock Ledger Entry` sle
+        INNER JOIN `tabProduct` p ON p.name = sle.product
+        WHERE 1 = 1 {conditions}
+        GROUP BY p.name, p.product_name
         HAVING stock_kg > 0
         ORDER BY stock_kg DESC
     """.format(
         conditions=conditions,
-        product_filter="AND p.name = %(product)s" if filters.get("product") else ""
+        inward_condition=inward_condition
     )
     
     # Execute query
@@ -141,64 +126,11 @@ def get_conditions(filters):
     
     # Product filter
     if filters.get("product"):
-        conditions.append("i.product = %(product)s")
-    
-    # Date filtering logic
-    date_condition = get_date_condition(filters)
-    if date_condition:
-        conditions.append(date_condition)
+        conditions.append("sle.product = %(product)s")
     
     return " AND " + " AND ".join(conditions) if conditions else ""
 
 def get_date_condition(filters):
-    """Build date condition based on Filter By selection"""
-    
-    filter_by = filters.get("filter_by")
-    
-    if not filter_by or filter_by == "All":
-        return ""
-    
-    from frappe.utils import today, add_days, getdate
-    
-    today_date = getdate(today())  # Convert string to date object
-    
-    if filter_by == "Today":
-        return f"DATE(i.arrival_date) = '{today()}'"
-    
-    elif filter_by == "Yesterday":
-        yesterday = add_days(today(), -1)
-        return f"DATE(i.arrival_date) = '{yesterday}'"
-    
-    elif filter_by == "Last 7 Days":
-        week_ago = add_days(today(), -7)
-        return f"DATE(i.arrival_date) BETWEEN '{week_ago}' AND '{today()}'"
-    
-    elif filter_by == "Current Month":
-        # First day of current month
-        import datetime
-        today_date_obj = getdate(today())
-        first_day = today_date_obj.replace(day=1)
-        return f"DATE(i.arrival_date) BETWEEN '{first_day}' AND '{today()}'"
-    
-    elif filter_by == "Last Month":
-        # First and last day of previous month
-        import datetime
-        today_date_obj = getdate(today())
-        first_day_current = today_date_obj.replace(day=1)
-        last_day_last_month = first_day_current - datetime.timedelta(days=1)
-        first_day_last_month = last_day_last_month.replace(day=1)
-        return f"DATE(i.arrival_date) BETWEEN '{first_day_last_month}' AND '{last_day_last_month}'"
-    
-    elif filter_by == "Custom":
-        # Use custom date range
-        date_from = filters.get("date_from")
-        date_to = filters.get("date_to")
-        
-        if date_from and date_to:
-            return f"DATE(i.arrival_date) BETWEEN '{date_from}' AND '{date_to}'"
-        elif date_from:
-            return f"DATE(i.arrival_date) >= '{date_from}'"
-        elif date_to:
-            return f"DATE(i.arrival_date) <= '{date_to}'"
-    
-    return ""
\ No newline at end of file
+    """Date condition for the Filter By selection, its dates added to filters as query values"""
+    start, end = get_date_range(filters.get("filter_by"), filters.get("date_from"), filters.get("date_to"))
+    return get_range_condition("sle.posting_date", start, end, filters)
@@ -0,0 +1,6 @@
+// Inward is a custom DocType, so its list settings are added through hooks.doctype_list_js
+frappe.listview_settings['Inward'] = {
+    onload: function (listview) {
+        kisan_warehouse.print_job.add_action(listview, __('Inward Receipt PDF'), 'Inward Receipt');
+    }
+};
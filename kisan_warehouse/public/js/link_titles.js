@@ -0,0 +1,119 @@
+// Shared link title cache for kisan_warehouse forms (kisan_warehouse.utils.link_titles)
+frappe.provide('kisan_warehouse.link_titles');
+
+// Titles kept in the cache; the least recently used ones are dropped beyond this
+kisan_warehouse.link_titles.max_size = 1000;
+
+// Map keeps insertion order, so its first key is always the least recently used one
+kisan_warehouse.link_titles.cache = new Map();
+
+kisan_warehouse.link_titles.get = function (doctype, name) {
+    const cache = kisan_warehouse.link_titles.cache;
+    const key = doctype + '::' + name;
+
+    if (!cache.has(key)) return undefined;
+
+    // Move to the most recently used end
+    const title = cache.get(key);
+    cache.delete(key);
+    cache.set(key, title);
+    return title;
+};
+
+// Add {doctype: {name: title}} to the cache and to Frappe's link titles, so Link fields show them
+kisan_warehouse.link_titles.add = function (titles) {
+    const cache = kisan_warehouse.link_titles.cache;
+
+    Object.keys(titles || {}).forEach(function (doctype) {
+        Object.keys(titles[doctype]).forEach(function (name) {
+            const key = doctype + '::' + name;
+            cache.delete(key);
+            cache.set(key, titles[doctype][name]);
+            frappe.utils.add_link_title(doctype, name, titles[doctype][name]);
+        });
+    });
+
+    while (cache.size > kisan_warehouse.link_titles.max_size) {
+        cache.delete(cache.keys().next().value);
+    }
+};
+
+// Requests in flight, by cache key, so two forms or handlers asking at once share one request
+kisan_warehouse.link_titles.pending = new Map();
+
+// Titles for {doctype: [names]}; only the ones not cached or requested yet are fetched, in one request
+kisan_warehouse.link_titles.load = function (names) {
+    const pending = kisan_warehouse.link_titles.pending;
+    const waits = new Set();
+    const missing = {};
+    const missing_keys = [];
+
+    Object.keys(names || {}).forEach(function (doctype) {
+        (names[doctype] || []).forEach(function (name) {
+            const key = doctype + '::' + name;
+            if (!name || kisan_warehouse.link_titles.get(doctype, name) !== undefined) return;
+            if (pending.has(key)) {
+                waits.add(pending.get(key));
+            } else if (!missing_keys.includes(key)) {
+                (missing[doctype] = missing[doctype] || []).push(name);
+                missing_keys.push(key);
+            }
+        });
+    });
+
+    if (missing_keys.length) {
+        const request = frappe.xcall('kisan_warehouse.utils.link_titles.get_link_titles', { names: missing })
+            .then(function (titles) {
+                kisan_warehouse.link_titles.add(titles);
+
+                // Names without a title (no access, deleted) are not asked for again
+                missing_keys.forEach(function (key) {
+                    if (!kisan_warehouse.link_titles.cache.has(key)) {
+                        kisan_warehouse.link_titles.cache.set(key, null);
+                    }
+                });
+            })
+            .finally(function () {
+                missing_keys.forEach(function (key) {
+                    pending.delete(key);
+                });
+            });
+
+        missing_keys.forEach(function (key) {
+            pending.set(key, request);
+        });
+        waits.add(request);
+    }
+
+    return Promise.all(Array.from(waits)).then(function () {
+        const titles = {};
+        Object.keys(names || {}).forEach(function (doctype) {
+            titles[doctype] = {};
+            (names[doctype] || []).forEach(function (name) {
+                const title = name && kisan_warehouse.link_titles.get(doctype, name);
+                if (title) titles[doctype][name] = title;
+            });
+        });
+        return titles;
+    });
+};
+
+// Titles of every filled Link field of the form, child tables included, in one request
+kisan_warehouse.link_titles.load_form = function (frm) {
+    const names = {};
+
+    const collect = function (doctype, doc) {
+        frappe.meta.get_docfields(doctype).forEach(function (df) {
+            if (df.fieldtype === 'Link' && doc[df.fieldname]) {
+                (names[df.options] = names[df.options] || []).push(doc[df.fieldname]);
+            } else if (frappe.model.table_fields.includes(df.fieldtype)) {
+                (doc[df.fieldname] || []).forEach(function (row) {
+                    collect(df.options, row);
+                });
+            }
+        });
+    };
+    collect(frm.doctype, frm.doc);
+
+    return kisan_warehouse.link_titles.load(names);
+};
@@ -0,0 +1,68 @@
+// Background PDF print jobs from list views (kisan_warehouse.utils.print_jobs)
+frappe.provide('kisan_warehouse.print_job');
+
+kisan_warehouse.print_job.add_action = function (listview, label, print_format) {
+    listview.page.add_action_item(label, function () {
+        const selected = listview.get_checked_items();
+
+        if (selected.length === 0) {
+            frappe.msgprint({
+                title: __('No Records Selected'),
+                message: __('Please select at least one {0} record.', [__(listview.doctype)]),
+                indicator: 'red'
+            });
+            return;
+        }
+
+        kisan_warehouse.print_job.enqueue(print_format, selected.map(item => item.name));
+    });
+};
+
+kisan_warehouse.print_job.enqueue = function (print_format, doc_ids) {
+    kisan_warehouse.print_job.listen();
+
+    frappe.call({
+        method: 'kisan_warehouse.utils.print_jobs.enqueue_print_job',
+        args: {
+            print_format: print_format,
+            doc_ids: doc_ids.join(',')
+        },
+        callback: function (r) {
+            if (r.message) {
+                frappe.show_alert({
+                    message: __('{0} PDF for {1} record(s) is being prepared. You will be notified when it is ready.', [__(print_format), r.message.count]),
+                    indicator: 'blue'
+                }, 5);
+            }
+        }
+    });
+};
+
+kisan_warehouse.print_job.listen = function () {
+    if (kisan_warehouse.print_job.listening) return;
+    kisan_warehouse.print_job.listening = true;
+
+    frappe.realtime.on('kisan_print_job', function (data) {
+        if (data.status === 'Progress') {
+            frappe.show_progress(__('Preparing {0} PDF', [__(data.print_format)]), data.done, data.total, null, true);
+        } else if (data.status === 'Completed') {
+            frappe.hide_progress();
+            frappe.msgprint({
+                title: __('PDF Ready'),
+                message: __('{0} PDF for {1} record(s) is ready: {2}', [
+                    __(data.print_format),
+                    data.total,
+                    `<a href="${encodeURI(data.file_url)}" target="_blank">${__('Download')}</a>`
+                ]),
+                indicator: 'green'
+            });
+        } else if (data.status === 'Failed') {
+            frappe.hide_progress();
+            frappe.msgprint({
+                title: __('Error'),
+                message: __('Failed to generate {0} PDF. Please check the Error Log.', [__(data.print_format)]),
+                indicator: 'red'
+            });
+        }
+    });
+};
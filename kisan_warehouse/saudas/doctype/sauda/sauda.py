@@ -1,5 +1,77 @@
 import frappe
 from frappe.model.document import Document
+from frappe.utils import flt
 
 class Sauda(Document):
     pass
+
+
+def before_save(doc, method=None):
+    """
+    Keep pending quantity of sales Saudas in step with the maintained
+    dispatched quantity (doc_events hook, Sauda is a custom DocType).
+    """
+    if doc.booking_type != "Outward / Sales":
+        return
+
+    if not doc.is_new():
+        # Re-read under lock so a form opened before an Outward was saved
+        # cannot write back a stale dispatched quantity
+        doc.dispatched_quantity = flt(
+            frappe.db.get_value("Sauda", doc.name, "dispatched_quantity", for_update=True)
+        )
+
+    doc.pending_quantity = flt(doc.expected_quantity) - flt(doc.dispatched_quantity)
+
+
+def lock_sauda(sauda_name):
+    """
+    Lock the Sauda row (SELECT ... FOR UPDATE) until the transaction ends
+    and return its quantity fields.
+    """
+    return frappe.db.get_value(
+        "Sauda",
+        sauda_name,
+        ["expected_quantity", "dispatched_quantity", "pending_quantity"],
+        as_dict=True,
+        for_update=True,
+    )
+
+
+def update_dispatched_quantity(sauda_name, delta):
+    """Atomically add delta (kg) to the Sauda's dispatched quantity and refresh pending quantity."""
+    if not sauda_name or not flt(delta):
+        return
+
+    frappe.db.sql(
+        """
+        UPDATE `tabSauda`
+        SET pending_quantity = COALESCE(expected_quantity, 0) - (COALESCE(dispatched_quantity, 0) + %(delta)s),
+            dispatched_quantity = COALESCE(dispatched_quantity, 0) + %(delta)s
+        WHERE name = %(sauda)s AND booking_type = 'Outward / Sales'
+        """,
+        {"sauda": sauda_name, "delta": flt(delta)},
+    )
+
+
+def rebuild_dispatched_quantity():
+    """
+    Recompute dispatched and pending quantity of every sales Sauda from its Outwards.
+    bench --site [sitename] execute kisan_warehouse.saudas.doctype.sauda.sauda.rebuild_dispatched_quantity
+    """
+    frappe.db.sql(
+        """
+        UPDATE `tabSauda` s
+        LEFT JOIN (
+            SELECT o.sauda, SUM(oid.item_gross_weight) as dispatched
+            FROM `tabOutward` o
+            INNER JOIN `tabOutward Item Detail` oid ON oid.parent = o.name
+            WHERE o.docstatus < 2
+            GROUP BY o.sauda
+        ) d ON d.sauda = s.name
+        SET s.dispatched_quantity = COALESCE(d.dispatched, 0),
+            s.pending_quantity = COALESCE(s.expected_quantity, 0) - COALESCE(d.dispatched, 0)
+        WHERE s.booking_type = 'Outward / Sales'
+        """
+    )
+    frappe.db.commit()
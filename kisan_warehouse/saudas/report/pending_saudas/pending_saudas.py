@@ -5,6 +5,10 @@ import frappe
 from frappe import _
 from frappe.utils import getdate, today, formatdate, flt
 
+from kisan_warehouse.utils.report_cache import cache_report
+from kisan_warehouse.utils.report_filters import get_date_condition
+
+@cache_report("Pending Saudas")
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
@@ -181,18 +185,24 @@ def get_conditions(filters):
         conditions.append("s.warehouse = %(warehouse)s")
     
     # Delivery date range filters
-    if filters.get("delivery_date_from"):
-        conditions.append("s.delivery_end_date >= %(delivery_date_from)s")
-    
-    if filters.get("delivery_date_to"):
-        conditions.append("s.delivery_end_date <= %(delivery_date_to)s")
+    if filters.get("delivery_date_from") or filters.get("delivery_date_to"):
+        conditions.append(get_date_condition(
+            "s.delivery_end_date",
+            filters.get("delivery_date_from"),
+            filters.get("delivery_date_to"),
+            filters,
+            key="delivery_end",
+        ))
     
     # Payment date range filters
-    if filters.get("payment_date_from"):
-        conditions.append("s.payment_end_date >= %(payment_date_from)s")
-    
-    if filters.get("payment_date_to"):
-        conditions.append("s.payment_end_date <= %(payment_date_to)s")
+    if filters.get("payment_date_from") or filters.get("payment_date_to"):
+        conditions.append(get_date_condition(
+            "s.payment_end_date",
+            filters.get("payment_date_from"),
+            filters.get("payment_date_to"),
+            filters,
+            key="payment_end",
+        ))
     
     # Sauda status filter
     if filters.get("sauda_status"):
@@ -0,0 +1,16 @@
+# Copyright (c) 2026, Kisan Warehouse and contributors
+# For license information, please see license.txt
+
+from frappe.model.document import Document
+
+
+class TallyExportWatermark(Document):
+	"""
+	Time up to which one company's Purchase or Sales vouchers have been
+	exported to Tally, named "<voucher type>|<company>".
+
+	Advanced by kisan_warehouse.utils.tally_export after each incremental XML
+	export. Delete the row to export the company's vouchers from the start again.
+	"""
+
+	pass
@@ -0,0 +1,51 @@
+import frappe
+from frappe.model.naming import make_autoname
+from frappe.utils import cint
+
+# DocType -> (invoice number field, naming series); numbers restart every year
+INVOICE_NUMBER_SERIES = {
+	"Sauda": ("sauda_invoice_no", "INV-S-.YYYY.-.####"),
+	"Inward": ("inward_invoice_no", "INV-I-.YYYY.-.####"),
+}
+
+
+def before_insert(doc, method=None):
+	"""
+	doc_events hook: give a new Sauda / Inward the next invoice number of the year.
+
+	make_autoname advances the (series, year) counter in tabSeries under a row
+	lock, so concurrent inserts never get the same number.
+	"""
+	fieldname, series = INVOICE_NUMBER_SERIES[doc.doctype]
+	if not doc.get(fieldname):
+		doc.set(fieldname, make_autoname(series, doc=doc))
+
+
+def seed_invoice_number_series():
+	"""
+	Start each year's counter after the highest invoice number already issued
+	(numbers used to be generated in the browser, outside tabSeries).
+	"""
+	for doctype, (fieldname, series) in INVOICE_NUMBER_SERIES.items():
+		prefix = series.split(".")[0]
+		rows = frappe.db.sql(
+			"""
+			SELECT SUBSTRING_INDEX({fieldname}, '-', 3) as series_key,
+				MAX(CAST(SUBSTRING_INDEX({fieldname}, '-', -1) AS UNSIGNED)) as current
+			FROM `tab{doctype}`
+			WHERE {fieldname} LIKE %(prefix)s
+			GROUP BY SUBSTRING_INDEX({fieldname}, '-', 3)
+			""".format(doctype=doctype, fieldname=fieldname),
+			{"prefix": f"{prefix}%"},
+			as_dict=True,
+		)
+
+		for row in rows:
+			frappe.db.sql(
+				"""
+				INSERT INTO `tabSeries` (name, current)
+				VALUES (%(name)s, %(current)s)
+				ON DUPLICATE KEY UPDATE current = GREATEST(current, VALUES(current))
+				""",
+				{"name": f"{row.series_key}-", "current": cint(row.current)},
+			)
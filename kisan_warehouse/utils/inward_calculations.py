@@ -0,0 +1,476 @@
+"""
+Inward totals pipeline.
+
+`calculate_inward` takes an Inward as a plain dict and returns every computed
+field in one pass: item weights and amounts, deductions, sub total, GST/TCS,
+TDS under section 194Q, broker commission, payment summary and debit note.
+It does not touch the database; settings and the customer's earlier purchases
+in the fiscal year are passed in, so the same numbers come out of the form,
+imports and APIs.
+"""
+
+import math
+
+import frappe
+from frappe.utils import cint, flt, getdate
+
+from kisan_warehouse.utils.purchase_ledger import (
+	get_cumulative_purchases,
+	get_fiscal_year,
+	get_purchase_amount,
+)
+
+# TDS 194Q: 0.1% on purchases from one seller above ₹50,00,000 in a fiscal year
+TDS_194Q_THRESHOLD = 5000000
+TDS_194Q_RATE = 0.1
+
+PARENT_FIELDS = (
+	"bag_type_count",
+	"total_gross_weight",
+	"total_bags",
+	"total_arrival_weight",
+	"total_amount",
+	"total_deductions",
+	"sub_total",
+	"cgst_amount",
+	"sgst_amount",
+	"igst_amount",
+	"total_gst_amount",
+	"tcs_amount",
+	"tds_percent",
+	"tds_amount",
+	"broker_commission_amount",
+	"net_total",
+	"total_amount_paid",
+	"total_amount_pending",
+	"inward_payment_status",
+	"last_payment_date",
+	"last_payment_note",
+)
+
+CHILD_FIELDS = {
+	"inward_items": (
+		"item_bags",
+		"item_charges",
+		"item_deduct_weight",
+		"item_gross_weight",
+		"item_arrival_weight",
+		"item_amount",
+	),
+	"deductions": ("bags", "difference_value", "deduction_amount"),
+	"debit_note": ("particulars", "deducted_weight_kg", "amount"),
+}
+
+
+def calculate_inward(doc, settings=None, previous_purchases=0):
+	"""
+	Run the whole Inward calculation on a dict and return the computed values.
+
+	Args:
+		doc: Inward as a dict (child tables as lists of dicts)
+		settings: App Settings as a dict, for bag charges and Moise tiers
+		previous_purchases: customer's other purchases (sub total + GST + TCS) in
+			the same fiscal year, for TDS 194Q
+
+	Returns:
+		dict of parent fields plus `inward_items`, `deductions` and `debit_note`
+		as lists of dicts, in the order of the rows passed in
+	"""
+	doc = frappe._dict(doc)
+	settings = frappe._dict(settings or {})
+	report_type = doc.report_type
+
+	items = [frappe._dict(row) for row in doc.get("inward_items") or []]
+	deductions = [frappe._dict(row) for row in doc.get("deductions") or []]
+	debit_note = [frappe._dict(row) for row in doc.get("debit_note") or []]
+
+	out = frappe._dict()
+
+	calculate_items(doc, items, settings)
+
+	out.bag_type_count = 1 if report_type == "Multi Rate" else len(items)
+	out.total_gross_weight = sum(flt(item.item_gross_weight) for item in items)
+	out.total_bags = sum(cint(item.item_bags) for item in items)
+	out.total_arrival_weight = sum(flt(item.item_arrival_weight) for item in items)
+	out.total_amount = sum(flt(item.item_amount) for item in items)
+
+	calculate_deductions(doc, out, items, deductions, settings)
+	out.total_deductions = sum(flt(row.deduction_amount) for row in deductions)
+	out.sub_total = out.total_amount - out.total_deductions
+
+	calculate_taxes(doc, out, previous_purchases)
+	calculate_payments(doc, out)
+	calculate_debit_note(doc, out, debit_note)
+
+	out.inward_items = items
+	out.deductions = deductions
+	out.debit_note = debit_note
+	return out
+
+
+def calculate_items(doc, items, settings):
+	"""Bag weights, arrival weight and amount of each item row."""
+	bag_charges = {row.get("bag_type"): flt(row.get("charges")) for row in settings.get("default_bag_types") or []}
+
+	if doc.report_type == "Single Report" and items:
+		# Single Report carries the whole arrival on its first row
+		if cint(doc.inward_total_bags):
+			items[0].item_bags = cint(doc.inward_total_bags)
+		if flt(doc.gross_weight):
+			items[0].item_gross_weight = flt(doc.gross_weight)
+
+	average_weight_per_bag = None
+	if flt(doc.gross_weight) and cint(doc.inward_total_bags):
+		average_weight_per_bag = flt(doc.gross_weight) / cint(doc.inward_total_bags)
+
+	for item in items:
+		if item.get("item_charges") is None and item.item_bag_type in bag_charges:
+			item.item_charges = bag_charges[item.item_bag_type]
+
+		if doc.report_type == "Multi Rate":
+			calculate_multi_rate_item(item, average_weight_per_bag)
+		elif average_weight_per_bag:
+			# Arrival weight = (No of bags × average weight per bag) - bag weight
+			item.item_gross_weight = cint(item.item_bags) * average_weight_per_bag
+			item.item_deduct_weight = cint(item.item_bags) * flt(item.item_charges)
+			item.item_arrival_weight = item.item_gross_weight - item.item_deduct_weight
+
+		# Rate is per quintal, weights are in kg
+		if doc.report_type != "Multi Rate":
+			item.item_amount = flt(item.item_arrival_weight) * flt(item.item_rate) / 100
+
+
+def calculate_multi_rate_item(item, average_weight_per_bag):
+	"""Multi Rate rows are entered by gross weight; bags are derived from it."""
+	gross_weight = flt(item.item_gross_weight)
+
+	if average_weight_per_bag:
+		item.item_bags = int(gross_weight / average_weight_per_bag)
+
+	if cint(item.item_bags) > 0 and flt(item.item_charges) > 0:
+		item.item_deduct_weight = flt(cint(item.item_bags) * flt(item.item_charges), 2)
+	else:
+		item.item_deduct_weight = 0
+
+	if gross_weight > 0:
+		item.item_arrival_weight = flt(gross_weight - item.item_deduct_weight, 2)
+
+	if flt(item.item_arrival_weight) > 0 and flt(item.item_rate) > 0:
+		item.item_amount = flt(item.item_arrival_weight) * flt(item.item_rate) / 100
+	else:
+		item.item_amount = 0
+
+
+def calculate_deductions(doc, out, items, deductions, settings):
+	"""Deduction amounts for the quality deductions and the weight based charges."""
+	moise_config = next(
+		(
+			row
+			for row in settings.get("default_deduction_types") or []
+			if (row.get("deduction_name") or "").lower() == "moise"
+		),
+		None,
+	)
+	tier_ranges = settings.get("deduction_tier_range") or []
+	is_tiered = bool(moise_config and cint(moise_config.get("has_tiered_calculation")))
+
+	plastic_weight = sum(
+		flt(item.item_gross_weight) for item in items if (item.item_bag_type or "").lower() == "plastic"
+	)
+
+	for idx, row in enumerate(deductions):
+		deduction_type = row.deduction_type or ""
+		charges = flt(row.charges_per_unit)
+
+		if deduction_type.lower() in ("moise", "damage", "s/s"):
+			if not items:
+				continue
+
+			if doc.report_type == "Multi Rate":
+				# Multi Rate deducts on the totals of the whole arrival
+				base_weight = out.total_gross_weight
+				base_amount = out.total_amount
+			else:
+				# Other reports map deduction rows to item rows in turn
+				item = items[idx % len(items)]
+				base_weight = flt(item.item_gross_weight)
+				base_amount = (flt(item.item_gross_weight) - flt(item.item_deduct_weight)) * flt(item.item_rate) / 100
+				if row.deduction_category == "multiple":
+					row.bags = cint(item.item_bags)
+
+			actual = flt(row.actual_value)
+			required = flt(row.required_value)
+			difference = max(actual - required, 0)
+
+			if deduction_type.lower() == "moise":
+				if is_tiered:
+					difference = get_tiered_difference(actual, required, tier_ranges)
+				row.difference_value = difference
+				row.deduction_amount = difference * base_amount / 100
+			elif deduction_type.lower() == "damage":
+				row.difference_value = difference
+				row.deduction_amount = difference * charges * base_weight / 100
+			else:
+				row.difference_value = difference
+				row.deduction_amount = difference * base_amount / 100
+
+		elif deduction_type == "UNLOADING" and flt(doc.gross_weight):
+			row.deduction_amount = flt(doc.gross_weight) * charges / 100
+
+		elif deduction_type == "Others" and out.total_amount:
+			row.deduction_amount = out.total_amount * charges / 100
+
+		elif deduction_type == "PP":
+			# PP is charged per quintal of goods that came in plastic bags
+			row.deduction_amount = plastic_weight * charges / 100
+
+
+def get_tiered_difference(actual, required, tier_ranges):
+	"""
+	Weighted Moise difference: each tier's share of (actual - required) is
+	multiplied by the tier multiplier.
+	"""
+	if actual <= required:
+		return 0
+
+	if not tier_ranges:
+		return actual - required
+
+	weighted_difference = 0
+	tiers = sorted(tier_ranges, key=lambda tier: flt(tier.get("range_from")))
+
+	for i, tier in enumerate(tiers):
+		tier_start = flt(tier.get("range_from"))
+		if actual <= tier_start:
+			break
+
+		# The first tier starts counting from the required value
+		range_start = max(tier_start, required) if i == 0 else tier_start
+		range_end = min(flt(tier.get("range_to")), actual)
+
+		if range_end > range_start:
+			weighted_difference += (range_end - range_start) * flt(tier.get("multiplier"))
+
+	return weighted_difference
+
+
+def calculate_taxes(doc, out, previous_purchases=0):
+	"""GST, TCS, TDS 194Q, broker commission and net total."""
+	sub_total = out.sub_total
+
+	out.cgst_amount = sub_total * flt(doc.cgst_percent) / 100
+	out.sgst_amount = sub_total * flt(doc.sgst_percent) / 100
+	out.igst_amount = sub_total * flt(doc.igst_percent) / 100
+	out.total_gst_amount = out.cgst_amount + out.sgst_amount + out.igst_amount
+	out.tcs_amount = sub_total * flt(doc.tcs_percent) / 100
+
+	pre_tds_net_total = sub_total + out.total_gst_amount + out.tcs_amount
+	if doc.customer:
+		out.tds_percent, out.tds_amount = calculate_tds_194q(pre_tds_net_total, previous_purchases)
+	else:
+		out.tds_percent, out.tds_amount = 0, 0
+
+	# Broker commission is kept for records only, it does not change the net total
+	out.broker_commission_amount = out.total_gross_weight * flt(doc.broker_commission_percent) / 100
+
+	out.net_total = math.floor(pre_tds_net_total - out.tds_amount)
+
+
+def calculate_tds_194q(net_total, previous_purchases=0):
+	"""
+	Return (tds_percent, tds_amount) for one purchase under section 194Q.
+
+	TDS applies only to the part of the fiscal year's cumulative purchases
+	from the seller that is above the threshold.
+	"""
+	if net_total <= 0:
+		return 0, 0
+
+	previous_purchases = flt(previous_purchases)
+	if previous_purchases >= TDS_194Q_THRESHOLD:
+		taxable_amount = net_total
+	elif previous_purchases + net_total > TDS_194Q_THRESHOLD:
+		taxable_amount = previous_purchases + net_total - TDS_194Q_THRESHOLD
+	else:
+		return 0, 0
+
+	return TDS_194Q_RATE, round_half_up(taxable_amount * TDS_194Q_RATE / 100)
+
+
+def calculate_payments(doc, out):
+	"""
+	Payment summary from successful Inward Payment rows, and the note of the
+	latest payment row (by payment date, then row order) whatever its status.
+	"""
+	total_amount_paid = 0
+	last_payment_date = None
+	latest_payment = None
+
+	for payment in doc.get("inward_payments") or []:
+		payment = frappe._dict(payment)
+		if payment.payment_status == "success" and flt(payment.payment_amount):
+			total_amount_paid += flt(payment.payment_amount)
+			if payment.payment_date and (not last_payment_date or getdate(payment.payment_date) > last_payment_date):
+				last_payment_date = getdate(payment.payment_date)
+
+		if payment.payment_date and (
+			not latest_payment or getdate(payment.payment_date) >= getdate(latest_payment.payment_date)
+		):
+			latest_payment = payment
+
+	out.total_amount_paid = total_amount_paid
+	out.total_amount_pending = math.floor(max(0, out.net_total - total_amount_paid))
+	out.last_payment_date = last_payment_date
+	out.last_payment_note = latest_payment.payment_note if latest_payment else None
+
+	if total_amount_paid >= out.net_total:
+		out.inward_payment_status = "success"
+	elif total_amount_paid > 0:
+		out.inward_payment_status = "processing"
+	else:
+		out.inward_payment_status = "pending"
+
+
+def calculate_debit_note(doc, out, debit_note):
+	"""First row is the weight shortage against the vendor, second row the deductions."""
+	while len(debit_note) < 2:
+		debit_note.append(frappe._dict())
+
+	deducted_weight_kg = 0
+	if flt(doc.vendor_weight) and out.total_arrival_weight > 0:
+		deducted_weight_kg = flt(doc.vendor_weight) - out.total_arrival_weight
+
+	shortage = debit_note[0]
+	shortage.particulars = shortage.particulars or "Weight Shortage"
+	shortage.deducted_weight_kg = deducted_weight_kg
+	shortage.amount = deducted_weight_kg * flt(doc.rate_per_quintal) / 100 if deducted_weight_kg > 0 else 0
+
+	quality = debit_note[1]
+	quality.particulars = quality.particulars or "Quality and other deductions"
+	quality.amount = out.total_deductions
+
+
+def round_half_up(value):
+	return math.floor(flt(value) + 0.5)
+
+
+def get_calculation_settings():
+	settings = frappe.get_cached_doc("App Settings")
+	return {
+		"default_bag_types": [row.as_dict() for row in settings.get("default_bag_types") or []],
+		"default_deduction_types": [row.as_dict() for row in settings.get("default_deduction_types") or []],
+		"deduction_tier_range": [row.as_dict() for row in settings.get("deduction_tier_range") or []],
+	}
+
+
+def get_previous_purchases(customer, bill_date=None, exclude_inward=None):
+	"""
+	Customer's purchases (sub total + GST + TCS) in the fiscal year of bill_date,
+	less what exclude_inward has already contributed to that total.
+	"""
+	if not customer:
+		return 0
+
+	total = get_cumulative_purchases(customer, bill_date)
+
+	if exclude_inward:
+		posted = frappe.db.get_value(
+			"Inward",
+			exclude_inward,
+			["customer", "bill_date", "docstatus", "sub_total", "total_gst_amount", "tcs_amount"],
+			as_dict=True,
+		)
+		if (
+			posted
+			and posted.docstatus < 2
+			and posted.customer == customer
+			and posted.bill_date
+			and get_fiscal_year(posted.bill_date) == get_fiscal_year(bill_date)
+		):
+			total -= get_purchase_amount(posted)
+
+	return total
+
+
+def get_inward_values(doc):
+	"""Load settings and earlier purchases for the doc and run the calculation."""
+	doc = frappe._dict(doc)
+	return calculate_inward(
+		doc,
+		settings=get_calculation_settings(),
+		previous_purchases=get_previous_purchases(doc.customer, doc.bill_date, doc.name),
+	)
+
+
+@frappe.whitelist()
+def get_inward_calculation(doc):
+	"""
+	Return all computed Inward fields for the form in one call.
+
+	Args:
+		doc: the Inward being edited, as JSON
+	"""
+	doc = frappe.parse_json(doc)
+	frappe.has_permission("Inward", "write", throw=True)
+
+	values = get_inward_values(doc)
+	return {
+		**{fieldname: values[fieldname] for fieldname in PARENT_FIELDS},
+		**{
+			table: [{fieldname: row.get(fieldname) for fieldname in fields} for row in values[table]]
+			for table, fields in CHILD_FIELDS.items()
+		},
+	}
+
+
+def validate(doc, method=None):
+	"""Recompute all totals on save (doc_events hook, Inward is a custom DocType)."""
+	values = get_inward_values(doc.as_dict())
+
+	for fieldname in PARENT_FIELDS:
+		doc.set(fieldname, values[fieldname])
+
+	for table, fields in CHILD_FIELDS.items():
+		rows = doc.get(table) or []
+		for idx, computed in enumerate(values[table]):
+			row = rows[idx] if idx < len(rows) else doc.append(table, {})
+			for fieldname in fields:
+				row.set(fieldname, computed.get(fieldname))
+
+
+def rebuild_payment_summary():
+	"""
+	Recompute the payment summary of every Inward from its payment rows, as
+	calculate_payments does on save.
+
+	bench --site [sitename] execute kisan_warehouse.utils.inward_calculations.rebuild_payment_summary
+	"""
+	frappe.db.sql(
+		"""
+		UPDATE `tabInward` i
+		LEFT JOIN (
+			SELECT parent,
+				SUM(IF(payment_status = 'success', payment_amount, 0)) as paid,
+				MAX(IF(payment_status = 'success' AND payment_amount != 0, payment_date, NULL)) as last_payment_date
+			FROM `tabInward Payment`
+			WHERE parenttype = 'Inward'
+			GROUP BY parent
+		) p ON p.parent = i.name
+		LEFT JOIN (
+			SELECT parent, payment_note,
+				ROW_NUMBER() OVER (PARTITION BY parent ORDER BY payment_date DESC, idx DESC) as row_no
+			FROM `tabInward Payment`
+			WHERE parenttype = 'Inward' AND payment_date IS NOT NULL
+		) n ON n.parent = i.name AND n.row_no = 1
+		SET i.total_amount_paid = COALESCE(p.paid, 0),
+			i.total_amount_pending = FLOOR(GREATEST(0, COALESCE(i.net_total, 0) - COALESCE(p.paid, 0))),
+			i.last_payment_date = p.last_payment_date,
+			i.last_payment_note = n.payment_note,
+			i.inward_payment_status = CASE
+				WHEN COALESCE(p.paid, 0) >= COALESCE(i.net_total, 0) THEN 'success'
+				WHEN COALESCE(p.paid, 0) > 0 THEN 'processing'
+				ELSE 'pending'
+			END
+		"""
+	)
+	frappe.db.commit()
@@ -0,0 +1,130 @@
+"""
+Everything the Inward form needs when it opens or a Sauda is picked, in one call.
+
+The form used to fetch the Sauda, the customer's type and taxes, the broker's
+commission, App Settings (three times over, for bag types, deduction types and
+debit note rates) and every link title separately. get_inward_form_data
+returns all of it in a single payload, so a new Inward costs one round trip.
+"""
+
+import frappe
+from frappe.utils import flt
+
+from kisan_warehouse.utils.inward_calculations import (
+	TDS_194Q_THRESHOLD,
+	get_calculation_settings,
+)
+from kisan_warehouse.utils.link_titles import get_doc_link_titles
+from kisan_warehouse.utils.purchase_ledger import get_cumulative_purchases, get_fiscal_year
+
+# Inward field -> Sauda field it is prefilled from
+SAUDA_PREFILL_FIELDS = {
+	"customer": "customer",
+	"warehouse": "warehouse",
+	"product": "product",
+	"broker": "broker",
+	"payment_due_date": "payment_end_date",
+	"gross_weight": "expected_quantity",
+	"rate_per_quintal": "sauda_rate",
+	"vendor_amount": "total_amount",
+	"company": "company",
+}
+
+CUSTOMER_FIELDS = ["customer_type", "gstin", "cgst_percent", "sgst_percent", "igst_percent"]
+
+BAG_TYPE_FIELDS = ["bag_type", "charges"]
+
+DEDUCTION_TYPE_FIELDS = [
+	"deduction_name",
+	"deduction_category",
+	"required_value",
+	"charges_per_unit",
+	"is_active",
+	"description",
+	"has_tiered_calculation",
+]
+
+TIER_RANGE_FIELDS = ["range_from", "range_to", "multiplier"]
+
+# Inward links the payload is for; their titles are sent along
+LINK_FIELDS = ("customer", "broker", "warehouse", "product")
+
+
+@frappe.whitelist()
+def get_inward_form_data(sauda=None, customer=None, broker=None, warehouse=None, product=None, bill_date=None):
+	"""
+	Return the Inward form's bootstrap payload.
+
+	Args:
+		sauda: Sauda picked on the form; its values take the place of the
+			customer, broker, warehouse and product arguments
+		customer, broker, warehouse, product: the form's current links
+		bill_date: the Inward's bill date, for the fiscal year purchase total
+
+	Links passed as arguments need read permission on the linked document;
+	links prefilled from a Sauda the user can read do not. Titles are only
+	sent for documents the user's User Permissions allow.
+
+	Returns:
+		dict: links (the customer, broker, warehouse and product the payload
+			is for), sauda (Inward values to prefill), customer (type and taxes),
+			broker (commission rate), settings (bag types, deduction types,
+			tier ranges and debit note GST rates), titles ({doctype: {name: title}})
+			and purchases (the customer's fiscal year total for TDS 194Q)
+	"""
+	frappe.has_permission("Inward", "read", throw=True)
+
+	links = {"customer": customer, "broker": broker, "warehouse": warehouse, "product": product}
+
+	prefill = {}
+	if sauda:
+		frappe.has_permission("Sauda", "read", sauda, throw=True)
+		values = frappe.db.get_value("Sauda", sauda, list(SAUDA_PREFILL_FIELDS.values()), as_dict=True) or {}
+		prefill = {fieldname: values.get(source) for fieldname, source in SAUDA_PREFILL_FIELDS.items()}
+		links.update({fieldname: prefill[fieldname] for fieldname in LINK_FIELDS})
+	else:
+		meta = frappe.get_meta("Inward")
+		for fieldname in LINK_FIELDS:
+			if links[fieldname]:
+				frappe.has_permission(meta.get_field(fieldname).options, "read", links[fieldname], throw=True)
+
+	customer_values = {}
+	if links["customer"]:
+		customer_values = frappe.db.get_value("Customer", links["customer"], CUSTOMER_FIELDS, as_dict=True) or {}
+
+	broker_values = {}
+	if links["broker"]:
+		broker_values = {"commission_rate": flt(frappe.db.get_value("Broker", links["broker"], "commission_rate"))}
+
+	return {
+		"links": links,
+		"sauda": prefill,
+		"customer": customer_values,
+		"broker": broker_values,
+		"settings": get_form_settings(),
+		"titles": get_doc_link_titles("Inward", links, check_permissions=True),
+		"purchases": {
+			"fiscal_year": get_fiscal_year(bill_date),
+			"purchase_amount": get_cumulative_purchases(links["customer"], bill_date),
+			"threshold": TDS_194Q_THRESHOLD,
+		},
+	}
+
+
+def get_form_settings():
+	"""App Settings tables and debit note GST rates, trimmed to the fields the form reads."""
+	settings = get_calculation_settings()
+	app_settings = frappe.get_cached_doc("App Settings")
+
+	return {
+		"bag_types": pick(settings["default_bag_types"], BAG_TYPE_FIELDS),
+		"deduction_types": pick(settings["default_deduction_types"], DEDUCTION_TYPE_FIELDS),
+		"tier_ranges": pick(settings["deduction_tier_range"], TIER_RANGE_FIELDS),
+		"debit_note_cgst_rate": flt(app_settings.debit_note_cgst_rate),
+		"debit_note_sgst_rate": flt(app_settings.debit_note_sgst_rate),
+		"debit_note_igst_rate": flt(app_settings.debit_note_igst_rate),
+	}
+
+
+def pick(rows, fields):
+	return [{fieldname: row.get(fieldname) for fieldname in fields} for row in rows]
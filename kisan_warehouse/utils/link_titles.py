@@ -0,0 +1,80 @@
+"""
+Titles of linked documents, many at a time.
+
+Forms show a Link field's title instead of its name for DocTypes with "Show
+Title in Link Fields". Frappe fetches those one field at a time; here every
+title a form needs is read with one query per DocType, and the client keeps
+them in a shared cache (public/js/link_titles.js).
+"""
+
+import frappe
+
+# Names resolved per request
+MAX_LINK_TITLES = 500
+
+
+@frappe.whitelist()
+def get_link_titles(names):
+	"""
+	Titles for {doctype: [names]}, as {doctype: {name: title}}.
+
+	DocTypes the user cannot read or select, or that show names in links, are
+	left out, as are names that do not exist or that the user's User
+	Permissions do not allow.
+	"""
+	names = frappe.parse_json(names) or {}
+	if sum(len(doctype_names or []) for doctype_names in names.values()) > MAX_LINK_TITLES:
+		frappe.throw(frappe._("Ask for at most {0} link titles at a time").format(MAX_LINK_TITLES))
+
+	names = {doctype: doctype_names for doctype, doctype_names in names.items() if frappe.db.exists("DocType", doctype)}
+	return get_titles(names, check_permissions=True)
+
+
+def get_titles(names, check_permissions=False):
+	"""
+	{doctype: [names]} -> {doctype: {name: title}}, one query per DocType.
+
+	With check_permissions, DocTypes the user cannot read or select are left
+	out and rows are read with frappe.get_list so User Permissions apply;
+	otherwise without any permission check.
+	"""
+	get_rows = frappe.get_list if check_permissions else frappe.get_all
+	titles = {}
+	for doctype, doctype_names in names.items():
+		if check_permissions and not (
+			frappe.has_permission(doctype, "select") or frappe.has_permission(doctype, "read")
+		):
+			continue
+
+		doctype_names = list({name for name in doctype_names or [] if name})
+		title_field = get_title_field(doctype)
+		if not doctype_names or not title_field:
+			continue
+
+		rows = get_rows(
+			doctype,
+			filters={"name": ("in", doctype_names)},
+			fields=["name", f"{title_field} as title"],
+			limit_page_length=0,
+		)
+		titles[doctype] = {row.name: row.title or row.name for row in rows}
+
+	return titles
+
+
+def get_doc_link_titles(doctype, values, check_permissions=False):
+	"""Titles of the Link fields of doctype that are filled in values (a dict of field values)."""
+	names = {}
+	for df in frappe.get_meta(doctype).get_link_fields():
+		if values.get(df.fieldname):
+			names.setdefault(df.options, []).append(values[df.fieldname])
+	return get_titles(names, check_permissions=check_permissions)
+
+
+def get_title_field(doctype):
+	"""The title field shown in links, or None when links show the name."""
+	meta = frappe.get_meta(doctype)
+	title_field = meta.get_title_field()
+	if not meta.show_title_field_in_link or title_field == "name":
+		return None
+	return title_field
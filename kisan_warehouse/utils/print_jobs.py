@@ -0,0 +1,145 @@
+"""
+Background PDF print jobs for list view selections.
+
+The selection is rendered in chunks in a background job, each chunk is turned
+into PDF pages and added to one merged PDF, which is saved as a private File.
+The user is told about progress and the finished file over realtime
+(`kisan_print_job`), so large selections never hold up a web worker.
+"""
+
+from io import BytesIO
+
+import frappe
+from frappe import _
+from frappe.utils import now_datetime
+from frappe.utils.pdf import get_pdf
+from pypdf import PdfReader, PdfWriter
+
+from kisan_warehouse.warehouse_rent.doctype.outward_jawak.multi_print import (
+	get_print_docs,
+	parse_doc_ids,
+	render_print_docs,
+)
+
+# Print Format -> (DocType, whether the template renders many records at once via all_docs)
+PRINT_JOB_FORMATS = {
+	"Gate Pass": ("Outward Jawak", True),
+	"Purchase Receipt": ("Outward Jawak", True),
+	"Inward Receipt": ("Inward", False),
+	"Outward Tax Invoice": ("Outward", False),
+	"Inward Aawak Receipt": ("Inward Aawak", False),
+}
+
+# Records rendered into PDF at a time
+PRINT_JOB_CHUNK_SIZE = 50
+
+# Largest selection one job accepts
+MAX_PRINT_JOB_RECORDS = 5000
+
+
+@frappe.whitelist()
+def enqueue_print_job(print_format, doc_ids):
+	"""
+	Queue a PDF of the selected documents in the given Print Format.
+
+	Args:
+		print_format: one of PRINT_JOB_FORMATS
+		doc_ids: Comma-separated string of document IDs or list of IDs
+
+	Returns:
+		dict: job_id and the number of documents queued
+	"""
+	if print_format not in PRINT_JOB_FORMATS:
+		frappe.throw(_("Print Format {0} cannot be printed in the background").format(print_format))
+
+	doctype = PRINT_JOB_FORMATS[print_format][0]
+	id_list = parse_doc_ids(doc_ids)
+	if len(id_list) > MAX_PRINT_JOB_RECORDS:
+		frappe.throw(_("Select at most {0} records for one print job").format(MAX_PRINT_JOB_RECORDS))
+
+	# Permission is checked here, while the request still runs as the user
+	permitted = set(frappe.get_list(doctype, filters={"name": ("in", id_list)}, pluck="name", limit_page_length=0))
+	missing = [doc_id for doc_id in id_list if doc_id not in permitted]
+	if missing:
+		frappe.throw(_("{0} {1} not found").format(_(doctype), ", ".join(missing)))
+
+	print_job_id = frappe.generate_hash(length=10)
+	frappe.enqueue(
+		"kisan_warehouse.utils.print_jobs.build_print_pdf",
+		queue="long",
+		timeout=3600,
+		print_format=print_format,
+		doc_ids=id_list,
+		print_job_id=print_job_id,
+	)
+
+	return {"job_id": print_job_id, "count": len(id_list)}
+
+
+def build_print_pdf(print_format, doc_ids, print_job_id=None):
+	"""Background job: render the documents chunk by chunk, merge the PDF and notify the user."""
+	doctype, multi_record = PRINT_JOB_FORMATS[print_format]
+	user = frappe.session.user
+
+	try:
+		output = PdfWriter()
+		for start in range(0, len(doc_ids), PRINT_JOB_CHUNK_SIZE):
+			chunk = doc_ids[start : start + PRINT_JOB_CHUNK_SIZE]
+			if multi_record:
+				add_multi_record_pages(output, print_format, doctype, chunk)
+			else:
+				for name in chunk:
+					frappe.get_print(doctype, name, print_format, as_pdf=True, output=output)
+
+			publish_print_job(
+				user,
+				print_job_id,
+				"Progress",
+				print_format=print_format,
+				done=start + len(chunk),
+				total=len(doc_ids),
+			)
+
+		content = BytesIO()
+		output.write(content)
+
+		file = frappe.get_doc(
+			{
+				"doctype": "File",
+				"file_name": "{0} {1}.pdf".format(print_format, now_datetime().strftime("%Y-%m-%d %H%M%S")),
+				"is_private": 1,
+				"content": content.getvalue(),
+			}
+		).insert(ignore_permissions=True)
+		frappe.db.commit()
+
+		publish_print_job(
+			user,
+			print_job_id,
+			"Completed",
+			print_format=print_format,
+			total=len(doc_ids),
+			file_url=file.file_url,
+		)
+
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title=_("Print Job Failed: {0}").format(print_format))
+		publish_print_job(user, print_job_id, "Failed", print_format=print_format)
+
+
+def add_multi_record_pages(output, print_format, doctype, names):
+	"""Render one chunk through a multi-record template (all_docs) and append its pages."""
+	html = render_print_docs(print_format, get_print_docs(doctype, names))
+	pdf = get_pdf(f'<html><head><meta charset="utf-8"></head><body>{html}</body></html>')
+	for page in PdfReader(BytesIO(pdf)).pages:
+		output.add_page(page)
+
+
+def publish_print_job(user, print_job_id, status, **data):
+	frappe.publish_realtime(
+		"kisan_print_job",
+		{"job_id": print_job_id, "status": status, **data},
+		user=user,
+		after_commit=False,
+	)
@@ -0,0 +1,155 @@
+import frappe
+from frappe.utils import flt, getdate, now, nowdate
+
+
+def on_update(doc, method=None):
+	"""Re-post the Inward: take back what the saved version added, add the new one."""
+	previous = doc.get_doc_before_save()
+	if previous and previous.docstatus < 2:
+		post_purchase(previous, -1)
+	if doc.docstatus < 2:
+		post_purchase(doc, 1)
+
+
+def on_cancel(doc, method=None):
+	post_purchase(doc, -1)
+
+
+def on_trash(doc, method=None):
+	# Cancelled documents were already reversed in on_cancel
+	if doc.docstatus < 2:
+		post_purchase(doc, -1)
+
+
+def post_purchase(doc, sign):
+	"""Add (sign=1) or remove (sign=-1) one Inward from its customer's fiscal year total."""
+	if not (doc.customer and doc.bill_date):
+		return
+
+	update_purchase_total(
+		doc.customer,
+		get_fiscal_year(doc.bill_date),
+		inward_count=sign,
+		purchase_amount=sign * get_purchase_amount(doc),
+	)
+
+
+def get_purchase_amount(doc):
+	"""Amount counted towards 194Q: sub total + GST + TCS."""
+	return flt(doc.sub_total) + flt(doc.total_gst_amount) + flt(doc.tcs_amount)
+
+
+def update_purchase_total(customer, fiscal_year, inward_count=0, purchase_amount=0):
+	"""Atomically add to the (customer, fiscal year) row."""
+	values = {
+		"name": get_purchase_total_key(customer, fiscal_year),
+		"customer": customer,
+		"fiscal_year": fiscal_year,
+		"inward_count": inward_count,
+		"purchase_amount": purchase_amount,
+		"now": now(),
+		"user": frappe.session.user,
+	}
+
+	frappe.db.sql(
+		"""
+		INSERT INTO `tabCustomer Purchase Total`
+			(name, creation, modified, owner, modified_by, docstatus,
+			customer, fiscal_year, inward_count, purchase_amount)
+		VALUES
+			(%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+			%(customer)s, %(fiscal_year)s, %(inward_count)s, %(purchase_amount)s)
+		ON DUPLICATE KEY UPDATE
+			inward_count = inward_count + VALUES(inward_count),
+			purchase_amount = purchase_amount + VALUES(purchase_amount),
+			modified = VALUES(modified), modified_by = VALUES(modified_by)
+		""",
+		values,
+	)
+
+	frappe.db.sql(
+		"""
+		DELETE FROM `tabCustomer Purchase Total`
+		WHERE name = %s AND inward_count <= 0
+		""",
+		values["name"],
+	)
+
+
+def get_cumulative_purchases(customer, date=None):
+	"""Customer's purchase total in the fiscal year of the given date (primary key lookup)."""
+	if not customer:
+		return 0
+
+	return flt(
+		frappe.db.get_value(
+			"Customer Purchase Total",
+			get_purchase_total_key(customer, get_fiscal_year(date)),
+			"purchase_amount",
+		)
+	)
+
+
+def get_purchase_total_key(customer, fiscal_year):
+	return f"{customer}|{fiscal_year}"
+
+
+def get_fiscal_year(date=None):
+	"""Indian fiscal year (April to March) label, e.g. 2025-26."""
+	start_date, end_date = get_fiscal_year_dates(date)
+	return f"{start_date.year}-{str(end_date.year)[-2:]}"
+
+
+def get_fiscal_year_dates(date=None):
+	"""Start and end date of the Indian fiscal year that the date falls in."""
+	date = getdate(date or nowdate())
+	start_year = date.year if date.month >= 4 else date.year - 1
+	return getdate(f"{start_year}-04-01"), getdate(f"{start_year + 1}-03-31")
+
+
+def rebuild_purchase_totals(fiscal_year=None):
+	"""
+	Rebuild Customer Purchase Totals from existing Inwards, for one fiscal year
+	(e.g. "2024-25") or all of them.
+
+	bench --site [sitename] execute kisan_warehouse.utils.purchase_ledger.rebuild_purchase_totals --kwargs "{'fiscal_year': '2024-25'}"
+	"""
+	conditions = ""
+	values = {}
+	if fiscal_year:
+		start_date, end_date = get_fiscal_year_dates(f"{fiscal_year[:4]}-04-01")
+		conditions = "AND i.bill_date >= %(start_date)s AND i.bill_date < DATE_ADD(%(end_date)s, INTERVAL 1 DAY)"
+		values = {"fiscal_year": fiscal_year, "start_date": start_date, "end_date": end_date}
+		frappe.db.sql("DELETE FROM `tabCustomer Purchase Total` WHERE fiscal_year = %(fiscal_year)s", values)
+	else:
+		frappe.db.sql("DELETE FROM `tabCustomer Purchase Total`")
+
+	frappe.db.sql(
+		"""
+		INSERT INTO `tabCustomer Purchase Total`
+			(name, creation, modified, owner, modified_by, docstatus,
+			customer, fiscal_year, inward_count, purchase_amount)
+		SELECT
+			CONCAT_WS('|', fy.customer, fy.fiscal_year),
+			NOW(), NOW(), 'Administrator', 'Administrator', 0,
+			fy.customer, fy.fiscal_year, COUNT(*), SUM(fy.purchase_amount)
+		FROM (
+			SELECT
+				i.customer,
+				CONCAT(
+					YEAR(i.bill_date) - IF(MONTH(i.bill_date) < 4, 1, 0), '-',
+					RIGHT(YEAR(i.bill_date) + IF(MONTH(i.bill_date) < 4, 0, 1), 2)
+				) as fiscal_year,
+				COALESCE(i.sub_total, 0) + COALESCE(i.total_gst_amount, 0) + COALESCE(i.tcs_amount, 0) as purchase_amount
+			FROM `tabInward` i
+			WHERE i.docstatus < 2
+				AND IFNULL(i.customer, '') != ''
+				AND i.bill_date IS NOT NULL
+				{conditions}
+		) fy
+		GROUP BY fy.customer, fy.fiscal_year
+		""".format(conditions=conditions),
+		values,
+	)
+
+	frappe.db.commit()
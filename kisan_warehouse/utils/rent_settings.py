@@ -0,0 +1,56 @@
+import hashlib
+import json
+
+import frappe
+from frappe.utils import cint
+
+RENT_SETTINGS_CACHE_KEY = "kisan_warehouse:rent_settings"
+
+# Used when the field is empty in App Settings
+DEFAULT_RENT_SETTINGS = {
+	"days_per_month": 30,
+	"minimum_chargeable_days": 15,
+	"extra_days_after_minimum": 2,
+}
+
+
+def get_rent_settings():
+	"""
+	Rent calculation settings from App Settings, with a `version` hash of the
+	values. Cached in Redis until App Settings is saved again.
+	"""
+	settings = frappe.cache().get_value(RENT_SETTINGS_CACHE_KEY)
+	if settings:
+		return frappe._dict(settings)
+
+	# Only the three scalar fields, not the deduction/bag/tier child tables
+	values = frappe.db.get_values_from_single(
+		list(DEFAULT_RENT_SETTINGS), None, "App Settings", as_dict=True
+	)
+	values = values[0] if values else {}
+
+	settings = {
+		fieldname: cint(values.get(fieldname)) or default
+		for fieldname, default in DEFAULT_RENT_SETTINGS.items()
+	}
+	settings["version"] = hashlib.md5(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+	frappe.cache().set_value(RENT_SETTINGS_CACHE_KEY, settings)
+	return frappe._dict(settings)
+
+
+@frappe.whitelist()
+def get_rent_settings_payload(version=None):
+	"""
+	Return the rent settings for the client, or only `{"version", "unchanged"}`
+	when the client's cached copy (sent as version) is still current.
+	"""
+	settings = get_rent_settings()
+	if version and version == settings.version:
+		return {"version": version, "unchanged": 1}
+	return settings
+
+
+def clear_rent_settings_cache(doc=None, method=None):
+	"""doc_events hook: App Settings was saved."""
+	frappe.cache().delete_value(RENT_SETTINGS_CACHE_KEY)
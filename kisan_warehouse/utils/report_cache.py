@@ -0,0 +1,159 @@
+"""
+Result cache for the script reports.
+
+A report's (columns, data) is cached in Redis under its name, the normalized
+filters, the user's permission scope (roles and user permissions) and today's
+date, for `kisan_report_cache_ttl` seconds (site config, 0 turns caching off).
+
+Each report lists the DocTypes it reads. Every one of them has a version in
+Redis that is part of the cache key; doc_events on those DocTypes replace the
+version once the change is committed (payment rows are saved with their
+parent, so the parent's events cover them), so
+the next run misses and recomputes, while untouched reports keep being served
+from the cache. Master data (customer, product, warehouse names) is not
+tracked and may show stale names for up to the TTL.
+
+Hits and misses are counted per report (get_report_cache_stats).
+"""
+
+import functools
+import hashlib
+import json
+
+import frappe
+from frappe import _
+from frappe.core.doctype.user_permission.user_permission import get_user_permissions
+from frappe.utils import cint, nowdate
+
+REPORT_CACHE_PREFIX = "kisan_warehouse:report_cache"
+
+DEFAULT_REPORT_CACHE_TTL = 600
+
+# Report -> DocTypes whose changes invalidate it
+REPORT_DEPENDENCIES = {
+	"Stock by Warehouse": ("Inward", "Outward"),
+	"Stock by Product": ("Inward", "Outward"),
+	"Pending Saudas": ("Sauda", "Outward"),
+	"Payment Pending Inwards": ("Inward", "Sauda"),
+	"Payment Pending Outwards": ("Outward", "Sauda"),
+	"Tally Inward Report": ("Inward", "Sauda"),
+	"Tally Outward Report": ("Outward", "Sauda"),
+}
+
+
+def cache_report(report_name):
+	"""Decorator for a report's execute(filters) that serves results from the cache."""
+
+	def decorator(execute):
+		@functools.wraps(execute)
+		def wrapper(filters=None):
+			ttl = get_report_cache_ttl()
+			if ttl <= 0:
+				return execute(filters)
+
+			# Keyed before execute(), which adds defaults and query values to filters
+			key = get_cache_key(report_name, filters)
+			result = frappe.cache().get_value(key)
+			if result is not None:
+				count_request(report_name, "hits")
+				return result
+
+			count_request(report_name, "misses")
+			result = execute(filters)
+			frappe.cache().set_value(key, result, expires_in_sec=ttl)
+			return result
+
+		return wrapper
+
+	return decorator
+
+
+def get_report_cache_ttl():
+	return cint(frappe.conf.get("kisan_report_cache_ttl", DEFAULT_REPORT_CACHE_TTL))
+
+
+def get_cache_key(report_name, filters=None):
+	filters = {
+		fieldname: value
+		for fieldname, value in (filters or {}).items()
+		if value not in (None, "", [])
+	}
+	scope = {
+		"roles": sorted(frappe.get_roles()),
+		"user_permissions": get_user_permissions(),
+	}
+	versions = [get_version(doctype) for doctype in REPORT_DEPENDENCIES[report_name]]
+
+	digest = hashlib.md5(
+		json.dumps([filters, scope, versions, nowdate()], sort_keys=True, default=str).encode()
+	).hexdigest()
+	return f"{REPORT_CACHE_PREFIX}:{report_name}:{digest}"
+
+
+def get_version(doctype):
+	version = frappe.cache().get_value(get_version_key(doctype))
+	if not version:
+		version = frappe.generate_hash(length=10)
+		frappe.cache().set_value(get_version_key(doctype), version)
+	return version
+
+
+def get_version_key(doctype):
+	return f"{REPORT_CACHE_PREFIX}:version:{doctype}"
+
+
+def invalidate(doc, method=None):
+	"""
+	doc_events hook: the reports reading this DocType are stale once the change
+	is committed (payment rows count as their parent Inward or Outward).
+	"""
+	doctype = doc.get("parenttype") or doc.doctype
+	frappe.db.after_commit.add(lambda: clear_doctype(doctype))
+
+
+def clear_doctype(doctype):
+	frappe.cache().set_value(get_version_key(doctype), frappe.generate_hash(length=10))
+
+
+def get_stats_key(report_name, counter):
+	return frappe.cache().make_key(f"{REPORT_CACHE_PREFIX}:stats:{report_name}:{counter}")
+
+
+def count_request(report_name, counter):
+	frappe.cache().incr(get_stats_key(report_name, counter))
+
+
+@frappe.whitelist()
+def get_report_cache_stats():
+	"""Hits, misses and hit rate of every cached report since the last reset."""
+	frappe.only_for("System Manager")
+
+	stats = []
+	for report_name in REPORT_DEPENDENCIES:
+		hits = cint(frappe.cache().get(get_stats_key(report_name, "hits")))
+		misses = cint(frappe.cache().get(get_stats_key(report_name, "misses")))
+		stats.append(
+			{
+				"report": report_name,
+				"hits": hits,
+				"misses": misses,
+				"hit_rate": round(hits * 100 / (hits + misses), 1) if hits + misses else 0,
+			}
+		)
+
+	return {"ttl": get_report_cache_ttl(), "reports": stats}
+
+
+@frappe.whitelist(methods=["POST"])
+def clear_report_cache(reset_stats=0):
+	"""Invalidate every cached report result, and optionally reset the counters."""
+	frappe.only_for("System Manager")
+
+	for doctype in {doctype for dependencies in REPORT_DEPENDENCIES.values() for doctype in dependencies}:
+		clear_doctype(doctype)
+
+	if cint(reset_stats):
+		for report_name in REPORT_DEPENDENCIES:
+			frappe.cache().delete(get_stats_key(report_name, "hits"), get_stats_key(report_name, "misses"))
+
+	frappe.msgprint(_("Report cache cleared"), alert=True)
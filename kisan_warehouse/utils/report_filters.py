@@ -0,0 +1,112 @@
+"""
+Shared date-range filters and indexes for the script reports.
+
+Date ranges are emitted as half-open, parameterized predicates on the bare
+column (`col >= %(x_from)s AND col < %(x_to)s`, the end being the day after
+the last date asked for), so they work the same for Date and Datetime columns
+and the database can range-scan an index on the column. Nothing is wrapped in
+DATE() and no value is formatted into the SQL.
+
+The composite indexes the reports filter on are added after every migrate
+(add_report_indexes), since most of the doctypes involved are custom DocTypes
+without a controller to declare them in.
+"""
+
+import frappe
+from frappe.utils import add_days, add_months, get_first_day, getdate, today
+
+# DocType -> composite indexes (column lists) used by the report filters
+REPORT_INDEXES = {
+	"Inward": [
+		["arrival_date"],
+		["docstatus", "warehouse", "arrival_date"],
+		["inward_payment_status", "payment_due_date"],
+	],
+	"Outward": [
+		["docstatus", "warehouse", "outward_date"],
+		["payment_status", "payment_due_date"],
+	],
+	"Sauda": [
+		["booking_type", "delivery_end_date"],
+		["delivery_end_date", "pending_quantity"],
+	],
+}
+
+
+def get_date_range(filter_by, date_from=None, date_to=None):
+	"""
+	First day and the day after the last day of a "Filter By" selection.
+
+	Returns:
+		tuple: (start, end) dates, either None when that side is open
+	"""
+	current_date = getdate(today())
+
+	if filter_by == "Today":
+		return current_date, add_days(current_date, 1)
+	elif filter_by == "Yesterday":
+		return add_days(current_date, -1), current_date
+	elif filter_by == "Last 7 Days":
+		return add_days(current_date, -7), add_days(current_date, 1)
+	elif filter_by == "Current Month":
+		return get_first_day(current_date), add_days(current_date, 1)
+	elif filter_by == "Last Month":
+		first_day = get_first_day(current_date)
+		return add_months(first_day, -1), first_day
+	elif filter_by == "Custom":
+		return (
+			getdate(date_from) if date_from else None,
+			add_days(getdate(date_to), 1) if date_to else None,
+		)
+
+	return None, None
+
+
+def get_date_condition(column, from_date=None, to_date=None, values=None, key=None):
+	"""
+	Half-open condition for from_date <= column's date <= to_date.
+
+	Args:
+		column: column to filter, e.g. "i.arrival_date"
+		from_date, to_date: inclusive dates, either may be empty
+		values: query values to add the bounds to; a dict (named as key_from and
+			key_to) or a list (positional, in the order of the returned condition)
+		key: name for the bounds in a dict, defaults to the column's name
+
+	Returns:
+		str: condition, empty when both dates are empty
+	"""
+	return get_range_condition(
+		column,
+		getdate(from_date) if from_date else None,
+		add_days(getdate(to_date), 1) if to_date else None,
+		values,
+		key,
+	)
+
+
+def get_range_condition(column, start=None, end=None, values=None, key=None):
+	"""`column >= start AND column < end` with the bounds added to values (see get_date_condition)."""
+	key = key or column.rsplit(".", 1)[-1]
+	conditions = []
+
+	for operator, bound, suffix in ((">=", start, "from"), ("<", end, "to")):
+		if bound is None:
+			continue
+		if isinstance(values, dict):
+			values[f"{key}_{suffix}"] = bound
+			conditions.append(f"{column} {operator} %({key}_{suffix})s")
+		else:
+			values.append(bound)
+			conditions.append(f"{column} {operator} %s")
+
+	return " AND ".join(conditions)
+
+
+def add_report_indexes():
+	"""Add the REPORT_INDEXES that are missing (after_migrate; add_index skips existing ones)."""
+	for doctype, indexes in REPORT_INDEXES.items():
+		if not frappe.db.table_exists(doctype):
+			continue
+		for fields in indexes:
+			frappe.db.add_index(doctype, fields)
@@ -0,0 +1,169 @@
+import frappe
+from frappe.utils import cint, flt, getdate, now
+
+# How each voucher type feeds the ledger: posting date field, item table,
+# which item field carries the weight, and which side of the ledger it hits.
+VOUCHER_MAP = {
+	"Inward": {
+		"date_field": "arrival_date",
+		"items_field": "inward_items",
+		"item_table": "tabInward Item Detail",
+		"qty_field": "item_arrival_weight",
+		"side": "in",
+		"count_field": "inward_count",
+	},
+	"Outward": {
+		"date_field": "outward_date",
+		"items_field": "outward_items",
+		"item_table": "tabOutward Item Detail",
+		"qty_field": "item_gross_weight",
+		"side": "out",
+		"count_field": "outward_count",
+	},
+}
+
+LEDGER_FIELDS = (
+	"inward_count",
+	"in_bags",
+	"in_qty",
+	"in_value",
+	"outward_count",
+	"out_bags",
+	"out_qty",
+	"out_value",
+)
+
+
+def on_update(doc, method=None):
+	"""Re-post the voucher: reverse what was posted for the saved version, post the new one."""
+	previous = doc.get_doc_before_save()
+	if previous and previous.docstatus < 2:
+		post_voucher(previous, -1)
+	if doc.docstatus < 2:
+		post_voucher(doc, 1)
+
+
+def on_cancel(doc, method=None):
+	post_voucher(doc, -1)
+
+
+def on_trash(doc, method=None):
+	# Cancelled documents were already reversed in on_cancel
+	if doc.docstatus < 2:
+		post_voucher(doc, -1)
+
+
+def post_voucher(doc, sign):
+	"""Add (sign=1) or remove (sign=-1) one Inward/Outward from its ledger day."""
+	config = VOUCHER_MAP[doc.doctype]
+	posting_date = doc.get(config["date_field"])
+	items = doc.get(config["items_field"]) or []
+
+	if not (doc.warehouse and doc.product and posting_date and items):
+		return
+
+	bags = qty = value = 0
+	for item in items:
+		bags += cint(item.item_bags)
+		qty += flt(item.get(config["qty_field"]))
+		value += flt(item.item_amount)
+
+	side = config["side"]
+	update_ledger(
+		doc.warehouse,
+		doc.product,
+		getdate(posting_date),
+		**{
+			config["count_field"]: sign,
+			f"{side}_bags": sign * bags,
+			f"{side}_qty": sign * qty,
+			f"{side}_value": sign * value,
+		},
+	)
+
+
+def update_ledger(warehouse, product, posting_date, **deltas):
+	"""Atomically add the given deltas to the (warehouse, product, posting_date) row."""
+	values = {
+		"name": get_ledger_key(warehouse, product, posting_date),
+		"warehouse": warehouse,
+		"product": product,
+		"posting_date": posting_date,
+		"now": now(),
+		"user": frappe.session.user,
+	}
+	for fieldname in LEDGER_FIELDS:
+		values[fieldname] = deltas.get(fieldname, 0)
+
+	frappe.db.sql(
+		"""
+		INSERT INTO `tabStock Ledger Entry`
+			(name, creation, modified, owner, modified_by, docstatus,
+			warehouse, product, posting_date, {fields})
+		VALUES
+			(%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+			%(warehouse)s, %(product)s, %(posting_date)s, {placeholders})
+		ON DUPLICATE KEY UPDATE
+			{updates}, modified = VALUES(modified), modified_by = VALUES(modified_by)
+		""".format(
+			fields=", ".join(LEDGER_FIELDS),
+			placeholders=", ".join(f"%({f})s" for f in LEDGER_FIELDS),
+			updates=", ".join(f"{f} = {f} + VALUES({f})" for f in LEDGER_FIELDS),
+		),
+		values,
+	)
+
+	# Drop days that no longer carry any voucher so the table only holds real movement
+	frappe.db.sql(
+		"""
+		DELETE FROM `tabStock Ledger Entry`
+		WHERE name = %s AND inward_count <= 0 AND outward_count <= 0
+		""",
+		values["name"],
+	)
+
+
+def get_ledger_key(warehouse, product, posting_date):
+	return f"{warehouse}|{product}|{getdate(posting_date)}"
+
+
+def rebuild_stock_ledger():
+	"""
+	Rebuild the whole Stock Ledger from existing Inward and Outward records.
+
+	Use it to backfill an existing site or to repair drift:
+	bench --site [sitename] execute kisan_warehouse.utils.stock_ledger.rebuild_stock_ledger
+	"""
+	frappe.db.sql("DELETE FROM `tabStock Ledger Entry`")
+
+	for doctype, config in VOUCHER_MAP.items():
+		frappe.db.sql(
+			"""
+			INSERT INTO `tabStock Ledger Entry`
+				(name, creation, modified, owner, modified_by, docstatus,
+				warehouse, product, posting_date,
+				{count_field}, {side}_bags, {side}_qty, {side}_value)
+			SELECT
+				CONCAT_WS('|', v.warehouse, v.product, DATE(v.{date_field})),
+				NOW(), NOW(), 'Administrator', 'Administrator', 0,
+				v.warehouse, v.product, DATE(v.{date_field}),
+				COUNT(DISTINCT v.name),
+				SUM(COALESCE(it.item_bags, 0)),
+				SUM(COALESCE(it.{qty_field}, 0)),
+				SUM(COALESCE(it.item_amount, 0))
+			FROM `tab{doctype}` v
+			INNER JOIN `{item_table}` it ON it.parent = v.name AND it.parenttype = %(doctype)s
+			WHERE v.docstatus < 2
+				AND v.warehouse IS NOT NULL AND v.product IS NOT NULL
+				AND v.{date_field} IS NOT NULL
+			GROUP BY v.warehouse, v.product, DATE(v.{date_field})
+			ON DUPLICATE KEY UPDATE
+				{count_field} = {count_field} + VALUES({count_field}),
+				{side}_bags = {side}_bags + VALUES({side}_bags),
+				{side}_qty = {side}_qty + VALUES({side}_qty),
+				{side}_value = {side}_value + VALUES({side}_value)
+			""".format(doctype=doctype, **config),
+			{"doctype": doctype},
+		)
+
+	frappe.db.commit()
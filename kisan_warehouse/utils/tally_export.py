@@ -0,0 +1,353 @@
+"""
+Streaming Tally exports.
+
+Report rows are read with an unbuffered cursor and written one at a time
+into a temporary file (gzipped on request), which is then sent as a file
+download. Memory use stays flat however many vouchers the date range holds.
+
+Two formats are written:
+
+- CSV through csv.writer, so names containing quotes or commas survive the
+  round trip into Tally.
+- Tally XML import envelopes with one Purchase or Sales voucher per document,
+  carrying its ledger and inventory entries, so nothing has to be re-keyed.
+
+XML exports can be incremental: each company has a Tally Export Watermark per
+voucher type, and an incremental export only emits vouchers created or changed
+after it, then moves it forward to a few minutes before the export started.
+Saves still in flight when the export ran are picked up by the next one; the
+vouchers it sends again carry the same REMOTEID, so Tally replaces them rather
+than adding copies. Documents deleted after being exported are sent as Cancel
+vouchers.
+"""
+
+import csv
+import gzip
+import io
+import json
+import tempfile
+from xml.sax.saxutils import escape, quoteattr
+
+import frappe
+from frappe.utils import add_to_date, flt, get_datetime, getdate, now
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+# Rows kept in memory while writing the file (the temp file spills to disk beyond this)
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+# Tally ledgers the vouchers are posted to; they must exist in the Tally company
+TALLY_LEDGERS = {
+	"purchase": "Purchase",
+	"sales": "Sales",
+	"cgst": "CGST",
+	"sgst": "SGST",
+	"igst": "IGST",
+	"tcs": "TCS",
+	"tds": "TDS Payable",
+	"deductions": "Purchase Deductions",
+	"round_off": "Round Off",
+}
+
+TALLY_UNIT = "Kg"
+
+# Minutes the watermark is kept behind the start of an export, for saves that
+# were stamped before the export began but committed after it read its rows
+WATERMARK_LAG_MINUTES = 5
+
+
+def iter_rows(query, values):
+	"""Rows of the query as dicts, fetched from the server as they are consumed."""
+	with frappe.db.unbuffered_cursor():
+		yield from frappe.db.sql(query, values, as_dict=True, as_iterator=True)
+
+
+def csv_download(rows, columns, filename, compress=False):
+	"""
+	Write rows through csv.writer into a temporary file and return it as a download.
+
+	Args:
+		rows: iterable of dicts
+		columns: list of (header, fieldname)
+		filename: download name without extension
+		compress: gzip the file (.csv.gz)
+	"""
+
+	def write(text):
+		writer = csv.writer(text, quoting=csv.QUOTE_ALL)
+		writer.writerow([header for header, fieldname in columns])
+		for row in rows:
+			writer.writerow([row.get(fieldname, "") for header, fieldname in columns])
+
+	return spooled_download(write, f"{filename}.csv", "text/csv", compress)
+
+
+def xml_download(vouchers, filename, company=None, compress=False):
+	"""
+	Write vouchers into a Tally XML import envelope and return it as a download.
+
+	Args:
+		vouchers: iterable of voucher dicts (see get_voucher_xml)
+		filename: download name without extension
+		company: Tally company to import into (the open company when not set)
+		compress: gzip the file (.xml.gz)
+	"""
+
+	def write(text):
+		text.writelines(iter_envelope(vouchers, company))
+
+	return spooled_download(write, f"{filename}.xml", "application/xml", compress)
+
+
+def spooled_download(write, filename, mimetype, compress=False):
+	"""Call write(text) on a spooled temporary file and return the file as a download."""
+	output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+	stream = gzip.GzipFile(fileobj=output, mode="wb") if compress else output
+	text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+	write(text)
+
+	# Flush the text and gzip layers without closing the spooled file underneath
+	text.flush()
+	text.detach()
+	if compress:
+		stream.close()
+	output.seek(0)
+
+	response = Response(
+		wrap_file(frappe.local.request.environ, output),
+		mimetype="application/gzip" if compress else mimetype,
+		direct_passthrough=True,
+	)
+	filename = f"{filename}.gz" if compress else filename
+	response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+	return response
+
+
+def iter_envelope(vouchers, company=None):
+	"""Tally "Import Data" envelope, one chunk of text at a time."""
+	yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+	yield "<ENVELOPE>\n"
+	yield " <HEADER>\n  <TALLYREQUEST>Import Data</TALLYREQUEST>\n </HEADER>\n"
+	yield " <BODY>\n  <IMPORTDATA>\n   <REQUESTDESC>\n    <REPORTNAME>Vouchers</REPORTNAME>\n"
+	if company:
+		yield "    <STATICVARIABLES>\n"
+		yield f"     <SVCURRENTCOMPANY>{escape(company)}</SVCURRENTCOMPANY>\n"
+		yield "    </STATICVARIABLES>\n"
+	yield "   </REQUESTDESC>\n   <REQUESTDATA>\n"
+
+	for voucher in vouchers:
+		yield get_voucher_xml(voucher)
+
+	yield "   </REQUESTDATA>\n  </IMPORTDATA>\n </BODY>\n</ENVELOPE>\n"
+
+
+def get_voucher_xml(voucher):
+	"""
+	One voucher as a TALLYMESSAGE.
+
+	voucher is a dict of:
+		name: document name, sent as REMOTEID so re-imports alter the same voucher
+		voucher_type: Purchase or Sales
+		action: Create, Alter or Cancel
+		date, voucher_number, reference, party, party_gstin, state
+		inventory: list of dicts (stock_item, quantity, rate, amount, ledger)
+		ledgers: list of (ledger, amount), debits positive and credits negative;
+			the party's entry comes first
+	Cancel vouchers only need name, voucher_type, action, date and voucher_number.
+	"""
+	lines = [
+		'    <TALLYMESSAGE xmlns:UDF="TallyUDF">',
+		"     <VOUCHER REMOTEID={0} VCHTYPE={1} ACTION={2} OBJVIEW=\"Invoice Voucher View\">".format(
+			quoteattr(voucher["name"]), quoteattr(voucher["voucher_type"]), quoteattr(voucher["action"])
+		),
+		tag("DATE", getdate(voucher["date"]).strftime("%Y%m%d")),
+		tag("VOUCHERTYPENAME", voucher["voucher_type"]),
+		tag("VOUCHERNUMBER", voucher["voucher_number"]),
+	]
+
+	# Tally finds the voucher to cancel by its REMOTEID; no entries are needed
+	if voucher["action"] == "Cancel":
+		lines.extend(["     </VOUCHER>", "    </TALLYMESSAGE>"])
+		return "\n".join(line for line in lines if line) + "\n"
+
+	lines += [
+		tag("REFERENCE", voucher.get("reference")),
+		tag("PARTYLEDGERNAME", voucher["party"]),
+		tag("PARTYNAME", voucher["party"]),
+		tag("PARTYGSTIN", voucher.get("party_gstin")),
+		tag("STATENAME", voucher.get("state")),
+		tag("PERSISTEDVIEW", "Invoice Voucher View"),
+		tag("ISINVOICE", "Yes"),
+	]
+
+	party_ledger, *ledgers = voucher["ledgers"]
+	lines.extend(get_ledger_entry_xml(*party_ledger, is_party=True))
+
+	for item in voucher["inventory"]:
+		lines.extend(get_inventory_entry_xml(item))
+
+	for ledger, amount in ledgers:
+		if flt(amount, 2):
+			lines.extend(get_ledger_entry_xml(ledger, amount))
+
+	lines.append("     </VOUCHER>")
+	lines.append("    </TALLYMESSAGE>")
+	return "\n".join(line for line in lines if line) + "\n"
+
+
+def get_ledger_entry_xml(ledger, amount, is_party=False):
+	"""Tally amounts are negative for debits, with ISDEEMEDPOSITIVE set."""
+	return [
+		"      <LEDGERENTRIES.LIST>",
+		tag("LEDGERNAME", ledger, indent=7),
+		tag("ISDEEMEDPOSITIVE", "Yes" if amount > 0 else "No", indent=7),
+		tag("ISPARTYLEDGER", "Yes" if is_party else "No", indent=7),
+		tag("AMOUNT", get_tally_amount(amount), indent=7),
+		"      </LEDGERENTRIES.LIST>",
+	]
+
+
+def get_inventory_entry_xml(item):
+	amount = flt(item["amount"], 2)
+	quantity = "{0:.2f} {1}".format(flt(item["quantity"], 2), TALLY_UNIT)
+	return [
+		"      <ALLINVENTORYENTRIES.LIST>",
+		tag("STOCKITEMNAME", item["stock_item"], indent=7),
+		tag("ISDEEMEDPOSITIVE", "Yes" if amount > 0 else "No", indent=7),
+		tag("RATE", "{0:.2f}/{1}".format(flt(item["rate"], 2), TALLY_UNIT), indent=7),
+		tag("AMOUNT", get_tally_amount(amount), indent=7),
+		tag("ACTUALQTY", quantity, indent=7),
+		tag("BILLEDQTY", quantity, indent=7),
+		"       <ACCOUNTINGALLOCATIONS.LIST>",
+		tag("LEDGERNAME", item["ledger"], indent=8),
+		tag("ISDEEMEDPOSITIVE", "Yes" if amount > 0 else "No", indent=8),
+		tag("AMOUNT", get_tally_amount(amount), indent=8),
+		"       </ACCOUNTINGALLOCATIONS.LIST>",
+		"      </ALLINVENTORYENTRIES.LIST>",
+	]
+
+
+def get_tally_amount(amount):
+	return "{0:.2f}".format(-flt(amount, 2) or 0)
+
+
+def tag(name, value, indent=6):
+	"""<NAME>value</NAME>, or nothing for an empty value."""
+	if value is None or value == "":
+		return ""
+	return "{0}<{1}>{2}</{1}>".format(" " * indent, name, escape(str(value)))
+
+
+def get_watermark_key(voucher_type, company):
+	return f"{voucher_type}|{company or ''}"
+
+
+def get_watermark_join(voucher_type, company_column):
+	"""
+	LEFT JOIN of each document's Tally Export Watermark, aliased wm, for the
+	incremental window `wm.last_exported_on < modified <= as_of`.
+	"""
+	return """
+		LEFT JOIN `tabTally Export Watermark` wm
+			ON wm.name = CONCAT({voucher_type}, '|', COALESCE({company_column}, ''))
+	""".format(voucher_type=frappe.db.escape(voucher_type), company_column=company_column)
+
+
+def get_voucher_action(row):
+	"""Create vouchers Tally has not seen, alter the ones it has."""
+	exported = row.last_exported_on and row.creation <= row.last_exported_on
+	return "Alter" if exported else "Create"
+
+
+def iter_deleted_vouchers(doctype, voucher_type, as_of, date_fields, company=None, company_field=None):
+	"""
+	Cancel vouchers for documents of doctype deleted after their company's
+	watermark up to as_of, if they were created before an export could send them.
+
+	Args:
+		date_fields: fields of the deleted document tried in turn for the voucher date
+		company: only this company's documents
+		company_field: the document's own company field, tried before its Sauda's company
+	"""
+	watermarks = {
+		row.company or "": row.last_exported_on
+		for row in frappe.get_all(
+			"Tally Export Watermark",
+			filters={"voucher_type": voucher_type},
+			fields=["company", "last_exported_on"],
+		)
+		if row.last_exported_on
+	}
+	if not watermarks:
+		return
+
+	deleted = frappe.get_all(
+		"Deleted Document",
+		filters=[
+			["deleted_doctype", "=", doctype],
+			["restored", "=", 0],
+			["creation", ">", min(watermarks.values())],
+			["creation", "<=", as_of],
+		],
+		fields=["deleted_name", "data", "creation"],
+		order_by="creation",
+	)
+
+	for row in deleted:
+		data = json.loads(row.data)
+		doc_company = (company_field and data.get(company_field)) or (
+			data.get("sauda") and frappe.db.get_value("Sauda", data["sauda"], "company")
+		)
+		if company and doc_company != company:
+			continue
+
+		last_exported_on = watermarks.get(doc_company or "")
+		if (
+			not last_exported_on
+			or row.creation <= last_exported_on
+			or get_datetime(data.get("creation")) > add_to_date(last_exported_on, minutes=WATERMARK_LAG_MINUTES)
+		):
+			continue
+
+		yield frappe._dict(
+			name=row.deleted_name,
+			company=doc_company,
+			voucher_type=voucher_type,
+			action="Cancel",
+			date=next((data[field] for field in date_fields if data.get(field)), row.creation),
+			voucher_number=row.deleted_name,
+		)
+
+
+def update_watermarks(voucher_type, voucher_counts, as_of):
+	"""
+	Move the watermark of every company in voucher_counts ({company: vouchers})
+	forward to WATERMARK_LAG_MINUTES before as_of, the time the export started.
+	"""
+	as_of = add_to_date(as_of, minutes=-WATERMARK_LAG_MINUTES, as_datetime=True)
+	for company, count in voucher_counts.items():
+		frappe.db.sql(
+			"""
+			INSERT INTO `tabTally Export Watermark`
+				(name, creation, modified, owner, modified_by, docstatus,
+				voucher_type, company, last_exported_on, last_voucher_count, last_exported_by)
+			VALUES
+				(%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+				%(voucher_type)s, %(company)s, %(as_of)s, %(count)s, %(user)s)
+			ON DUPLICATE KEY UPDATE
+				last_exported_on = GREATEST(COALESCE(last_exported_on, VALUES(last_exported_on)), VALUES(last_exported_on)),
+				last_voucher_count = VALUES(last_voucher_count),
+				last_exported_by = VALUES(last_exported_by),
+				modified = VALUES(modified), modified_by = VALUES(modified_by)
+			""",
+			{
+				"name": get_watermark_key(voucher_type, company),
+				"voucher_type": voucher_type,
+				"company": company or None,
+				"as_of": as_of,
+				"count": count,
+				"now": now(),
+				"user": frappe.session.user,
+			},
+		)
@@ -0,0 +1,218 @@
+# Copyright (c) 2025, Kisan Warehouse and contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from kisan_warehouse.utils.inward_calculations import (
+	calculate_inward,
+	calculate_tds_194q,
+	get_tiered_difference,
+)
+
+MOISE_TIERS = [
+	# Given out of order on purpose, tiers are sorted by range_from
+	{"range_from": 14, "range_to": 100, "multiplier": 2},
+	{"range_from": 12, "range_to": 14, "multiplier": 1},
+]
+
+
+def make_inward(**values):
+	doc = {"report_type": "Multi State", "inward_items": [], "deductions": [], "debit_note": []}
+	doc.update(values)
+	return doc
+
+
+def make_item(bag_type="Jute", bags=0, gross=0, deduct=0, arrival=0, rate=0, charges=None):
+	return {
+		"item_bag_type": bag_type,
+		"item_bags": bags,
+		"item_gross_weight": gross,
+		"item_deduct_weight": deduct,
+		"item_arrival_weight": arrival,
+		"item_rate": rate,
+		"item_charges": charges,
+	}
+
+
+class TestInwardCalculations(FrappeTestCase):
+	def test_net_total_and_pending_are_floored(self):
+		out = calculate_inward(
+			make_inward(
+				inward_items=[make_item(arrival=1234, gross=1234, rate=2345)],
+				cgst_percent=2.5,
+				sgst_percent=2.5,
+				inward_payments=[
+					{"payment_status": "success", "payment_amount": 100.5, "payment_date": "2025-04-10"},
+					{"payment_status": "failed", "payment_amount": 5000, "payment_date": "2025-04-12", "payment_note": "Bounced"},
+				],
+			)
+		)
+
+		self.assertAlmostEqual(out.total_amount, 28937.3)
+		self.assertAlmostEqual(out.cgst_amount, 723.4325)
+		self.assertAlmostEqual(out.total_gst_amount, 1446.865)
+		# 30384.165 before flooring
+		self.assertEqual(out.net_total, 30384)
+		self.assertEqual(out.total_amount_paid, 100.5)
+		# 30283.5 before flooring
+		self.assertEqual(out.total_amount_pending, 30283)
+		self.assertEqual(out.inward_payment_status, "processing")
+		self.assertEqual(str(out.last_payment_date), "2025-04-10")
+		self.assertEqual(out.last_payment_note, "Bounced")
+
+	def test_payment_status(self):
+		doc = make_inward(inward_items=[make_item(arrival=100, rate=1000)])
+		self.assertEqual(calculate_inward(doc).inward_payment_status, "pending")
+
+		doc["inward_payments"] = [{"payment_status": "success", "payment_amount": 1000}]
+		out = calculate_inward(doc)
+		self.assertEqual(out.inward_payment_status, "success")
+		self.assertEqual(out.total_amount_pending, 0)
+
+	def test_single_report_spreads_gross_weight_over_bags(self):
+		out = calculate_inward(
+			make_inward(
+				report_type="Single Report",
+				gross_weight=1000,
+				inward_total_bags=20,
+				inward_items=[make_item(charges=0.5, rate=2000)],
+			)
+		)
+
+		item = out.inward_items[0]
+		self.assertEqual(item.item_bags, 20)
+		self.assertAlmostEqual(item.item_gross_weight, 1000)
+		self.assertAlmostEqual(item.item_deduct_weight, 10)
+		self.assertAlmostEqual(item.item_arrival_weight, 990)
+		self.assertAlmostEqual(item.item_amount, 19800)
+		self.assertEqual(out.bag_type_count, 1)
+
+	def test_multi_rate_derives_bags_from_gross_weight(self):
+		out = calculate_inward(
+			make_inward(
+				report_type="Multi Rate",
+				gross_weight=1000,
+				inward_total_bags=20,
+				inward_items=[
+					make_item(gross=730, charges=0.5, rate=2000),
+					make_item(gross=270, charges=0.5, rate=1800),
+				],
+			)
+		)
+
+		first, second = out.inward_items
+		# Bags are whole: 730 / 50 = 14.6 -> 14
+		self.assertEqual(first.item_bags, 14)
+		self.assertAlmostEqual(first.item_deduct_weight, 7)
+		self.assertAlmostEqual(first.item_arrival_weight, 723)
+		self.assertAlmostEqual(first.item_amount, 14460)
+		self.assertEqual(second.item_bags, 5)
+		self.assertAlmostEqual(second.item_arrival_weight, 267.5)
+		self.assertAlmostEqual(second.item_amount, 4815)
+		self.assertEqual(out.bag_type_count, 1)
+
+	def test_tiered_moise_difference(self):
+		self.assertAlmostEqual(get_tiered_difference(15, 12, MOISE_TIERS), 4)
+		# The first tier counts from the required value
+		self.assertAlmostEqual(get_tiered_difference(15, 13, MOISE_TIERS), 3)
+		self.assertAlmostEqual(get_tiered_difference(13.5, 12, MOISE_TIERS), 1.5)
+		self.assertEqual(get_tiered_difference(12, 12, MOISE_TIERS), 0)
+		self.assertEqual(get_tiered_difference(11, 12, MOISE_TIERS), 0)
+		# Without tiers the plain difference is used
+		self.assertAlmostEqual(get_tiered_difference(15, 12, []), 3)
+
+	def test_moise_deduction(self):
+		doc = make_inward(
+			inward_items=[make_item(gross=1000, arrival=1000, rate=2000)],
+			deductions=[{"deduction_type": "Moise", "actual_value": 15, "required_value": 12}],
+		)
+
+		tiered_settings = {
+			"default_deduction_types": [{"deduction_name": "Moise", "has_tiered_calculation": 1}],
+			"deduction_tier_range": MOISE_TIERS,
+		}
+		out = calculate_inward(doc, settings=tiered_settings)
+		self.assertAlmostEqual(out.deductions[0].difference_value, 4)
+		self.assertAlmostEqual(out.deductions[0].deduction_amount, 800)
+		self.assertAlmostEqual(out.sub_total, 19200)
+
+		out = calculate_inward(doc)
+		self.assertAlmostEqual(out.deductions[0].difference_value, 3)
+		self.assertAlmostEqual(out.deductions[0].deduction_amount, 600)
+
+	def test_quality_and_weight_deductions(self):
+		out = calculate_inward(
+			make_inward(
+				gross_weight=1500,
+				vendor_weight=1500,
+				rate_per_quintal=2000,
+				inward_items=[
+					make_item(bag_type="Jute", bags=10, gross=1000, deduct=50, arrival=950, rate=2000),
+					make_item(bag_type="Plastic", bags=5, gross=500, arrival=500, rate=2000),
+				],
+				deductions=[
+					# Rows map to item rows in turn: 0 -> Jute, 1 -> Plastic, 2 -> Jute...
+					{"deduction_type": "Damage", "deduction_category": "multiple", "actual_value": 3, "required_value": 1, "charges_per_unit": 2},
+					{"deduction_type": "S/S", "actual_value": 2.5, "required_value": 1},
+					{"deduction_type": "UNLOADING", "charges_per_unit": 10},
+					{"deduction_type": "PP", "charges_per_unit": 4},
+					{"deduction_type": "Others", "charges_per_unit": 1},
+					{"deduction_type": "Damage", "actual_value": 0.5, "required_value": 1, "charges_per_unit": 2},
+				],
+			)
+		)
+
+		self.assertAlmostEqual(out.total_amount, 29000)
+		damage, short_sample, unloading, pp, others, no_damage = out.deductions
+
+		# Difference × charges × gross weight of the Jute row
+		self.assertAlmostEqual(damage.difference_value, 2)
+		self.assertAlmostEqual(damage.deduction_amount, 40)
+		self.assertEqual(damage.bags, 10)
+		# Difference % of the Plastic row's amount
+		self.assertAlmostEqual(short_sample.difference_value, 1.5)
+		self.assertAlmostEqual(short_sample.deduction_amount, 150)
+		# Per quintal of the arrival's gross weight
+		self.assertAlmostEqual(unloading.deduction_amount, 150)
+		# Per quintal of goods in plastic bags only
+		self.assertAlmostEqual(pp.deduction_amount, 20)
+		self.assertAlmostEqual(others.deduction_amount, 290)
+		# Below the required value nothing is deducted
+		self.assertEqual(no_damage.difference_value, 0)
+		self.assertEqual(no_damage.deduction_amount, 0)
+
+		self.assertAlmostEqual(out.total_deductions, 650)
+		self.assertAlmostEqual(out.sub_total, 28350)
+
+		shortage, quality = out.debit_note
+		self.assertAlmostEqual(shortage.deducted_weight_kg, 50)
+		self.assertAlmostEqual(shortage.amount, 1000)
+		self.assertAlmostEqual(quality.amount, 650)
+
+	def test_tds_194q_threshold(self):
+		# Below the threshold, and landing exactly on it
+		self.assertEqual(calculate_tds_194q(200000, 4000000), (0, 0))
+		self.assertEqual(calculate_tds_194q(200000, 4800000), (0, 0))
+		# Crossing it: only the part above ₹50,00,000 is taxed
+		self.assertEqual(calculate_tds_194q(200000, 4900000), (0.1, 100))
+		# Already above it: the whole purchase is taxed, rounded half up
+		self.assertEqual(calculate_tds_194q(12345, 6000000), (0.1, 12))
+		self.assertEqual(calculate_tds_194q(500, 5000000), (0.1, 1))
+		self.assertEqual(calculate_tds_194q(0, 6000000), (0, 0))
+
+	def test_tds_194q_on_inward(self):
+		doc = make_inward(customer="CUST-0001", inward_items=[make_item(arrival=1000, rate=2000)])
+
+		out = calculate_inward(doc, previous_purchases=4990000)
+		self.assertEqual(out.tds_percent, 0.1)
+		self.assertEqual(out.tds_amount, 10)
+		self.assertEqual(out.net_total, 19990)
+
+		out = calculate_inward(doc, previous_purchases=1000000)
+		self.assertEqual(out.tds_amount, 0)
+		self.assertEqual(out.net_total, 20000)
+
+		# No TDS without a customer to total purchases for
+		doc["customer"] = None
+		out = calculate_inward(doc, previous_purchases=6000000)
+		self.assertEqual(out.tds_amount, 0)
@@ -0,0 +1,51 @@
+# Copyright (c) 2025, Kisan Warehouse and contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from kisan_warehouse.customers.doctype.customer.customer import (
+	check_aadhaar_otp,
+	request_aadhaar_otp,
+	verify_gstin,
+	verify_pan,
+)
+from kisan_warehouse.utils.kyc import LOCAL_AADHAAR_OTP, get_kyc_provider
+
+
+class TestKyc(FrappeTestCase):
+	"""KYC checks against the local provider, which tests use without any network call."""
+
+	def test_tests_use_local_provider(self):
+		self.assertTrue(frappe.flags.in_test)
+		self.assertEqual(get_kyc_provider(), "local")
+
+	def test_pan(self):
+		result = verify_pan("ABCDE1234F", "Ramesh", "Patil", "Individual / Farmer")
+		self.assertEqual(result["status"], "success")
+		self.assertEqual(result["pan_verified"], 1)
+		self.assertEqual(result["parsed_names"], {"first_name": "Ramesh", "last_name": "Patil"})
+		self.assertEqual(result["address_data"]["city"], "Pune")
+
+		result = verify_pan("ABCDE1234", "Ramesh", "Patil", "Individual / Farmer")
+		self.assertEqual(result["status"], "failed")
+		self.assertEqual(result["pan_verified"], 0)
+
+	def test_gstin(self):
+		result = verify_gstin("27ABCDE1234F1Z5")
+		self.assertEqual(result["status"], "success")
+		self.assertEqual(result["first_name"], "Test Kisan Traders")
+
+	def test_aadhaar_otp(self):
+		result = request_aadhaar_otp("123412341234")
+		self.assertEqual(result["status"], "success")
+		self.assertTrue(result["reference_id"])
+
+		result = check_aadhaar_otp(result["reference_id"], "654321")
+		self.assertEqual(result["status"], "failed")
+
+		result = check_aadhaar_otp("12345678", LOCAL_AADHAAR_OTP)
+		self.assertEqual(result["status"], "success")
+		self.assertEqual(result["aadhar_verified"], 1)
+		self.assertEqual(result["parsed_names"]["first_name"], "Test")
+		self.assertEqual(result["address_data"]["zip"], "411001")
@@ -0,0 +1,302 @@
+"""
+Remaining bags per Inward Aawak lot and bag weight.
+
+Lot Bag Balance is a maintained ledger: Inward Aawak bag details add received
+bags and Outward Jawak bag rows add released bags, so what is left in a lot is
+one indexed read. OutwardJawak.validate locks the lot's rows and rejects
+releases of more bags than remain, so two Jawaks drawing down the same lot at
+once cannot both take the last bags. Like the rent engine, every Aawak and
+Jawak that is not cancelled counts.
+
+Rows are keyed by the lot, (firm, lot number, lot year), not by the Aawak: lot
+numbers restart every year, and an amended Aawak keeps the lot of the one it
+replaces, so releases made against the cancelled Aawak still count against
+its amendment. Jawaks carry the lot's year in inward_lot_year.
+"""
+
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.utils import cint, cstr, now
+
+
+def get_bag_weight_key(bag_weight):
+	"""Bag Details store the weight as Int, Jawak Bag Detail as Data ("50")."""
+	return cstr(cint(bag_weight))
+
+
+def get_balance_key(lot, bag_weight):
+	return f"{lot.firm}|{lot.lot_number}|{cint(lot.lot_year)}|{get_bag_weight_key(bag_weight)}"
+
+
+def get_aawak_lot(aawak):
+	return frappe._dict(
+		inward_aawak=aawak.name, firm=aawak.firm, lot_number=aawak.lot_number, lot_year=cint(aawak.lot_year)
+	)
+
+
+def get_jawak_lot(jawak):
+	"""The lot a Jawak releases from, or None until its firm, lot number and lot year are known."""
+	if not (jawak.firm and jawak.inward_lot_no and cint(jawak.inward_lot_year)):
+		return None
+	return frappe._dict(
+		inward_aawak=None,
+		firm=jawak.firm,
+		lot_number=jawak.inward_lot_no,
+		lot_year=cint(jawak.inward_lot_year),
+	)
+
+
+def get_lot_aawak(firm, lot_number, lot_year=None, fields=None):
+	"""
+	The Inward Aawak (not cancelled) holding the firm's lot, or None.
+
+	Lot numbers restart every year, so without lot_year a number used in more
+	than one year throws instead of picking one of them.
+	"""
+	if not (firm and lot_number):
+		return None
+
+	filters = {"firm": firm, "lot_number": lot_number, "docstatus": ("<", 2)}
+	if cint(lot_year):
+		filters["lot_year"] = cint(lot_year)
+
+	aawaks = frappe.get_all(
+		"Inward Aawak",
+		filters=filters,
+		fields=list({"name", "lot_year", *(fields or [])}),
+		order_by="lot_year desc",
+	)
+	if len(aawaks) > 1:
+		years = sorted({cint(aawak.lot_year) for aawak in aawaks})
+		if len(years) > 1:
+			frappe.throw(
+				_("Inward Lot No {0} of Firm {1} was used in {2}. Set the Inward Lot Year.").format(
+					lot_number, firm, ", ".join(map(str, years))
+				),
+				title=_("Multiple Matches Found"),
+			)
+		frappe.throw(
+			_(
+				"Multiple Inward Aawak records found for Firm {0} and Inward Lot No {1}. Please resolve duplicates."
+			).format(firm, lot_number),
+			title=_("Multiple Matches Found"),
+		)
+
+	return aawaks[0] if aawaks else None
+
+
+def set_inward_lot_year(jawak):
+	"""Fill in the Jawak's inward_lot_year from its lot, if the lot number is only used in one year."""
+	# A year left over from the lot the Jawak was moved away from does not carry over
+	previous = jawak.get_doc_before_save()
+	if (
+		previous
+		and (previous.firm, previous.inward_lot_no) != (jawak.firm, jawak.inward_lot_no)
+		and cint(previous.inward_lot_year) == cint(jawak.inward_lot_year)
+	):
+		jawak.inward_lot_year = 0
+
+	if cint(jawak.inward_lot_year) or not (jawak.firm and jawak.inward_lot_no):
+		return
+
+	aawak = get_lot_aawak(jawak.firm, jawak.inward_lot_no)
+	if aawak:
+		jawak.inward_lot_year = aawak.lot_year
+
+
+def get_received_bags(aawak):
+	bags = defaultdict(int)
+	for row in aawak.bag_details:
+		if row.bag_weight and cint(row.number_of_bags):
+			bags[get_bag_weight_key(row.bag_weight)] += cint(row.number_of_bags)
+	return bags
+
+
+def get_released_bags(jawak):
+	bags = defaultdict(int)
+	for row in jawak.jawak_bag_details:
+		if row.bag_type and cint(row.release_bags):
+			bags[get_bag_weight_key(row.bag_type)] += cint(row.release_bags)
+	return bags
+
+
+def get_remaining_bags(firm, lot_number, lot_year, for_update=False):
+	"""{bag weight: remaining bags} of one lot."""
+	return dict(
+		frappe.db.sql(
+			"""
+			SELECT bag_weight, remaining_bags
+			FROM `tabLot Bag Balance`
+			WHERE firm = %(firm)s AND lot_number = %(lot_number)s AND lot_year = %(lot_year)s
+			ORDER BY name
+			{for_update}
+			""".format(for_update="FOR UPDATE" if for_update else ""),
+			{"firm": firm, "lot_number": lot_number, "lot_year": cint(lot_year)},
+		)
+	)
+
+
+def validate_release(jawak):
+	"""Throw if the Jawak releases more bags of any weight than remain in its lot."""
+	requested = get_released_bags(jawak)
+	lot = get_jawak_lot(jawak)
+	if not (requested and lot):
+		return
+
+	# What this Jawak already released is back on offer while it is being edited
+	posted = defaultdict(int)
+	previous = jawak.get_doc_before_save()
+	if previous and get_jawak_lot(previous) == lot:
+		posted = get_released_bags(previous)
+
+	remaining = get_remaining_bags(lot.firm, lot.lot_number, lot.lot_year, for_update=True)
+
+	errors = []
+	for bag_weight, bags in requested.items():
+		available = cint(remaining.get(bag_weight)) + posted[bag_weight]
+		if bags > available:
+			errors.append(
+				_("{0} kg bags: releasing {1} but only {2} remain in lot {3}").format(
+					bag_weight, bags, max(available, 0), jawak.inward_lot_no
+				)
+			)
+
+	if errors:
+		frappe.throw("<br>".join(errors), title=_("Release Exceeds Remaining Bags"))
+
+
+def on_aawak_update(aawak):
+	previous = aawak.get_doc_before_save()
+	if previous and previous.docstatus < 2:
+		post_balance(get_aawak_lot(previous), get_received_bags(previous), received_sign=-1)
+	if aawak.docstatus < 2:
+		post_balance(get_aawak_lot(aawak), get_received_bags(aawak), received_sign=1)
+
+
+def on_aawak_cancel(aawak):
+	# The lot's released bags stay on its rows for an amendment to take over
+	post_balance(get_aawak_lot(aawak), get_received_bags(aawak), received_sign=-1)
+
+
+def on_aawak_trash(aawak):
+	# Cancelled Aawaks were already reversed in on_cancel
+	if aawak.docstatus < 2:
+		post_balance(get_aawak_lot(aawak), get_received_bags(aawak), received_sign=-1)
+
+
+def on_jawak_update(jawak):
+	previous = jawak.get_doc_before_save()
+	if previous:
+		post_jawak(previous, -1)
+	post_jawak(jawak, 1)
+
+
+def on_jawak_trash(jawak):
+	post_jawak(jawak, -1)
+
+
+def post_jawak(jawak, sign):
+	lot = get_jawak_lot(jawak)
+	if lot:
+		post_balance(lot, get_released_bags(jawak), released_sign=sign)
+
+
+def post_balance(lot, bags_by_weight, received_sign=0, released_sign=0):
+	"""
+	Atomically add received and/or released bags to the lot's rows. The row
+	points at the Aawak that last added received bags to it.
+	"""
+	for bag_weight, bags in bags_by_weight.items():
+		received_bags = received_sign * bags
+		released_bags = released_sign * bags
+		values = {
+			"name": get_balance_key(lot, bag_weight),
+			"inward_aawak": lot.inward_aawak,
+			"firm": lot.firm,
+			"lot_number": lot.lot_number,
+			"lot_year": lot.lot_year,
+			"bag_weight": bag_weight,
+			"received_bags": received_bags,
+			"released_bags": released_bags,
+			"remaining_bags": received_bags - released_bags,
+			"now": now(),
+			"user": frappe.session.user,
+		}
+
+		frappe.db.sql(
+			"""
+			INSERT INTO `tabLot Bag Balance`
+				(name, creation, modified, owner, modified_by, docstatus,
+				inward_aawak, firm, lot_number, lot_year, bag_weight,
+				received_bags, released_bags, remaining_bags)
+			VALUES
+				(%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+				%(inward_aawak)s, %(firm)s, %(lot_number)s, %(lot_year)s, %(bag_weight)s,
+				%(received_bags)s, %(released_bags)s, %(remaining_bags)s)
+			ON DUPLICATE KEY UPDATE
+				inward_aawak = IF(VALUES(received_bags) > 0, VALUES(inward_aawak), inward_aawak),
+				received_bags = received_bags + VALUES(received_bags),
+				released_bags = released_bags + VALUES(released_bags),
+				remaining_bags = remaining_bags + VALUES(remaining_bags),
+				modified = VALUES(modified), modified_by = VALUES(modified_by)
+			""",
+			values,
+		)
+
+		frappe.db.sql(
+			"""
+			DELETE FROM `tabLot Bag Balance`
+			WHERE name = %s AND received_bags <= 0 AND released_bags <= 0
+			""",
+			values["name"],
+		)
+
+
+def rebuild_bag_balances():
+	"""
+	Rebuild Lot Bag Balances from existing Inward Aawaks and Outward Jawaks.
+
+	bench --site [sitename] execute kisan_warehouse.warehouse_rent.bag_balance.rebuild_bag_balances
+	"""
+	frappe.db.sql("DELETE FROM `tabLot Bag Balance`")
+	frappe.db.sql(
+		"""
+		INSERT INTO `tabLot Bag Balance`
+			(name, creation, modified, owner, modified_by, docstatus,
+			inward_aawak, firm, lot_number, lot_year, bag_weight,
+			received_bags, released_bags, remaining_bags)
+		SELECT
+			CONCAT_WS('|', mv.firm, mv.lot_number, mv.lot_year, mv.bag_weight),
+			NOW(), NOW(), 'Administrator', 'Administrator', 0,
+			MAX(mv.inward_aawak), mv.firm, mv.lot_number, mv.lot_year, mv.bag_weight,
+			SUM(mv.received_bags), SUM(mv.released_bags), SUM(mv.received_bags) - SUM(mv.released_bags)
+		FROM (
+			SELECT a.name as inward_aawak, a.firm, a.lot_number, a.lot_year,
+				CAST(CAST(bd.bag_weight AS SIGNED) AS CHAR) as bag_weight,
+				COALESCE(bd.number_of_bags, 0) as received_bags, 0 as released_bags
+			FROM `tabInward Aawak` a
+			INNER JOIN `tabBag Details` bd ON bd.parent = a.name AND bd.parenttype = 'Inward Aawak'
+			WHERE a.docstatus < 2
+				AND IFNULL(a.firm, '') != ''
+				AND IFNULL(a.lot_number, '') != ''
+				AND COALESCE(bd.bag_weight, 0) != 0
+			UNION ALL
+			SELECT NULL as inward_aawak, j.firm, j.inward_lot_no as lot_number, j.inward_lot_year as lot_year,
+				CAST(CAST(jbd.bag_type AS SIGNED) AS CHAR) as bag_weight,
+				0 as received_bags, COALESCE(jbd.release_bags, 0) as released_bags
+			FROM `tabOutward Jawak` j
+			INNER JOIN `tabJawak Bag Detail` jbd ON jbd.parent = j.name AND jbd.parenttype = 'Outward Jawak'
+			WHERE j.docstatus < 2
+				AND IFNULL(j.firm, '') != ''
+				AND IFNULL(j.inward_lot_no, '') != ''
+				AND IFNULL(j.inward_lot_year, 0) != 0
+				AND IFNULL(jbd.bag_type, '') != ''
+		) mv
+		GROUP BY mv.firm, mv.lot_number, mv.lot_year, mv.bag_weight
+		HAVING SUM(mv.received_bags) > 0 OR SUM(mv.released_bags) > 0
+		"""
+	)
+
+	frappe.db.commit()
@@ -0,0 +1,16 @@
+# Copyright (c) 2026, Kisan Warehouse and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class ChamberOccupancy(Document):
+	"""
+	Bags currently sitting in one Floor Chamber, named after the chamber.
+
+	Maintained by kisan_warehouse.warehouse_rent.occupancy as Inward Aawaks
+	allocate bags and Outward Jawaks release them; never edited by hand.
+	"""
+
+	pass
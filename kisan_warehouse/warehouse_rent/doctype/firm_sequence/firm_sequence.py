@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Kisan Warehouse and contributors
+# For license information, please see license.txt
+
+# import frappe
+from frappe.model.document import Document
+
+
+class FirmSequence(Document):
+	"""
+	Last number handed out for one (prefix, firm, year), named "<prefix>|<firm>|<year>".
+
+	Advanced by kisan_warehouse.warehouse_rent.sequence; never edited by hand.
+	"""
+
+	pass
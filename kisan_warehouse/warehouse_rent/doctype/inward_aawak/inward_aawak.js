@@ -89,6 +89,13 @@ frappe.ui.form.on('Inward Aawak', {
 		// Setup hierarchy filtering
 		setupHierarchyFiltering(frm);
 
+		// Propose chamber allocations from current occupancy
+		if (frm.doc.docstatus === 0) {
+			frm.add_custom_button(__('Plan Chamber Allocation'), function () {
+				planChamberAllocation(frm);
+			});
+		}
+
 		// Setup read-only for Bag Details Rate field (with delay to ensure grid is rendered)
 		setTimeout(() => setupBagDetailsReadOnly(frm), 500);
 
@@ -334,18 +341,18 @@ frappe.ui.form.on('Chamber Allocation', {
 
 	chamber: function (frm, cdt, cdn) {
 		let row = locals[cdt][cdn];
-		// Get chamber capacity for validation
+		// Get free capacity (max capacity less bags already in the chamber) for validation
 		if (row.chamber) {
 			frappe.call({
-				method: 'frappe.client.get_value',
+				method: 'kisan_warehouse.warehouse_rent.occupancy.get_chamber_availability',
 				args: {
-					doctype: 'Floor Chamber',
-					filters: { 'name': row.chamber },
-					fieldname: 'max_capacity'
+					chamber: row.chamber,
+					inward_aawak: frm.is_new() ? null : frm.doc.name
 				},
 				callback: function (r) {
-					if (r.message && r.message.max_capacity) {
-						row.max_capacity = r.message.max_capacity;
+					if (r.message && r.message.length && r.message[0].max_capacity) {
+						row.max_capacity = r.message[0].max_capacity;
+						row.free_capacity = r.message[0].free_capacity;
 					}
 				}
 			});
@@ -354,10 +361,10 @@ frappe.ui.form.on('Chamber Allocation', {
 
 	bags_allocated: function (frm, cdt, cdn) {
 		let row = locals[cdt][cdn];
-		if (row.bags_allocated && row.max_capacity && row.bags_allocated > row.max_capacity) {
+		if (row.bags_allocated && row.max_capacity && row.bags_allocated > row.free_capacity) {
 			frappe.msgprint({
 				title: __('Capacity Exceeded'),
-				message: __('Bags allocated (' + row.bags_allocated + ') cannot exceed chamber capacity (' + row.max_capacity + ')'),
+				message: __('Bags allocated (' + row.bags_allocated + ') cannot exceed free chamber capacity (' + row.free_capacity + ' of ' + row.max_capacity + ')'),
 				indicator: 'red'
 			});
 			frappe.set_value(cdt, cdn, 'bags_allocated', '');
@@ -476,6 +483,74 @@ function validateChamberAllocations(frm) {
 	}
 }
 
+function planChamberAllocation(frm) {
+	if (!frm.doc.godown || !frm.doc.total_bags) {
+		frappe.msgprint({
+			title: __('Required Field Missing'),
+			message: __('Select a Godown and enter Bag Details before planning chamber allocation'),
+			indicator: 'orange'
+		});
+		return;
+	}
+
+	frappe.call({
+		method: 'kisan_warehouse.warehouse_rent.occupancy.plan_chamber_allocation',
+		args: {
+			godown: frm.doc.godown,
+			total_bags: frm.doc.total_bags,
+			inward_aawak: frm.is_new() ? null : frm.doc.name
+		},
+		freeze: true,
+		callback: function (r) {
+			let plan = r.message;
+			if (!plan || !plan.allocations.length) {
+				frappe.msgprint({
+					title: __('No Free Chambers'),
+					message: __('No available chamber in this godown has free capacity'),
+					indicator: 'red'
+				});
+				return;
+			}
+
+			let rows = plan.allocations.map(function (row) {
+				return '<tr><td>' + frappe.utils.escape_html(row.chamber_name || row.chamber) + '</td>'
+					+ '<td class="text-right">' + row.bags_allocated + '</td>'
+					+ '<td class="text-right">' + row.free_capacity + '</td></tr>';
+			}).join('');
+			let message = '<table class="table table-bordered">'
+				+ '<thead><tr><th>' + __('Chamber') + '</th><th class="text-right">' + __('Bags')
+				+ '</th><th class="text-right">' + __('Free Capacity') + '</th></tr></thead>'
+				+ '<tbody>' + rows + '</tbody></table>';
+			if (plan.unallocated_bags) {
+				message += '<p class="text-danger">' + __('{0} bags do not fit in this godown', [plan.unallocated_bags]) + '</p>';
+			}
+
+			frappe.confirm(message + __('Replace the current chamber allocations with this plan?'), function () {
+				applyChamberAllocationPlan(frm, plan.allocations);
+			});
+		}
+	});
+}
+
+function applyChamberAllocationPlan(frm, allocations) {
+	let allocation_date = frappe.datetime.get_today();
+	let valid_to = frappe.datetime.add_months(allocation_date, 6);
+
+	frm.clear_table('chamber_allocations');
+	allocations.forEach(function (row) {
+		// Set all values at once so the floor trigger does not clear the chamber
+		frm.add_child('chamber_allocations', {
+			floor: row.floor,
+			chamber: row.chamber,
+			bags_allocated: row.bags_allocated,
+			allocation_date: allocation_date,
+			valid_to: valid_to
+		});
+	});
+	frm.refresh_field('chamber_allocations');
+	validateChamberAllocations(frm);
+}
+
 function setupHierarchyFiltering(frm) {
 	frm.set_query("godown", function () {
 		return { filters: { status: "Active", firm: frm.doc.firm } };
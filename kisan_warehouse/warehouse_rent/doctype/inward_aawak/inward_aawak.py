@@ -2,19 +2,24 @@
 # For license information, please see license.txt
 
 import frappe
+from frappe import _
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
 
 
-from frappe.utils import add_months
+from frappe.utils import add_months, cint, formatdate, getdate, nowdate
+
+from kisan_warehouse.warehouse_rent import bag_balance, occupancy
+from kisan_warehouse.warehouse_rent.sequence import add_lot_unique_index, get_next_sequence
 
 
 class InwardAawak(Document):
 	def autoname(self):
 		"""
-		Custom naming to support firm-wise sequences.
+		Firm-wise sequences.
 		
-		Each firm gets its own independent sequence.
+		Each firm gets its own independent sequence per year, handed out by
+		kisan_warehouse.warehouse_rent.sequence.
 		Format: AAWAK-{firm_sequence}-YYYY-####
 		
 		Where:
@@ -26,42 +31,32 @@ class InwardAawak(Document):
 		         AAWAK-0002-2025-0001 (Firm FIRM-0002, first aawak of 2025)
 		"""
 		if self.firm:
-			# Get the firm's sequence number from its name
-			# Firm name format is FIRM-0001, FIRM-0002, etc.
-			firm_parts = self.firm.split('-')
-			if len(firm_parts) >= 2:
-				firm_seq = firm_parts[-1]  # Extract the numeric part (e.g., "0001")
-			else:
-				# Fallback if firm name doesn't follow expected format
-				firm_seq = self.firm.replace('FIRM-', '').replace('FIRM', '')[:4].zfill(4)
-			
-			# Create firm-specific series key
-			# This ensures each firm has its own sequence counter
-			series_key = f"AAWAK-.{self.firm}-.YYYY.-.####"
-			
-			# Get next number from firm-specific series
-			full_name = make_autoname(series_key)
-			
-			# Extract year and sequence number from the generated name
-			# Format will be: AAWAK-FIRM-0001-2025-0001
-			parts = full_name.split('-')
-			
-			if len(parts) >= 2:
-				year = parts[-2]
-				sequence = parts[-1]
-				# Create final name with firm sequence included
-				self.name = f"AAWAK-{firm_seq}-{year}-{sequence}"
-				# Set lot number (sequence only) for printing/receipts
-				self.lot_number = sequence
-			else:
-				# Fallback in case of unexpected format
-				self.name = full_name
+			sequence = get_next_sequence("AAWAK", self.firm)
+			self.name = sequence.name
+			# Set lot number (sequence only) for printing/receipts
+			self.lot_number = sequence.lot_number
+			self.lot_year = sequence.year
 		else:
 			# Fallback for legacy records or if firm is not set
 			# This maintains backward compatibility
 			self.name = make_autoname("AAWAK-.YYYY.-.####")
 			self.lot_number = self.name.split('-')[-1] if '-' in self.name else ""
-	
+			self.lot_year = getdate(nowdate()).year
+
+	def before_insert(self):
+		"""
+		Amendments are named after the cancelled original without autoname, and
+		keep its lot: lot_year is carried over and lot_amendment counts up, so the
+		unique (firm, lot_number, lot_year, lot_amendment) index still holds.
+		"""
+		if self.amended_from:
+			original = frappe.db.get_value(
+				"Inward Aawak", self.amended_from, ["lot_year", "lot_amendment"], as_dict=True
+			)
+			if original:
+				self.lot_year = original.lot_year
+				self.lot_amendment = cint(original.lot_amendment) + 1
+
 	def validate(self):
 		"""Validate the document before saving"""
 		# Ensure firm is selected for new documents
@@ -76,3 +71,145 @@ class InwardAawak(Document):
 					row.valid_to = add_months(row.allocation_date, 6)
 				else:
 					row.valid_to = None
+
+		# Capacity is checked against what is already in each chamber, with the chambers locked
+		occupancy.validate_chamber_capacity(self)
+
+	def on_update(self):
+		occupancy.on_aawak_update(self)
+		bag_balance.on_aawak_update(self)
+
+	def on_cancel(self):
+		occupancy.on_aawak_cancel(self)
+		bag_balance.on_aawak_cancel(self)
+
+	def on_trash(self):
+		occupancy.on_aawak_trash(self)
+		bag_balance.on_aawak_trash(self)
+
+
+def on_doctype_update():
+	frappe.db.add_index("Inward Aawak", ["firm", "lot_number"])
+	add_lot_unique_index("Inward Aawak")
+
+
+@frappe.whitelist()
+def search_lots(txt="", firm=None, limit=20):
+	"""
+	Lot numbers of the firm starting with txt, for the Outward Jawak lot field.
+	Uses the (firm, lot_number) index, so there is no cap on how many lots a firm has.
+	Lot numbers restart every year, so each lot is listed with its year.
+	"""
+	if not firm:
+		return []
+
+	lots = frappe.db.sql(
+		"""
+		SELECT a.lot_number, a.lot_year, a.aawak_date, sc.first_name as storage_customer_name
+		FROM `tabInward Aawak` a
+		LEFT JOIN `tabStorage Customer` sc ON sc.name = a.storage_customer
+		WHERE a.firm = %(firm)s
+			AND a.lot_number LIKE %(txt)s
+			AND a.docstatus < 2
+		ORDER BY a.lot_number, a.lot_year DESC
+		LIMIT %(limit)s
+		""",
+		{"firm": firm, "txt": f"{txt or ''}%", "limit": cint(limit) or 20},
+		as_dict=True,
+	)
+
+	return [
+		{
+			"value": lot.lot_number,
+			"label": f"{lot.lot_number} ({lot.lot_year})" if lot.lot_year else lot.lot_number,
+			"lot_year": lot.lot_year,
+			"description": ", ".join(
+				filter(None, [lot.storage_customer_name, lot.aawak_date and formatdate(lot.aawak_date)])
+			),
+		}
+		for lot in lots
+	]
+
+
+@frappe.whitelist()
+def get_aawak_for_jawak(firm, lot_number, lot_year=None, exclude_jawak=None):
+	"""
+	Everything Outward Jawak needs from one lot in a single payload: the Aawak,
+	its first chamber allocation, commodities with their names, and bag details
+	with the bags still remaining in the lot (from Lot Bag Balance).
+
+	Without lot_year, a lot number used in more than one year throws.
+	"""
+	lot_aawak = bag_balance.get_lot_aawak(firm, lot_number, lot_year)
+	if not lot_aawak:
+		frappe.throw(
+			_("No Inward Aawak found for Firm {0} and Inward Lot No {1}.").format(firm, lot_number),
+			title=_("Inward Aawak Not Found"),
+		)
+
+	aawak = frappe.get_doc("Inward Aawak", lot_aawak.name)
+	aawak.check_permission("read")
+
+	commodity_names = dict(
+		frappe.get_all(
+			"Commodity",
+			filters={"name": ("in", [row.commodity for row in aawak.commodities])},
+			fields=["name", "commodity_name"],
+			as_list=True,
+		)
+	) if aawak.commodities else {}
+
+	# Bags left per weight, plus what the Jawak being edited already released
+	remaining = bag_balance.get_remaining_bags(aawak.firm, aawak.lot_number, aawak.lot_year)
+	if exclude_jawak:
+		jawak = frappe.db.get_value(
+			"Outward Jawak", exclude_jawak, ["firm", "inward_lot_no", "inward_lot_year"], as_dict=True
+		)
+		lot = (aawak.firm, aawak.lot_number, cint(aawak.lot_year))
+		if jawak and (jawak.firm, jawak.inward_lot_no, cint(jawak.inward_lot_year)) == lot:
+			for row in frappe.get_all(
+				"Jawak Bag Detail",
+				filters={"parent": exclude_jawak, "parenttype": "Outward Jawak"},
+				fields=["bag_type", "release_bags"],
+			):
+				key = bag_balance.get_bag_weight_key(row.bag_type)
+				remaining[key] = cint(remaining.get(key)) + cint(row.release_bags)
+
+	# Rows sharing a bag weight draw on its remaining bags in order
+	bag_details = []
+	for row in aawak.bag_details:
+		key = bag_balance.get_bag_weight_key(row.bag_weight)
+		remaining_bags = max(min(cint(row.number_of_bags), cint(remaining.get(key))), 0)
+		remaining[key] = cint(remaining.get(key)) - remaining_bags
+		bag_details.append(
+			{
+				"bag_weight": row.bag_weight,
+				"rate": row.rate,
+				"number_of_bags": row.number_of_bags,
+				"released_bags": cint(row.number_of_bags) - remaining_bags,
+				"remaining_bags": remaining_bags,
+			}
+		)
+
+	allocation = aawak.chamber_allocations[0] if aawak.chamber_allocations else None
+
+	return {
+		"name": aawak.name,
+		"lot_number": aawak.lot_number,
+		"lot_year": aawak.lot_year,
+		"aawak_date": aawak.aawak_date,
+		"storage_customer": aawak.storage_customer,
+		"storage_customer_name": frappe.db.get_value(
+			"Storage Customer", aawak.storage_customer, "first_name"
+		) if aawak.storage_customer else None,
+		"godown": aawak.godown,
+		"charges": aawak.charges,
+		"chamber_allocations": [
+			{"floor": allocation.floor, "chamber": allocation.chamber}
+		] if allocation else [],
+		"commodities": [
+			{"commodity": row.commodity, "commodity_name": commodity_names.get(row.commodity)}
+			for row in aawak.commodities
+		],
+		"bag_details": bag_details,
+	}
@@ -0,0 +1,6 @@
+frappe.listview_settings['Inward Aawak'] = {
+    onload: function (listview) {
+        // Rendered in a background job; kisan_warehouse.print_job comes from hooks.doctype_list_js
+        kisan_warehouse.print_job.add_action(listview, __('Aawak Receipt PDF'), 'Inward Aawak Receipt');
+    }
+};
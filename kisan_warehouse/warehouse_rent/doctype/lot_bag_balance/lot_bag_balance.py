@@ -0,0 +1,21 @@
+# Copyright (c) 2026, Kisan Warehouse and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LotBagBalance(Document):
+	"""
+	Bags received, released and remaining for one bag weight of an Inward Aawak
+	lot, named "<firm>|<lot number>|<lot year>|<bag weight>".
+
+	Maintained by kisan_warehouse.warehouse_rent.bag_balance; never edited by hand.
+	"""
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Lot Bag Balance", ["inward_aawak"])
+	frappe.db.add_index("Lot Bag Balance", ["firm", "lot_number", "lot_year"])
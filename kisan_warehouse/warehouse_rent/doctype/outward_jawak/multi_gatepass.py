@@ -2,65 +2,49 @@ import frappe
 from frappe import _
 from frappe.utils import get_fullname
 
+from kisan_warehouse.warehouse_rent.doctype.outward_jawak.multi_print import (
+    get_page,
+    get_print_docs,
+    parse_doc_ids,
+    render_print_docs,
+)
+
 
 @frappe.whitelist()
-def generate_multi_gatepass(doc_ids):
+def generate_multi_gatepass(doc_ids, page=1):
     """
     Generate consolidated Gatepass HTML for multiple Outward Jawak records.
     
+    At most MAX_PRINT_RECORDS records are rendered per call; larger selections
+    are fetched page by page.
+    
     Args:
         doc_ids: Comma-separated string of Outward Jawak IDs or list of IDs
+        page: Page of the selection to render (1-based)
         
     Returns:
-        dict: Contains HTML content and success status
+        dict: Contains HTML content (complete page and body only), paging info and success status
     """
     try:
-        # Parse doc_ids if it's a string
-        if isinstance(doc_ids, str):
-            id_list = [doc_id.strip() for doc_id in doc_ids.split(',') if doc_id.strip()]
-        else:
-            id_list = doc_ids
-            
-        # Validate we have at least one ID
-        if not id_list or len(id_list) == 0:
-            frappe.throw(_("No document IDs provided"))
-            
-        # Fetch all Outward Jawak documents
-        docs = []
-        for doc_id in id_list:
-            try:
-                doc = frappe.get_doc('Outward Jawak', doc_id)
-                docs.append(doc)
-            except frappe.DoesNotExistError:
-                frappe.throw(_("Outward Jawak {0} not found").format(doc_id))
-                
-        # Get the Gate Pass print format
-        print_format = frappe.get_doc('Print Format', 'Gate Pass')
-        
-        # Prepare context for rendering
-        # CRITICAL: Pass all_docs in the context so the template can access it
-        context = {
-            'doc': docs[0],  # First doc for backward compatibility
-            'all_docs': docs,  # All documents for multi-record mode
-            'is_multi': len(docs) > 1,
-            'frappe': frappe,
-            'utils': frappe.utils,
-            '_': _,
-            # Add commonly used frappe modules to context
-            'get_fullname': get_fullname,
-        }
+        id_list, paging = get_page(parse_doc_ids(doc_ids), page)
         
-        # Render the HTML using Jinja
-        from frappe.utils.jinja import render_template
-        gate_pass_html = render_template(print_format.html, context)
+        # Fetch the page's Outward Jawak documents with their child tables in bulk
+        docs = get_print_docs('Outward Jawak', id_list)
+        
+        # Render with the cached Gate Pass template
+        gate_pass_html = render_print_docs('Gate Pass', docs, {
+            'get_fullname': get_fullname,
+        })
         
         # Wrap in complete HTML with print controls
-        final_html = get_complete_html(gate_pass_html, len(docs))
+        final_html = get_complete_html(gate_pass_html, paging['total'])
         
         return {
             'success': True,
             'html': final_html,
-            'count': len(docs)
+            'content': gate_pass_html,
+            'count': len(docs),
+            **paging,
         }
         
     except Exception as e:
@@ -0,0 +1,161 @@
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+# Most records rendered by one request; larger selections are printed page by page
+MAX_PRINT_RECORDS = 100
+
+# (site, print format) -> (modified, compiled template)
+_template_cache = {}
+
+
+def parse_doc_ids(doc_ids):
+    """
+    Comma-separated string (or list) of document IDs -> list of IDs, in the given order.
+    """
+    if isinstance(doc_ids, str):
+        id_list = [doc_id.strip() for doc_id in doc_ids.split(',') if doc_id.strip()]
+    else:
+        id_list = list(doc_ids or [])
+
+    if not id_list:
+        frappe.throw(_("No document IDs provided"))
+
+    return id_list
+
+
+def get_page(id_list, page=1):
+    """
+    One page of IDs and the paging info for the response.
+
+    Returns:
+        tuple: (IDs of the page, dict with page, total_pages and total)
+    """
+    page = max(frappe.utils.cint(page), 1)
+    total_pages = (len(id_list) + MAX_PRINT_RECORDS - 1) // MAX_PRINT_RECORDS
+    if page > total_pages:
+        frappe.throw(_("Page {0} is out of range, there are {1} page(s)").format(page, total_pages))
+
+    start = (page - 1) * MAX_PRINT_RECORDS
+    return id_list[start:start + MAX_PRINT_RECORDS], {
+        'page': page,
+        'total_pages': total_pages,
+        'total': len(id_list),
+    }
+
+
+def get_print_docs(doctype, id_list):
+    """
+    Load documents with all their child tables in a fixed number of queries:
+    one for the parents (permission checked) and one per table field.
+
+    Returns:
+        list: Documents in the order of id_list
+    """
+    parents = {
+        row.name: row
+        for row in frappe.get_list(doctype, filters={'name': ('in', id_list)}, fields=['*'], limit_page_length=0)
+    }
+
+    missing = [doc_id for doc_id in id_list if doc_id not in parents]
+    if missing:
+        frappe.throw(_("{0} {1} not found").format(_(doctype), ", ".join(missing)))
+
+    for table_field in frappe.get_meta(doctype).get_table_fields():
+        for parent in parents.values():
+            parent[table_field.fieldname] = []
+
+        for row in frappe.get_all(
+            table_field.options,
+            filters={
+                'parent': ('in', id_list),
+                'parenttype': doctype,
+                'parentfield': table_field.fieldname,
+            },
+            fields=['*'],
+            order_by='idx asc',
+        ):
+            parents[row.parent][table_field.fieldname].append(row)
+
+    docs = []
+    for doc_id in id_list:
+        values = parents[doc_id]
+        values['doctype'] = doctype
+        docs.append(frappe.get_doc(values))
+
+    return docs
+
+
+def get_print_template(print_format):
+    """
+    Compiled Jinja template of a Print Format, recompiled only when the Print
+    Format has been modified since it was cached.
+    """
+    modified = frappe.db.get_value('Print Format', print_format, 'modified')
+    if not modified:
+        frappe.throw(_("Print Format {0} not found").format(print_format))
+
+    key = (frappe.local.site, print_format)
+    cached = _template_cache.get(key)
+    if not cached or cached[0] != modified:
+        html = frappe.db.get_value('Print Format', print_format, 'html')
+        cached = _template_cache[key] = (modified, frappe.get_jenv().from_string(html or ''))
+
+    return cached[1]
+
+
+def render_print_docs(print_format, docs, context=None):
+    """
+    Render the documents with a multi-record Print Format.
+
+    The template gets the first document as `doc` (for backward compatibility)
+    and all of them as `all_docs`; Outward Jawak templates also get the Inward
+    Aawak of each lot as `aawaks` (see get_lot_aawaks).
+    """
+    template_context = {
+        'doc': docs[0],
+        'all_docs': docs,
+        'is_multi': len(docs) > 1,
+        'aawaks': get_lot_aawaks(docs) if docs[0].doctype == 'Outward Jawak' else {},
+        'frappe': frappe,
+        'utils': frappe.utils,
+        '_': _,
+    }
+    template_context.update(context or {})
+
+    return get_print_template(print_format).render(template_context)
+
+
+def get_lot_aawaks(docs):
+    """
+    Inward Aawak of each Outward Jawak's lot, in one query.
+
+    Returns:
+        dict: (firm, lot number, lot year) -> Inward Aawak row; cancelled
+            Aawaks (replaced by their amendments) are left out
+    """
+    lots = {
+        (doc.firm, doc.inward_lot_no, cint(doc.inward_lot_year))
+        for doc in docs
+        if doc.firm and doc.inward_lot_no and cint(doc.inward_lot_year)
+    }
+    if not lots:
+        return {}
+
+    aawaks = {}
+    for row in frappe.get_all(
+        'Inward Aawak',
+        filters={
+            'firm': ('in', list({firm for firm, lot_number, lot_year in lots})),
+            'lot_number': ('in', list({lot_number for firm, lot_number, lot_year in lots})),
+            'lot_year': ('in', list({lot_year for firm, lot_number, lot_year in lots})),
+            'docstatus': ('<', 2),
+        },
+        fields=['*'],
+        limit_page_length=0,
+    ):
+        key = (row.firm, row.lot_number, cint(row.lot_year))
+        if key in lots:
+            aawaks[key] = row
+
+    return aawaks
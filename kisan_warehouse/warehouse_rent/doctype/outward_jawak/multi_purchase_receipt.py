@@ -2,65 +2,50 @@ import frappe
 from frappe import _
 from frappe.utils import get_fullname, money_in_words
 
+from kisan_warehouse.warehouse_rent.doctype.outward_jawak.multi_print import (
+    get_page,
+    get_print_docs,
+    parse_doc_ids,
+    render_print_docs,
+)
+
 
 @frappe.whitelist()
-def generate_multi_purchase_receipt(doc_ids):
+def generate_multi_purchase_receipt(doc_ids, page=1):
     """
     Generate consolidated Purchase Receipt HTML for multiple Outward Jawak records.
     
+    At most MAX_PRINT_RECORDS records are rendered per call; larger selections
+    are fetched page by page.
+    
     Args:
         doc_ids: Comma-separated string of Outward Jawak IDs or list of IDs
+        page: Page of the selection to render (1-based)
         
     Returns:
-        dict: Contains HTML content and success status
+        dict: Contains HTML content (complete page and body only), paging info and success status
     """
     try:
-        # Parse doc_ids if it's a string
-        if isinstance(doc_ids, str):
-            id_list = [doc_id.strip() for doc_id in doc_ids.split(',') if doc_id.strip()]
-        else:
-            id_list = doc_ids
-            
-        # Validate we have at least one ID
-        if not id_list or len(id_list) == 0:
-            frappe.throw(_("No document IDs provided"))
-            
-        # Fetch all Outward Jawak documents
-        docs = []
-        for doc_id in id_list:
-            try:
-                doc = frappe.get_doc('Outward Jawak', doc_id)
-                docs.append(doc)
-            except frappe.DoesNotExistError:
-                frappe.throw(_("Outward Jawak {0} not found").format(doc_id))
-                
-        # Get the Purchase Receipt print format
-        print_format = frappe.get_doc('Print Format', 'Purchase Receipt')
-        
-        # Prepare context for rendering
-        # Pass all_docs for multi-record mode
-        context = {
-            'doc': docs[0],  # First doc for backward compatibility
-            'all_docs': docs,  # All documents for multi-record mode
-            'is_multi': len(docs) > 1,
-            'frappe': frappe,
-            'utils': frappe.utils,
-            '_': _,
+        id_list, paging = get_page(parse_doc_ids(doc_ids), page)
+        
+        # Fetch the page's Outward Jawak documents with their child tables in bulk
+        docs = get_print_docs('Outward Jawak', id_list)
+        
+        # Render with the cached Purchase Receipt template
+        receipt_html = render_print_docs('Purchase Receipt', docs, {
             'get_fullname': get_fullname,
             'money_in_words': money_in_words,
-        }
-        
-        # Render the HTML using Jinja
-        from frappe.utils.jinja import render_template
-        receipt_html = render_template(print_format.html, context)
+        })
         
         # Wrap in complete HTML with print controls
-        final_html = get_complete_html(receipt_html, len(docs))
+        final_html = get_complete_html(receipt_html, paging['total'])
         
         return {
             'success': True,
             'html': final_html,
-            'count': len(docs)
+            'content': receipt_html,
+            'count': len(docs),
+            **paging,
         }
         
     except Exception as e:
@@ -4,19 +4,28 @@
 console.log('Outward Jawak client script loaded');
 
 let currentAawak = null;
+let rentSettingsPromise = null;
+
+const RENT_SETTINGS_STORAGE_KEY = 'kisan_warehouse:rent_settings';
 
 frappe.ui.form.on('Outward Jawak', {
 	onload: function (frm) {
 		console.log('Outward Jawak onload event called');
 
+		// Validate the locally cached rent settings once per form load
+		rentSettingsPromise = null;
+		getRentSettings();
+
 		// Ensure proper field display on form load
 		if (frm.doc.storage_customer || (frm.doc.commodities && frm.doc.commodities.length > 0) || frm.doc.godown || frm.doc.floor || frm.doc.chamber) {
-			// Refresh fields to show actual names instead of naming series
-			frm.refresh_field('storage_customer');
-			frm.refresh_field('commodities');
-			frm.refresh_field('godown');
-			frm.refresh_field('floor');
-			frm.refresh_field('chamber');
+			// Refresh fields to show actual names instead of naming series, all titles in one request
+			kisan_warehouse.link_titles.load_form(frm).then(function () {
+				frm.refresh_field('storage_customer');
+				frm.refresh_field('commodities');
+				frm.refresh_field('godown');
+				frm.refresh_field('floor');
+				frm.refresh_field('chamber');
+			});
 		}
 
 		// If form has data but amounts are not calculated, trigger calculation
@@ -87,11 +96,21 @@ frappe.ui.form.on('Outward Jawak', {
 
 	firm: function (frm) {
 		console.log('firm field changed to:', frm.doc.firm);
+		clearLotYear(frm);
 		onFirmOrLotChange(frm);
 	},
 
 	inward_lot_no: function (frm) {
 		console.log('inward_lot_no field changed to:', frm.doc.inward_lot_no);
+		clearLotYear(frm);
+		onFirmOrLotChange(frm);
+	},
+
+	inward_lot_year: function (frm) {
+		// Set from the fetched lot, or by hand when the lot number was used in several years
+		if (!frm.doc.inward_lot_year || (currentAawak && currentAawak.lot_year === frm.doc.inward_lot_year)) {
+			return;
+		}
 		onFirmOrLotChange(frm);
 	},
 
@@ -172,52 +191,32 @@ frappe.ui.form.on('Jawak Bag Detail', {
 // Helper Functions
 
 function loadLotOptions(frm) {
-	// If no firm selected, clear options and value
+	// If no firm selected, clear the value
 	if (!frm.doc.firm) {
-		frm.set_df_property('inward_lot_no', 'options', []);
-		frm.set_value('inward_lot_no', '');
+		if (frm.doc.inward_lot_no) {
+			frm.set_value('inward_lot_no', '');
+		}
 		return;
 	}
 
-	const firm = String(frm.doc.firm);
-
-	console.log('Loading lot options for firm:', firm);
-
-	frappe.call({
-		method: 'frappe.client.get_list',
-		args: {
-			doctype: 'Inward Aawak',
-			filters: {
-				firm: firm
-			},
-			fields: ['lot_number'],
-			order_by: 'lot_number asc',
-			limit_page_length: 500
-		},
-		callback: function (r) {
-			if (r.message && r.message.length > 0) {
-				// Collect unique lot numbers
-				const lots = [...new Set(r.message.map(row => row.lot_number).filter(Boolean))];
-				// Set options; ensure string values so they match stored lot_number
-				frm.set_df_property('inward_lot_no', 'options', lots);
-
-				// If current lot no is not in options, clear it
-				if (frm.doc.inward_lot_no && !lots.includes(frm.doc.inward_lot_no)) {
-					frm.set_value('inward_lot_no', '');
-				}
-			} else {
-				frm.set_df_property('inward_lot_no', 'options', []);
-				frm.set_value('inward_lot_no', '');
-				frappe.msgprint({
-					title: __('No Lots Found'),
-					message: __('No Inward Aawak records found for Firm {0}.', [firm]),
-					indicator: 'orange'
-				});
+	// Lots are searched on the server by firm and typed prefix, so every lot is reachable
+	frm.set_query('inward_lot_no', function () {
+		return {
+			query: 'kisan_warehouse.warehouse_rent.doctype.inward_aawak.inward_aawak.search_lots',
+			params: {
+				firm: frm.doc.firm
 			}
-		}
+		};
 	});
 }
 
+function clearLotYear(frm) {
+	// Lot numbers restart every year, so the year is looked up again for the new lot
+	if (frm.doc.inward_lot_year) {
+		frm.set_value('inward_lot_year', 0);
+	}
+}
+
 function onFirmOrLotChange(frm) {
 	// Reset any previously fetched data to avoid stale values
 	currentAawak = null;
@@ -248,51 +247,16 @@ function fetchAawakByFirmAndLot(frm) {
 		return;
 	}
 
-	const firmFilter = String(firm);
-	const lotFilter = String(lotNo);
-
-	console.log('Fetching Inward Aawak using Firm and Inward Lot No:', firmFilter, lotFilter);
+	console.log('Fetching Inward Aawak using Firm and Inward Lot No:', firm, lotNo);
 
+	// Aawak, commodity names, bag details and released bags in one round trip
 	frappe.call({
-		method: 'frappe.client.get_list',
+		method: 'kisan_warehouse.warehouse_rent.doctype.inward_aawak.inward_aawak.get_aawak_for_jawak',
 		args: {
-			doctype: 'Inward Aawak',
-			filters: {
-				firm: firmFilter,
-				lot_number: lotFilter
-			},
-			fields: ['name'],
-			limit_page_length: 2
-		},
-		callback: function (r) {
-			if (r.message && r.message.length === 1) {
-				console.log('Unique Inward Aawak match found:', r.message[0].name);
-				fetchAawakRecord(frm, r.message[0].name);
-			} else if (r.message && r.message.length === 0) {
-				clearForm(frm);
-				frappe.msgprint({
-					title: __('Inward Aawak Not Found'),
-					message: __('No Inward Aawak found for Firm {0} and Inward Lot No {1}.', [firm, lotNo]),
-					indicator: 'red'
-				});
-			} else {
-				clearForm(frm);
-				frappe.msgprint({
-					title: __('Multiple Matches Found'),
-					message: __('Multiple Inward Aawak records found for Firm {0} and Inward Lot No {1}. Please resolve duplicates.', [firm, lotNo]),
-					indicator: 'red'
-				});
-			}
-		}
-	});
-}
-
-function fetchAawakRecord(frm, aawakName) {
-	frappe.call({
-		method: 'frappe.client.get',
-		args: {
-			doctype: 'Inward Aawak',
-			name: aawakName
+			firm: String(firm),
+			lot_number: String(lotNo),
+			lot_year: frm.doc.inward_lot_year || null,
+			exclude_jawak: frm.is_new() ? null : frm.doc.name
 		},
 		callback: function (r) {
 			console.log('Inward Aawak data received:', r.message);
@@ -302,14 +266,10 @@ function fetchAawakRecord(frm, aawakName) {
 
 				// Validate Jawak date against Aawak date after populating
 				validateJawakDate(frm);
-			} else {
-				clearForm(frm);
-				frappe.msgprint({
-					title: __('Error'),
-					message: __('Could not fetch Inward Aawak details'),
-					indicator: 'red'
-				});
 			}
+		},
+		error: function () {
+			clearForm(frm);
 		}
 	});
 }
@@ -327,7 +287,15 @@ function populateFromAawakData(frm, aawak) {
 	// Keep reference to current Inward Aawak for downstream calculations
 	currentAawak = aawak;
 
-	// Populate basic fields
+	// The lot's year, as lot numbers restart every year
+	if (aawak.lot_year && frm.doc.inward_lot_year !== aawak.lot_year) {
+		frm.set_value('inward_lot_year', aawak.lot_year);
+	}
+
+	// Populate basic fields; the customer name comes with the payload
+	if (aawak.storage_customer_name) {
+		kisan_warehouse.link_titles.add({ 'Storage Customer': { [aawak.storage_customer]: aawak.storage_customer_name } });
+	}
 	frm.set_value('storage_customer', aawak.storage_customer);
 	frm.set_value('godown', aawak.godown);
 
@@ -338,12 +306,15 @@ function populateFromAawakData(frm, aawak) {
 		frm.set_value('chamber', allocation.chamber);
 	}
 
-	// Populate commodities with names (async)
+	// Populate commodities with names
 	populateCommodities(frm, aawak.commodities);
 
 	// Populate bag details
 	populateBagDetails(frm, aawak);
 
+	// Show what is still outstanding on the lot before this release
+	showLotRent(frm, aawak.name);
+
 	// Auto-fetch inward charges
 	if (aawak.charges) {
 		frm.set_value('inward_charges', aawak.charges);
@@ -358,53 +329,49 @@ function populateFromAawakData(frm, aawak) {
 	frm.refresh_field('inward_charges');
 }
 
+function showLotRent(frm, aawakName) {
+	frappe.call({
+		method: 'kisan_warehouse.warehouse_rent.rent.get_lot_rent',
+		args: {
+			inward_aawak: aawakName,
+			as_of_date: frm.doc.jawak_date
+		},
+		callback: function (r) {
+			if (r.message) {
+				frm.dashboard.set_headline(__('Lot {0}: {1} bags outstanding, rent accrued {2}', [
+					frm.doc.inward_lot_no,
+					r.message.outstanding_bags,
+					format_currency(r.message.accrued_rent)
+				]));
+			}
+		}
+	});
+}
+
 function populateCommodities(frm, inward_commodities) {
 	frm.clear_table('commodities');
 
 	if (inward_commodities && inward_commodities.length > 0) {
-		let commodity_ids = inward_commodities.map(row => row.commodity);
-
-		// Fetch commodity names to prime the Link Title cache for display
-		frappe.call({
-			method: 'frappe.client.get_list',
-			args: {
-				doctype: 'Commodity',
-				filters: [['name', 'in', commodity_ids]],
-				fields: ['name', 'commodity_name']
-			},
-			callback: function (r) {
-				if (r.message) {
-					// Prime the link title cache so the UI displays names instead of IDs
-					if (!frappe.boot.link_title) frappe.boot.link_title = {};
-					if (!frappe.boot.link_title['Commodity']) frappe.boot.link_title['Commodity'] = {};
-
-					r.message.forEach(c => {
-						// Update global link title cache
-						frappe.boot.link_title['Commodity'][c.name] = c.commodity_name;
-
-						// Also try adding to local link_titles if available (newer Frappe versions)
-						if (frappe.utils.add_link_title) {
-							frappe.utils.add_link_title('Commodity', c.name, c.commodity_name);
-						}
-					});
-
-					// Add rows using set_value to trigger UI updates and proper rendering
-					inward_commodities.forEach(row => {
-						let child = frm.add_child('commodities');
-						frappe.model.set_value(child.doctype, child.name, 'commodity', row.commodity);
-					});
-
-					frm.refresh_field('commodities');
-
-					// Force grid refresh to ensure titles are picked up
-					if (frm.fields_dict['commodities'] && frm.fields_dict['commodities'].grid) {
-						frm.fields_dict['commodities'].grid.refresh();
-					}
-
-					console.log('Commodities populated and cache primed with names:', r.message);
-				}
+		// Names come with the Aawak payload; add them to the shared link title cache so the UI shows them
+		let titles = {};
+		inward_commodities.forEach(row => {
+			if (row.commodity_name) {
+				titles[row.commodity] = row.commodity_name;
 			}
 		});
+		kisan_warehouse.link_titles.add({ 'Commodity': titles });
+
+		inward_commodities.forEach(row => {
+			let child = frm.add_child('commodities');
+			frappe.model.set_value(child.doctype, child.name, 'commodity', row.commodity);
+		});
+
+		frm.refresh_field('commodities');
+
+		// Force grid refresh to ensure titles are picked up
+		if (frm.fields_dict['commodities'] && frm.fields_dict['commodities'].grid) {
+			frm.fields_dict['commodities'].grid.refresh();
+		}
 	} else {
 		frm.refresh_field('commodities');
 	}
@@ -416,18 +383,21 @@ function populateBagDetails(frm, aawak) {
 	// Clear existing bag details
 	frm.clear_table('jawak_bag_details');
 
-	if (aawak.bag_details && aawak.bag_details.length > 0) {
-		console.log('Found bag details:', aawak.bag_details);
+	// Only bag rows with bags still in the lot (remaining after earlier Jawaks)
+	let bag_details = (aawak.bag_details || []).filter(bagDetail => bagDetail.remaining_bags > 0);
+
+	if (bag_details.length > 0) {
+		console.log('Found bag details:', bag_details);
 
 		// Directly use bag details from Inward Aawak
 		// This handles multiple commodities and their rates correctly
-		aawak.bag_details.forEach(bagDetail => {
+		bag_details.forEach(bagDetail => {
 			let new_row = frm.add_child('jawak_bag_details');
 
 			// Set bag type as bag weight (e.g., "5" for 5kg bags)
 			frappe.model.set_value('Jawak Bag Detail', new_row.name, 'bag_type', bagDetail.bag_weight);
-			frappe.model.set_value('Jawak Bag Detail', new_row.name, 'total_bags', bagDetail.number_of_bags);
-			frappe.model.set_value('Jawak Bag Detail', new_row.name, 'release_bags', bagDetail.number_of_bags);
+			frappe.model.set_value('Jawak Bag Detail', new_row.name, 'total_bags', bagDetail.remaining_bags);
+			frappe.model.set_value('Jawak Bag Detail', new_row.name, 'release_bags', bagDetail.remaining_bags);
 
 			// Auto-populate rate from Inward Aawak's bag details
 			// This fixes the "Commodity not found" error and supports multiple commodities
@@ -436,8 +406,8 @@ function populateBagDetails(frm, aawak) {
 
 			console.log('Added bag detail row:', {
 				bag_type: bagDetail.bag_weight,
-				total_bags: bagDetail.number_of_bags,
-				release_bags: bagDetail.number_of_bags,
+				total_bags: bagDetail.remaining_bags,
+				release_bags: bagDetail.remaining_bags,
 				rate: rate
 			});
 		});
@@ -447,6 +417,12 @@ function populateBagDetails(frm, aawak) {
 		// Calculate all amounts after populating bag details
 		recalculateAllAmounts(frm);
 
+	} else if (aawak.bag_details && aawak.bag_details.length > 0) {
+		frappe.msgprint({
+			title: __('Lot Fully Released'),
+			message: __('All bags of this lot have already been released'),
+			indicator: 'orange'
+		});
 	} else {
 		frappe.msgprint({
 			title: __('No Bag Details Found'),
@@ -464,51 +440,64 @@ function recalculateAllAmounts(frm) {
 
 	console.log('Recalculating all amounts for jawak_date:', frm.doc.jawak_date);
 
-	// Fetch settings ONCE to avoid N+1 queries and race conditions
-	frappe.call({
-		method: 'frappe.client.get',
-		args: {
-			doctype: 'App Settings',
-			name: 'App Settings'
-		},
-		callback: function (r) {
-			if (r.message) {
-				let settings = r.message;
+	getRentSettings().then(settings => {
+		if (frm.doc.jawak_bag_details) {
+			// Iterate and calculate synchronously
+			frm.doc.jawak_bag_details.forEach(row => {
+				performRowCalculation(frm, 'Jawak Bag Detail', row.name, settings);
+			});
+		}
 
-				if (frm.doc.jawak_bag_details) {
-					// Iterate and calculate synchronously
-					frm.doc.jawak_bag_details.forEach(row => {
-						performRowCalculation(frm, 'Jawak Bag Detail', row.name, settings);
-					});
-				}
+		// Refresh grid to show updates
+		frm.refresh_field('jawak_bag_details');
 
-				// Refresh grid to show updates
-				frm.refresh_field('jawak_bag_details');
+		// Now calculate parent totals immediately as rows are updated
+		calculateParentTotals(frm);
+	});
+}
 
-				// Now calculate parent totals immediately as rows are updated
-				calculateParentTotals(frm);
-			}
+function calculateRowAmount(frm, cdt, cdn, updateParent = false) {
+	getRentSettings().then(settings => {
+		performRowCalculation(frm, cdt, cdn, settings);
+		if (updateParent) {
+			calculateParentTotals(frm);
 		}
 	});
 }
 
-function calculateRowAmount(frm, cdt, cdn, updateParent = false) {
-	// Fetch settings for single row calculation
-	frappe.call({
-		method: 'frappe.client.get',
+function getRentSettings() {
+	// One request per form load: the server answers "unchanged" when the
+	// version stored in the browser is current, otherwise sends the new settings
+	if (rentSettingsPromise) {
+		return rentSettingsPromise;
+	}
+
+	let cached = null;
+	try {
+		cached = JSON.parse(localStorage.getItem(RENT_SETTINGS_STORAGE_KEY));
+	} catch (e) {
+		cached = null;
+	}
+
+	rentSettingsPromise = frappe.call({
+		method: 'kisan_warehouse.utils.rent_settings.get_rent_settings_payload',
 		args: {
-			doctype: 'App Settings',
-			name: 'App Settings'
-		},
-		callback: function (r) {
-			if (r.message) {
-				performRowCalculation(frm, cdt, cdn, r.message);
-				if (updateParent) {
-					calculateParentTotals(frm);
-				}
-			}
+			version: cached ? cached.version : null
 		}
+	}).then(r => {
+		let settings = r.message || {};
+		if (settings.unchanged && cached) {
+			return cached;
+		}
+		localStorage.setItem(RENT_SETTINGS_STORAGE_KEY, JSON.stringify(settings));
+		return settings;
+	}, () => {
+		// Let the next calculation retry instead of caching the failure
+		rentSettingsPromise = null;
+		return cached || {};
 	});
+
+	return rentSettingsPromise;
 }
 
 function performRowCalculation(frm, cdt, cdn, settings) {
@@ -4,14 +4,20 @@
 import frappe
 from frappe.model.document import Document
 from frappe.model.naming import make_autoname
+from frappe.utils import getdate, nowdate
+
+from kisan_warehouse.warehouse_rent import bag_balance, occupancy
+from kisan_warehouse.warehouse_rent.rent import apply_jawak_rent
+from kisan_warehouse.warehouse_rent.sequence import add_lot_unique_index, get_next_sequence
 
 
 class OutwardJawak(Document):
 	def autoname(self):
 		"""
-		Custom naming to support firm-wise sequences, matching Inward Aawak pattern.
+		Firm-wise sequences, matching Inward Aawak pattern.
 		
-		Each firm gets its own independent sequence.
+		Each firm gets its own independent sequence per year, handed out by
+		kisan_warehouse.warehouse_rent.sequence.
 		Format: JAWAK-{firm_sequence}-YYYY-####
 		
 		Where:
@@ -23,41 +29,36 @@ class OutwardJawak(Document):
 		         JAWAK-0002-2025-0001 (Firm FIRM-0002, first jawak of 2025)
 		"""
 		if self.firm:
-			# Get the firm's sequence number from its name
-			# Firm name format is FIRM-0001, FIRM-0002, etc.
-			firm_parts = self.firm.split('-')
-			if len(firm_parts) >= 2:
-				firm_seq = firm_parts[-1]  # Extract the numeric part (e.g., "0001")
-			else:
-				# Fallback if firm name doesn't follow expected format
-				firm_seq = self.firm.replace('FIRM-', '').replace('FIRM', '')[:4].zfill(4)
-			
-			# Create firm-specific series key
-			# This ensures each firm has its own sequence counter
-			series_key = f"JAWAK-.{self.firm}-.YYYY.-.####"
-			
-			# Get next number from firm-specific series
-			full_name = make_autoname(series_key)
-			
-			# Extract year and sequence number from the generated name
-			# Format will be: JAWAK-FIRM-0001-2025-0001
-			parts = full_name.split('-')
-			
-			if len(parts) >= 2:
-				year = parts[-2]
-				sequence = parts[-1]
-				# Create final name with firm sequence included
-				self.name = f"JAWAK-{firm_seq}-{year}-{sequence}"
-				# Set lot number (sequence only) for printing/receipts
-				self.lot_number = sequence
-			else:
-				# Fallback in case of unexpected format
-				self.name = full_name
+			sequence = get_next_sequence("JAWAK", self.firm)
+			self.name = sequence.name
+			# Set lot number (sequence only) for printing/receipts
+			self.lot_number = sequence.lot_number
+			self.lot_year = sequence.year
 		else:
 			# Fallback for legacy records or if firm is not set
 			# This maintains backward compatibility
 			self.name = make_autoname("JAWAK-.YYYY.-.####")
 			self.lot_number = self.name.split('-')[-1] if '-' in self.name else ""
+			self.lot_year = getdate(nowdate()).year
 	
 	def validate(self):
-		pass
\ No newline at end of file
+		# The lot's year, as lot numbers restart every year
+		bag_balance.set_inward_lot_year(self)
+
+		# Rent is recomputed server-side so saved amounts never depend on the browser
+		apply_jawak_rent(self)
+
+		# Bags of each weight left in the lot, read with the lot's rows locked
+		bag_balance.validate_release(self)
+
+	def on_update(self):
+		occupancy.on_jawak_update(self)
+		bag_balance.on_jawak_update(self)
+
+	def on_trash(self):
+		occupancy.on_jawak_trash(self)
+		bag_balance.on_jawak_trash(self)
+
+
+def on_doctype_update():
+	add_lot_unique_index("Outward Jawak")
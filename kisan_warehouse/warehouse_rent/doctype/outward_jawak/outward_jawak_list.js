@@ -1,5 +1,9 @@
 frappe.listview_settings['Outward Jawak'] = {
     onload: function (listview) {
+        // ============ BACKGROUND PDF BUTTONS ============
+        kisan_warehouse.print_job.add_action(listview, __('Gatepass PDF'), 'Gate Pass');
+        kisan_warehouse.print_job.add_action(listview, __('Purchase Receipt PDF'), 'Purchase Receipt');
+
         // ============ GATEPASS BUTTON ============
         listview.page.add_action_item(__('Generate Gatepass'), function () {
             const selected = listview.get_checked_items();
@@ -27,37 +31,7 @@ frappe.listview_settings['Outward Jawak'] = {
                 return;
             }
 
-            frappe.call({
-                method: 'kisan_warehouse.warehouse_rent.doctype.outward_jawak.multi_gatepass.generate_multi_gatepass',
-                args: {
-                    doc_ids: doc_ids.join(',')
-                },
-                callback: function (r) {
-                    if (r.message && r.message.success) {
-                        const printWindow = window.open('', '_blank');
-                        printWindow.document.write(r.message.html);
-                        printWindow.document.close();
-
-                        frappe.show_alert({
-                            message: __('Gatepass generated for {0} records', [r.message.count]),
-                            indicator: 'green'
-                        }, 3);
-                    } else {
-                        frappe.msgprint({
-                            title: __('Error'),
-                            message: r.message.error || __('Failed to generate Gatepass'),
-                            indicator: 'red'
-                        });
-                    }
-                },
-                error: function (err) {
-                    frappe.msgprint({
-                        title: __('Error'),
-                        message: __('Failed to generate Gatepass. Please try again.'),
-                        indicator: 'red'
-                    });
-                }
-            });
+            generateMultiPrint(doc_ids, 'kisan_warehouse.warehouse_rent.doctype.outward_jawak.multi_gatepass.generate_multi_gatepass', __('Gatepass'));
         });
 
         // ============ PURCHASE RECEIPT BUTTON ============
@@ -87,37 +61,61 @@ frappe.listview_settings['Outward Jawak'] = {
                 return;
             }
 
-            frappe.call({
-                method: 'kisan_warehouse.warehouse_rent.doctype.outward_jawak.multi_purchase_receipt.generate_multi_purchase_receipt',
-                args: {
-                    doc_ids: doc_ids.join(',')
-                },
-                callback: function (r) {
-                    if (r.message && r.message.success) {
-                        const printWindow = window.open('', '_blank');
+            generateMultiPrint(doc_ids, 'kisan_warehouse.warehouse_rent.doctype.outward_jawak.multi_purchase_receipt.generate_multi_purchase_receipt', __('Purchase Receipt'));
+        });
+    }
+};
+
+// Render the selection page by page (the server caps records per request) into one print window
+function generateMultiPrint(doc_ids, method, label) {
+    // Opened before the first call returns so popup blockers allow it
+    const printWindow = window.open('', '_blank');
+    let printed = 0;
+
+    const renderPage = function (page) {
+        frappe.call({
+            method: method,
+            args: {
+                doc_ids: doc_ids.join(','),
+                page: page
+            },
+            callback: function (r) {
+                if (r.message && r.message.success) {
+                    if (page === 1) {
                         printWindow.document.write(r.message.html);
                         printWindow.document.close();
-
-                        frappe.show_alert({
-                            message: __('Purchase Receipt generated for {0} records', [r.message.count]),
-                            indicator: 'green'
-                        }, 3);
                     } else {
-                        frappe.msgprint({
-                            title: __('Error'),
-                            message: r.message.error || __('Failed to generate Purchase Receipt'),
-                            indicator: 'red'
-                        });
+                        printWindow.document.querySelector('.print-container')
+                            .insertAdjacentHTML('beforeend', r.message.content);
                     }
-                },
-                error: function (err) {
+                    printed += r.message.count;
+
+                    if (page < r.message.total_pages) {
+                        renderPage(page + 1);
+                        return;
+                    }
+
+                    frappe.show_alert({
+                        message: __('{0} generated for {1} records', [label, printed]),
+                        indicator: 'green'
+                    }, 3);
+                } else {
                     frappe.msgprint({
                         title: __('Error'),
-                        message: __('Failed to generate Purchase Receipt. Please try again.'),
+                        message: (r.message && r.message.error) || __('Failed to generate {0}', [label]),
                         indicator: 'red'
                     });
                 }
-            });
+            },
+            error: function (err) {
+                frappe.msgprint({
+                    title: __('Error'),
+                    message: __('Failed to generate {0}. Please try again.', [label]),
+                    indicator: 'red'
+                });
+            }
         });
-    }
-};
+    };
+
+    renderPage(1);
+}
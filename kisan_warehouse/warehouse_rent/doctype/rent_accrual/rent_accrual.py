@@ -0,0 +1,21 @@
+# Copyright (c) 2026, Kisan Warehouse and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class RentAccrual(Document):
+	"""
+	Rent accrued so far on one open Inward Aawak lot, named after the Aawak.
+
+	Rows are rewritten by the nightly run in kisan_warehouse.warehouse_rent.rent
+	and are never edited by hand.
+	"""
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Rent Accrual", ["firm", "lot_number"])
+	frappe.db.add_index("Rent Accrual", ["storage_customer"])
@@ -0,0 +1,332 @@
+"""
+Chamber occupancy ledger.
+
+Chamber Occupancy keeps the bags sitting in each Floor Chamber: Inward Aawak
+chamber allocations add to it and Outward Jawak releases take from the
+Jawak's chamber. Like the rent engine, every Aawak and Jawak that is not
+cancelled counts.
+
+Capacity is enforced in InwardAawak.validate with the chambers locked, so two
+Aawaks saved at the same time cannot both take the last free space.
+"""
+
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.utils import cint, now
+
+
+def validate_chamber_capacity(aawak):
+	"""Throw if the Aawak's allocations would take any chamber over its max capacity."""
+	requested = get_aawak_allocations(aawak)
+	if not requested:
+		return
+
+	previous = aawak.get_doc_before_save()
+	posted = get_aawak_allocations(previous) if previous and previous.docstatus < 2 else {}
+
+	chambers = lock_chambers(list(requested))
+	occupied = get_occupied_bags(list(requested))
+
+	errors = []
+	for chamber, bags in requested.items():
+		# Only a larger allocation needs free space; unchanged rows stay valid if capacity is lowered later
+		if chamber not in chambers or bags <= posted.get(chamber, 0):
+			continue
+
+		max_capacity = cint(chambers[chamber].max_capacity)
+		free_capacity = max_capacity - (occupied.get(chamber, 0) - posted.get(chamber, 0))
+		if max_capacity and bags > free_capacity:
+			errors.append(
+				_("Chamber {0}: {1} bags allocated but only {2} of {3} bags free").format(
+					chambers[chamber].chamber_name or chamber, bags, max(free_capacity, 0), max_capacity
+				)
+			)
+
+	if errors:
+		frappe.throw("<br>".join(errors), title=_("Chamber Capacity Exceeded"))
+
+
+def lock_chambers(chambers):
+	"""Lock the Floor Chamber rows (in name order, to avoid deadlocks) and return their capacity."""
+	rows = frappe.db.sql(
+		"""
+		SELECT name, chamber_name, max_capacity
+		FROM `tabFloor Chamber`
+		WHERE name IN %(chambers)s
+		ORDER BY name
+		FOR UPDATE
+		""",
+		{"chambers": chambers},
+		as_dict=True,
+	)
+	return {row.name: row for row in rows}
+
+
+def get_occupied_bags(chambers):
+	return dict(
+		frappe.db.sql(
+			"""
+			SELECT name, occupied_bags
+			FROM `tabChamber Occupancy`
+			WHERE name IN %(chambers)s
+			""",
+			{"chambers": chambers},
+		)
+	)
+
+
+def get_aawak_allocations(aawak):
+	"""Bags allocated per chamber on one Inward Aawak."""
+	allocations = defaultdict(int)
+	for row in aawak.chamber_allocations:
+		if row.chamber and cint(row.bags_allocated):
+			allocations[row.chamber] += cint(row.bags_allocated)
+	return allocations
+
+
+def get_jawak_releases(jawak):
+	"""Bags released from the Jawak's chamber."""
+	bags = sum(cint(row.release_bags) for row in jawak.jawak_bag_details)
+	return {jawak.chamber: bags} if jawak.chamber and bags else {}
+
+
+def on_aawak_update(aawak):
+	previous = aawak.get_doc_before_save()
+	if previous and previous.docstatus < 2:
+		post_occupancy(get_aawak_allocations(previous), allocated_sign=-1)
+	if aawak.docstatus < 2:
+		post_occupancy(get_aawak_allocations(aawak), allocated_sign=1)
+
+
+def on_aawak_cancel(aawak):
+	post_occupancy(get_aawak_allocations(aawak), allocated_sign=-1)
+
+
+def on_aawak_trash(aawak):
+	# Cancelled Aawaks were already reversed in on_cancel
+	if aawak.docstatus < 2:
+		post_occupancy(get_aawak_allocations(aawak), allocated_sign=-1)
+
+
+def on_jawak_update(jawak):
+	previous = jawak.get_doc_before_save()
+	if previous:
+		post_occupancy(get_jawak_releases(previous), released_sign=-1)
+	post_occupancy(get_jawak_releases(jawak), released_sign=1)
+
+
+def on_jawak_trash(jawak):
+	post_occupancy(get_jawak_releases(jawak), released_sign=-1)
+
+
+def post_occupancy(bags_by_chamber, allocated_sign=0, released_sign=0):
+	"""Atomically add allocated and/or released bags to each chamber's row."""
+	for chamber, bags in bags_by_chamber.items():
+		allocated_bags = allocated_sign * bags
+		released_bags = released_sign * bags
+		frappe.db.sql(
+			"""
+			INSERT INTO `tabChamber Occupancy`
+				(name, creation, modified, owner, modified_by, docstatus,
+				chamber, allocated_bags, released_bags, occupied_bags)
+			VALUES
+				(%(chamber)s, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+				%(chamber)s, %(allocated_bags)s, %(released_bags)s, %(occupied_bags)s)
+			ON DUPLICATE KEY UPDATE
+				allocated_bags = allocated_bags + VALUES(allocated_bags),
+				released_bags = released_bags + VALUES(released_bags),
+				occupied_bags = occupied_bags + VALUES(occupied_bags),
+				modified = VALUES(modified), modified_by = VALUES(modified_by)
+			""",
+			{
+				"chamber": chamber,
+				"allocated_bags": allocated_bags,
+				"released_bags": released_bags,
+				"occupied_bags": allocated_bags - released_bags,
+				"now": now(),
+				"user": frappe.session.user,
+			},
+		)
+
+
+@frappe.whitelist()
+def get_chamber_availability(godown=None, floor=None, chamber=None, inward_aawak=None):
+	"""
+	Max capacity, occupied bags and free capacity of every chamber of a godown
+	or floor (or one chamber), in one query.
+
+	Args:
+		godown, floor, chamber: optional filters
+		inward_aawak: count this Aawak's own allocations as free, for editing it
+	"""
+	frappe.has_permission("Floor Chamber", "read", throw=True)
+
+	conditions = []
+	values = {"inward_aawak": inward_aawak or ""}
+	for condition, fieldname, value in (
+		("fl.godown = %(godown)s", "godown", godown),
+		("fc.floor = %(floor)s", "floor", floor),
+		("fc.name = %(chamber)s", "chamber", chamber),
+	):
+		if value:
+			conditions.append(f"AND {condition}")
+			values[fieldname] = value
+
+	return frappe.db.sql(
+		"""
+		SELECT
+			fc.name as chamber,
+			fc.chamber_name,
+			fc.chamber_code,
+			fc.floor,
+			fl.floor_name,
+			fl.godown,
+			fl.floor_number,
+			fl.status as floor_status,
+			fc.status,
+			COALESCE(fc.max_capacity, 0) as max_capacity,
+			COALESCE(occ.occupied_bags, 0) - COALESCE(own.bags_allocated, 0) as occupied_bags,
+			GREATEST(COALESCE(fc.max_capacity, 0) - COALESCE(occ.occupied_bags, 0)
+				+ COALESCE(own.bags_allocated, 0), 0) as free_capacity
+		FROM `tabFloor Chamber` fc
+		INNER JOIN `tabGodown Floor` fl ON fl.name = fc.floor
+		LEFT JOIN `tabChamber Occupancy` occ ON occ.name = fc.name
+		LEFT JOIN (
+			SELECT ca.chamber, SUM(ca.bags_allocated) as bags_allocated
+			FROM `tabChamber Allocation` ca
+			INNER JOIN `tabInward Aawak` a ON a.name = ca.parent
+			WHERE ca.parenttype = 'Inward Aawak'
+				AND a.name = %(inward_aawak)s
+				AND a.docstatus < 2
+			GROUP BY ca.chamber
+		) own ON own.chamber = fc.name
+		WHERE 1=1
+			{conditions}
+		ORDER BY fl.godown, fl.floor_number, fc.chamber_code
+		""".format(conditions=" ".join(conditions)),
+		values,
+		as_dict=True,
+	)
+
+
+@frappe.whitelist()
+def plan_chamber_allocation(godown, total_bags, inward_aawak=None):
+	"""
+	Propose chamber allocations for an Aawak's bags in a godown, using current occupancy.
+
+	Uses as few chambers as possible and keeps the lot on one floor when any
+	floor can hold it. The last chamber is the smallest one that fits what is
+	left, so large chambers stay free for large lots.
+
+	Returns:
+		{"allocations": [{floor, chamber, chamber_name, bags_allocated, free_capacity}],
+		"unallocated_bags": bags that did not fit anywhere}
+	"""
+	total_bags = cint(total_bags)
+	chambers = [
+		chamber
+		for chamber in get_chamber_availability(godown=godown, inward_aawak=inward_aawak)
+		if chamber.status == "Available" and chamber.floor_status == "Active" and chamber.free_capacity > 0
+	]
+	if total_bags <= 0 or not chambers:
+		return {"allocations": [], "unallocated_bags": max(total_bags, 0)}
+
+	chambers_by_floor = defaultdict(list)
+	for chamber in chambers:
+		chambers_by_floor[chamber.floor].append(chamber)
+
+	# Fewest chambers first, then the tightest fit, then the lowest floor
+	floor_plans = [
+		plan
+		for plan in (fill_chambers(floor_chambers, total_bags) for floor_chambers in chambers_by_floor.values())
+		if plan
+	]
+	if floor_plans:
+		plan = min(
+			floor_plans,
+			key=lambda plan: (
+				len(plan),
+				sum(chamber.free_capacity for chamber, bags in plan),
+				cint(plan[0][0].floor_number),
+			),
+		)
+	else:
+		plan = fill_chambers(chambers, total_bags, partial=True)
+
+	allocations = [
+		{
+			"floor": chamber.floor,
+			"chamber": chamber.chamber,
+			"chamber_name": chamber.chamber_name,
+			"bags_allocated": bags,
+			"free_capacity": chamber.free_capacity,
+		}
+		for chamber, bags in plan
+	]
+	return {
+		"allocations": allocations,
+		"unallocated_bags": total_bags - sum(row["bags_allocated"] for row in allocations),
+	}
+
+
+def fill_chambers(chambers, bags, partial=False):
+	"""
+	[(chamber, bags)] holding the bags in the fewest chambers, or None when they
+	do not fit (with partial=True, as many bags as fit).
+	"""
+	chambers = sorted(chambers, key=lambda chamber: chamber.free_capacity, reverse=True)
+	if not partial and sum(chamber.free_capacity for chamber in chambers) < bags:
+		return None
+
+	plan = []
+	remaining = bags
+	while remaining > 0 and chambers:
+		# Largest chambers first, until the smallest chamber that can take the rest
+		fitting = [chamber for chamber in chambers if chamber.free_capacity >= remaining]
+		chamber = fitting[-1] if fitting else chambers[0]
+		chambers.remove(chamber)
+
+		allocated = min(remaining, chamber.free_capacity)
+		plan.append((chamber, allocated))
+		remaining -= allocated
+
+	return plan
+
+
+def rebuild_chamber_occupancy():
+	"""
+	Rebuild Chamber Occupancy from existing Inward Aawak allocations and Outward Jawak releases.
+
+	bench --site [sitename] execute kisan_warehouse.warehouse_rent.occupancy.rebuild_chamber_occupancy
+	"""
+	frappe.db.sql("DELETE FROM `tabChamber Occupancy`")
+	frappe.db.sql(
+		"""
+		INSERT INTO `tabChamber Occupancy`
+			(name, creation, modified, owner, modified_by, docstatus,
+			chamber, allocated_bags, released_bags, occupied_bags)
+		SELECT
+			mv.chamber, NOW(), NOW(), 'Administrator', 'Administrator', 0,
+			mv.chamber, SUM(mv.allocated_bags), SUM(mv.released_bags),
+			SUM(mv.allocated_bags) - SUM(mv.released_bags)
+		FROM (
+			SELECT ca.chamber, COALESCE(ca.bags_allocated, 0) as allocated_bags, 0 as released_bags
+			FROM `tabChamber Allocation` ca
+			INNER JOIN `tabInward Aawak` a ON a.name = ca.parent
+			WHERE ca.parenttype = 'Inward Aawak'
+				AND a.docstatus < 2
+				AND IFNULL(ca.chamber, '') != ''
+			UNION ALL
+			SELECT j.chamber, 0 as allocated_bags, COALESCE(jbd.release_bags, 0) as released_bags
+			FROM `tabOutward Jawak` j
+			INNER JOIN `tabJawak Bag Detail` jbd ON jbd.parent = j.name AND jbd.parenttype = 'Outward Jawak'
+			WHERE j.docstatus < 2
+				AND IFNULL(j.chamber, '') != ''
+		) mv
+		GROUP BY mv.chamber
+		"""
+	)
+
+	frappe.db.commit()
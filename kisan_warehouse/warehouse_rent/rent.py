@@ -0,0 +1,192 @@
+"""
+Warehouse rent engine.
+
+Rent on a bag row is charged per bag at `rate` per month of `days_per_month`
+days, for the chargeable days between the Aawak date and the release (or
+as-of) date: at least `minimum_chargeable_days`, and `extra_days_after_minimum`
+on top once the stay is longer than that.
+
+The same rule is used for one Outward Jawak and, as a single SQL statement,
+for every open Inward Aawak lot at once.
+"""
+
+import frappe
+from frappe.utils import cint, date_diff, flt, getdate, nowdate
+
+from kisan_warehouse.utils.rent_settings import get_rent_settings
+from kisan_warehouse.warehouse_rent.bag_balance import get_lot_aawak
+
+
+def get_chargeable_days(actual_days, settings=None):
+	settings = settings or get_rent_settings()
+	if actual_days <= settings.minimum_chargeable_days:
+		return settings.minimum_chargeable_days
+	return actual_days + settings.extra_days_after_minimum
+
+
+def calculate_rent(bags, rate, chargeable_days, settings=None):
+	settings = settings or get_rent_settings()
+	return flt(cint(bags) * flt(rate) / settings.days_per_month * chargeable_days, 2)
+
+
+def apply_jawak_rent(jawak):
+	"""Recompute days and rent of every Jawak Bag Detail row and the Jawak totals."""
+	aawak_date = get_aawak_date(jawak.firm, jawak.inward_lot_no, jawak.inward_lot_year)
+	if not (aawak_date and jawak.jawak_date):
+		return
+
+	settings = get_rent_settings()
+	chargeable_days = get_chargeable_days(date_diff(getdate(jawak.jawak_date), aawak_date), settings)
+
+	for row in jawak.jawak_bag_details:
+		row.total_days = chargeable_days
+		if cint(row.release_bags) and flt(row.rate):
+			row.total_amount = calculate_rent(row.release_bags, row.rate, chargeable_days, settings)
+
+	jawak.total_amount = flt(sum(flt(row.total_amount) for row in jawak.jawak_bag_details), 2)
+	jawak.net_amount = flt(
+		jawak.total_amount
+		+ flt(jawak.additional_charges)
+		+ flt(jawak.inward_charges)
+		- flt(jawak.discount),
+		2,
+	)
+
+
+def get_aawak_date(firm, lot_number, lot_year=None):
+	aawak = get_lot_aawak(firm, lot_number, lot_year, fields=["aawak_date"])
+	return getdate(aawak.aawak_date) if aawak and aawak.aawak_date else None
+
+
+def get_accrual_query(conditions=""):
+	"""
+	One row per open (Aawak, bag weight, rate) with outstanding bags, chargeable
+	days and accrued rent as of %(as_of_date)s.
+
+	Released bags are the Jawak Bag Detail rows released against the lot
+	(firm + lot number + lot year) up to the as-of date.
+	"""
+	return """
+		SELECT
+			lots.*,
+			IF(lots.actual_days <= %(minimum_chargeable_days)s,
+				%(minimum_chargeable_days)s,
+				lots.actual_days + %(extra_days_after_minimum)s) as chargeable_days,
+			ROUND(lots.outstanding_bags * lots.rate / %(days_per_month)s
+				* IF(lots.actual_days <= %(minimum_chargeable_days)s,
+					%(minimum_chargeable_days)s,
+					lots.actual_days + %(extra_days_after_minimum)s), 2) as accrued_rent
+		FROM (
+			SELECT
+				a.name as inward_aawak,
+				a.firm,
+				a.lot_number,
+				a.storage_customer,
+				DATE(a.aawak_date) as aawak_date,
+				bd.bag_weight,
+				bd.rate,
+				bd.number_of_bags as total_bags,
+				COALESCE(rel.released_bags, 0) as released_bags,
+				GREATEST(bd.number_of_bags - COALESCE(rel.released_bags, 0), 0) as outstanding_bags,
+				DATEDIFF(%(as_of_date)s, DATE(a.aawak_date)) as actual_days
+			FROM `tabInward Aawak` a
+			INNER JOIN (
+				SELECT parent, bag_weight, COALESCE(rate, 0) as rate, SUM(number_of_bags) as number_of_bags
+				FROM `tabBag Details`
+				WHERE parenttype = 'Inward Aawak'
+				GROUP BY parent, bag_weight, COALESCE(rate, 0)
+			) bd ON bd.parent = a.name
+			LEFT JOIN (
+				SELECT j.firm, j.inward_lot_no, j.inward_lot_year, jbd.bag_type, COALESCE(jbd.rate, 0) as rate,
+					SUM(jbd.release_bags) as released_bags
+				FROM `tabOutward Jawak` j
+				INNER JOIN `tabJawak Bag Detail` jbd
+					ON jbd.parent = j.name AND jbd.parenttype = 'Outward Jawak'
+				WHERE j.docstatus < 2
+					AND j.jawak_date < DATE_ADD(%(as_of_date)s, INTERVAL 1 DAY)
+				GROUP BY j.firm, j.inward_lot_no, j.inward_lot_year, jbd.bag_type, COALESCE(jbd.rate, 0)
+			) rel ON rel.firm = a.firm
+				AND rel.inward_lot_no = a.lot_number
+				AND rel.inward_lot_year = a.lot_year
+				AND rel.bag_type = bd.bag_weight
+				AND rel.rate = bd.rate
+			WHERE a.docstatus < 2
+				AND IFNULL(a.status, '') != 'Completed'
+				AND a.aawak_date < DATE_ADD(%(as_of_date)s, INTERVAL 1 DAY)
+				{conditions}
+		) lots
+		WHERE lots.outstanding_bags > 0
+	""".format(conditions=conditions)
+
+
+def get_accrued_rent(as_of_date=None, firm=None, storage_customer=None, inward_aawak=None):
+	"""
+	Accrued rent of every open lot as of a date, one row per (Aawak, bag weight, rate).
+
+	Args:
+		as_of_date: defaults to today
+		firm, storage_customer, inward_aawak: optional filters
+	"""
+	values = get_accrual_values(as_of_date)
+	conditions = []
+	for fieldname, value in (
+		("firm", firm),
+		("storage_customer", storage_customer),
+		("name", inward_aawak),
+	):
+		if value:
+			conditions.append(f"AND a.{fieldname} = %({fieldname})s")
+			values[fieldname] = value
+
+	return frappe.db.sql(get_accrual_query(" ".join(conditions)), values, as_dict=True)
+
+
+def get_accrual_values(as_of_date=None):
+	settings = get_rent_settings()
+	return {
+		"as_of_date": getdate(as_of_date or nowdate()),
+		"days_per_month": settings.days_per_month,
+		"minimum_chargeable_days": settings.minimum_chargeable_days,
+		"extra_days_after_minimum": settings.extra_days_after_minimum,
+	}
+
+
+@frappe.whitelist()
+def get_lot_rent(inward_aawak, as_of_date=None):
+	"""Outstanding bags and accrued rent of one Inward Aawak lot, per bag row and in total."""
+	frappe.has_permission("Inward Aawak", "read", inward_aawak, throw=True)
+
+	rows = get_accrued_rent(as_of_date, inward_aawak=inward_aawak)
+	return {
+		"rows": rows,
+		"outstanding_bags": sum(cint(row.outstanding_bags) for row in rows),
+		"accrued_rent": flt(sum(flt(row.accrued_rent) for row in rows), 2),
+	}
+
+
+def run_rent_accrual(as_of_date=None):
+	"""
+	Rewrite Rent Accrual with one row per open lot as of the given date (default today).
+	Runs nightly from scheduler_events; can also be run by hand:
+	bench --site [sitename] execute kisan_warehouse.warehouse_rent.rent.run_rent_accrual
+	"""
+	values = get_accrual_values(as_of_date)
+
+	frappe.db.sql("DELETE FROM `tabRent Accrual`")
+	frappe.db.sql(
+		"""
+		INSERT INTO `tabRent Accrual`
+			(name, creation, modified, owner, modified_by, docstatus,
+			inward_aawak, firm, lot_number, storage_customer, aawak_date, as_of_date,
+			chargeable_days, outstanding_bags, accrued_rent)
+		SELECT
+			acc.inward_aawak, NOW(), NOW(), 'Administrator', 'Administrator', 0,
+			acc.inward_aawak, acc.firm, acc.lot_number, acc.storage_customer, acc.aawak_date, %(as_of_date)s,
+			MAX(acc.chargeable_days), SUM(acc.outstanding_bags), SUM(acc.accrued_rent)
+		FROM ({accrual_query}) acc
+		GROUP BY acc.inward_aawak, acc.firm, acc.lot_number, acc.storage_customer, acc.aawak_date
+		""".format(accrual_query=get_accrual_query()),
+		values,
+	)
+
+	frappe.db.commit()
@@ -0,0 +1,244 @@
+"""
+Firm-wise sequences for Inward Aawak and Outward Jawak lot numbers.
+
+Each (prefix, firm, year) has its own Firm Sequence row, advanced with a single
+INSERT ... ON DUPLICATE KEY UPDATE statement instead of the SELECT ... FOR UPDATE
+and UPDATE pair on tabSeries. Names are built from the returned number, never
+parsed back out of a series string.
+
+Numbers are reserved on a connection of their own that commits straight away,
+so the row is locked for that one statement only and not for the rest of the
+document's save. A number taken by a save that is then rolled back is not
+reused, so lot numbers may have gaps.
+
+With `kisan_sequence_block_size` set in site config, each worker reserves that
+many numbers at once and hands them out without touching the row until the
+block is used up. Numbers left in a worker's block when it restarts are skipped.
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import cint, getdate, nowdate
+
+# (site, prefix, firm, year) -> [next value, last value] reserved by this worker
+reserved_blocks = {}
+
+
+def get_next_sequence(prefix, firm, year=None):
+	"""
+	Next number of the (prefix, firm, year) sequence.
+
+	Returns:
+		frappe._dict(prefix, firm, firm_code, year, sequence, lot_number, name)
+		e.g. name AAWAK-0001-2025-0001 and lot_number 0001
+	"""
+	year = cint(year) or getdate(nowdate()).year
+	key = (frappe.local.site, prefix, firm, year)
+
+	block = reserved_blocks.get(key)
+	if not block or block[0] > block[1]:
+		block_size = max(cint(frappe.conf.get("kisan_sequence_block_size")), 1)
+		last_value = reserve_block(prefix, firm, year, block_size)
+		block = reserved_blocks[key] = [last_value - block_size + 1, last_value]
+
+	sequence = block[0]
+	block[0] += 1
+
+	firm_code = get_firm_code(firm)
+	lot_number = f"{sequence:04d}"
+	return frappe._dict(
+		prefix=prefix,
+		firm=firm,
+		firm_code=firm_code,
+		year=year,
+		sequence=sequence,
+		lot_number=lot_number,
+		name=f"{prefix}-{firm_code}-{year}-{lot_number}",
+	)
+
+
+def reserve_block(prefix, firm, year, block_size=1):
+	"""
+	Advance the sequence by block_size in one statement and return its new value,
+	committed on a separate connection, outside the caller's transaction.
+	"""
+	db = get_sequence_db()
+	try:
+		db.sql(
+			"""
+			INSERT INTO `tabFirm Sequence`
+				(name, creation, modified, owner, modified_by, docstatus,
+				prefix, firm, year, current_value)
+			VALUES
+				(%(name)s, NOW(), NOW(), %(user)s, %(user)s, 0,
+				%(prefix)s, %(firm)s, %(year)s, LAST_INSERT_ID(%(block_size)s))
+			ON DUPLICATE KEY UPDATE
+				current_value = LAST_INSERT_ID(current_value + %(block_size)s),
+				modified = VALUES(modified), modified_by = VALUES(modified_by)
+			""",
+			{
+				"name": get_sequence_key(prefix, firm, year),
+				"prefix": prefix,
+				"firm": firm,
+				"year": year,
+				"block_size": block_size,
+				"user": frappe.session.user,
+			},
+		)
+		last_value = cint(db.sql("SELECT LAST_INSERT_ID()")[0][0])
+		db.commit()
+	finally:
+		db.close()
+
+	return last_value
+
+
+def get_sequence_db():
+	"""A new connection to the site's database, set up as frappe.connect does."""
+	from frappe.database import get_db
+
+	conf = frappe.local.conf
+	db = get_db(
+		socket=conf.db_socket,
+		host=conf.db_host,
+		port=conf.db_port,
+		user=conf.db_user or conf.db_name,
+		password=None,
+		cur_db_name=conf.db_name,
+	)
+	db.connect()
+	return db
+
+
+def get_sequence_key(prefix, firm, year):
+	return f"{prefix}|{firm}|{year}"
+
+
+def get_firm_code(firm):
+	"""Numeric part of the firm's name (FIRM-0001 -> 0001)."""
+	firm_code = firm.rsplit("-", 1)[-1]
+	return firm_code if firm_code.isdigit() else firm_code[:4].zfill(4)
+
+
+def add_lot_unique_index(doctype, throw=False):
+	"""
+	Unique (firm, lot_number, lot_year) index, added once no existing rows
+	would break it (after rebuild_lot_years has filled in lot_year).
+
+	DocTypes that can be amended also key on lot_amendment, as an amendment
+	keeps the lot of the cancelled document it replaces.
+
+	While duplicates are left the index cannot be added: the colliding lots are
+	written to the Error Log, or thrown with throw.
+	"""
+	fields = ["firm", "lot_number", "lot_year"]
+	constraint_name = "unique_firm_lot_year"
+	if frappe.get_meta(doctype).has_field("lot_amendment"):
+		fields.append("lot_amendment")
+		constraint_name = "unique_firm_lot_year_amendment"
+
+	if frappe.db.has_index(f"tab{doctype}", constraint_name):
+		return
+
+	duplicates = frappe.db.sql(
+		"""
+		SELECT {fields}, GROUP_CONCAT(name ORDER BY name SEPARATOR ', ') as names
+		FROM `tab{doctype}`
+		GROUP BY {fields}
+		HAVING COUNT(*) > 1
+		LIMIT 50
+		""".format(doctype=doctype, fields=", ".join(fields)),
+		as_dict=True,
+	)
+	if duplicates:
+		message = "<br>".join(
+			[_("{0} lot numbers used more than once, so the unique lot index was not added:").format(doctype)]
+			+ [
+				_("Firm {0}, lot {1} of {2}: {3}").format(row.firm, row.lot_number, row.lot_year, row.names)
+				for row in duplicates
+			]
+		)
+		if throw:
+			frappe.throw(message, title=_("Duplicate Lot Numbers"))
+		frappe.log_error(title=_("Duplicate Lot Numbers: {0}").format(doctype), message=message)
+		return
+
+	# The index without lot_amendment would reject every amendment
+	if constraint_name != "unique_firm_lot_year" and frappe.db.has_index(f"tab{doctype}", "unique_firm_lot_year"):
+		frappe.db.sql_ddl(f"ALTER TABLE `tab{doctype}` DROP INDEX `unique_firm_lot_year`")
+
+	frappe.db.add_unique(doctype, fields, constraint_name=constraint_name)
+
+
+def rebuild_lot_years(doctype, prefix):
+	"""
+	Fill in lot_year of existing documents from their names and move the
+	firm-wise tabSeries counters into Firm Sequence.
+
+	bench --site [sitename] execute kisan_warehouse.warehouse_rent.sequence.rebuild_lot_years --args "['Inward Aawak', 'AAWAK']"
+	"""
+	# Names are PREFIX-<firm code>-YYYY-####, with -N appended for amendments;
+	# anything else falls back to the creation year
+	lot_name = "name"
+	if frappe.get_meta(doctype).has_field("lot_amendment"):
+		frappe.db.sql(
+			"""
+			UPDATE `tab{doctype}`
+			SET lot_amendment = CAST(SUBSTRING_INDEX(name, '-', -1) AS UNSIGNED)
+			WHERE IFNULL(amended_from, '') != '' AND IFNULL(lot_amendment, 0) = 0
+			""".format(doctype=doctype)
+		)
+		lot_name = "IF(lot_amendment > 0, SUBSTRING(name, 1, LENGTH(name) - LENGTH(SUBSTRING_INDEX(name, '-', -1)) - 1), name)"
+
+	frappe.db.sql(
+		"""
+		UPDATE `tab{doctype}`
+		SET lot_year = IF({lot_name} REGEXP '-[0-9]{{4}}-[0-9]+$',
+			SUBSTRING_INDEX(SUBSTRING_INDEX({lot_name}, '-', -2), '-', 1),
+			YEAR(creation))
+		WHERE IFNULL(lot_year, 0) = 0
+		""".format(doctype=doctype, lot_name=lot_name)
+	)
+
+	counters = frappe.db.sql(
+		"""
+		SELECT firm, lot_year, MAX(CAST(lot_number AS UNSIGNED))
+		FROM `tab{doctype}`
+		WHERE IFNULL(firm, '') != ''
+		GROUP BY firm, lot_year
+		""".format(doctype=doctype)
+	)
+
+	# Old series keys are PREFIX-<firm>-YYYY- and may be ahead of the documents (deletions)
+	for series, current in frappe.db.sql(
+		"SELECT name, `current` FROM `tabSeries` WHERE name LIKE %s", f"{prefix}-%-%-"
+	):
+		firm, _sep, year = series[len(prefix) + 1 : -1].rpartition("-")
+		if firm and year.isdigit():
+			counters += ((firm, cint(year), cint(current)),)
+
+	for firm, year, current in counters:
+		frappe.db.sql(
+			"""
+			INSERT INTO `tabFirm Sequence`
+				(name, creation, modified, owner, modified_by, docstatus,
+				prefix, firm, year, current_value)
+			VALUES
+				(%(name)s, NOW(), NOW(), 'Administrator', 'Administrator', 0,
+				%(prefix)s, %(firm)s, %(year)s, %(current)s)
+			ON DUPLICATE KEY UPDATE
+				current_value = GREATEST(current_value, VALUES(current_value))
+			""",
+			{
+				"name": get_sequence_key(prefix, firm, year),
+				"prefix": prefix,
+				"firm": firm,
+				"year": year,
+				"current": cint(current),
+			},
+		)
+
+	frappe.db.commit()
+
+	# Fails the patch with the colliding lots, which have to be renumbered by hand
+	add_lot_unique_index(doctype, throw=True)
@@ -0,0 +1,80 @@
+# Copyright (c) 2026, Kisan Warehouse and contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from kisan_warehouse.warehouse_rent import bag_balance
+
+FIRM = "_Test Bag Balance Firm"
+
+
+def make_aawak(name, lot_year=2025, bags=10, docstatus=1):
+	return frappe._dict(
+		name=name,
+		firm=FIRM,
+		lot_number="0001",
+		lot_year=lot_year,
+		docstatus=docstatus,
+		bag_details=[frappe._dict(bag_weight=50, number_of_bags=bags)],
+		get_doc_before_save=lambda: None,
+	)
+
+
+def make_jawak(release_bags, lot_year=2025):
+	return frappe._dict(
+		firm=FIRM,
+		inward_lot_no="0001",
+		inward_lot_year=lot_year,
+		jawak_bag_details=[frappe._dict(bag_type="50", release_bags=release_bags)],
+		get_doc_before_save=lambda: None,
+	)
+
+
+def release(jawak):
+	bag_balance.validate_release(jawak)
+	bag_balance.on_jawak_update(jawak)
+
+
+class TestBagBalance(FrappeTestCase):
+	def setUp(self):
+		frappe.db.delete("Lot Bag Balance", {"firm": FIRM})
+
+	def get_remaining(self, lot_year=2025):
+		return bag_balance.get_remaining_bags(FIRM, "0001", lot_year).get("50")
+
+	def test_amendment_keeps_released_bags(self):
+		original = make_aawak("AAWAK-TEST-2025-0001")
+		bag_balance.on_aawak_update(original)
+		release(make_jawak(4))
+		self.assertEqual(self.get_remaining(), 6)
+
+		# Cancelling takes the received bags off; the release stays on the lot
+		bag_balance.on_aawak_cancel(original)
+		self.assertEqual(self.get_remaining(), -4)
+
+		amendment = make_aawak("AAWAK-TEST-2025-0001-1")
+		bag_balance.on_aawak_update(amendment)
+		self.assertEqual(self.get_remaining(), 6)
+		self.assertEqual(
+			frappe.db.get_value("Lot Bag Balance", {"firm": FIRM, "lot_year": 2025}, "inward_aawak"),
+			amendment.name,
+		)
+
+		self.assertRaises(frappe.ValidationError, release, make_jawak(7))
+		release(make_jawak(6))
+		self.assertEqual(self.get_remaining(), 0)
+
+	def test_lots_of_different_years_are_kept_apart(self):
+		bag_balance.on_aawak_update(make_aawak("AAWAK-TEST-2025-0001", lot_year=2025, bags=10))
+		bag_balance.on_aawak_update(make_aawak("AAWAK-TEST-2026-0001", lot_year=2026, bags=3))
+
+		release(make_jawak(5, lot_year=2025))
+		self.assertEqual(self.get_remaining(2025), 5)
+		self.assertEqual(self.get_remaining(2026), 3)
+
+		self.assertRaises(frappe.ValidationError, release, make_jawak(4, lot_year=2026))
+
+		# Without a lot year nothing is posted
+		release(make_jawak(5, lot_year=0))
+		self.assertEqual(self.get_remaining(2025), 5)
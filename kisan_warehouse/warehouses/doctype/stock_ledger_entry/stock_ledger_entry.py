@@ -0,0 +1,21 @@
+# Copyright (c) 2026, Kisan Warehouse and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class StockLedgerEntry(Document):
+	"""
+	Daily stock movement per (warehouse, product, posting date).
+
+	Rows are maintained by kisan_warehouse.utils.stock_ledger from Inward and
+	Outward document events and are never edited by hand.
+	"""
+
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Stock Ledger Entry", ["warehouse", "product", "posting_date"])
+	frappe.db.add_index("Stock Ledger Entry", ["product", "posting_date"])
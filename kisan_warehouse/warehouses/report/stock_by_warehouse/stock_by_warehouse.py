@@ -5,6 +5,10 @@ import frappe
 from frappe import _
 from frappe.utils import getdate, today, formatdate, flt, add_days
 
+from kisan_warehouse.utils.report_cache import cache_report
+from kisan_warehouse.utils.report_filters import get_date_range, get_range_condition
+
+@cache_report("Stock by Warehouse")
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
@@ -53,54 +57,35 @@ def get_data(filters):
     
     # Build WHERE conditions based on filters
     conditions = get_conditions(filters)
+    inward_condition = get_date_condition(filters) or "1 = 1"
     
-    # Main SQL query - Net stock = Inward - Outward per warehouse
+    # Main SQL query - Net stock = Inward - Outward per warehouse, read from the
+    # Stock Ledger (one row per warehouse/product/day) instead of every item row.
+    # The date filter applies to the inward side only.
     query = """
         SELECT 
             w.name as warehouse_name,
             w.warehouse_name as warehouse_display_name,
-            (COALESCE(inward_data.total_bags, 0) - COALESCE(outward_data.total_bags, 0)) as total_bags,
-            (COALESCE(inward_data.stock_kg, 0) - COALESCE(outward_data.stock_kg, 0)) as stock_kg,
-            (COALESCE(inward_data.total_value, 0) - COALESCE(outward_data.total_value, 0)) as total_value,
-            inward_data.products_list as inward_products,
-            outward_data.products_list as outward_products
-        FROM `tabWarehouse` w
-        LEFT JOIN (
-            SELECT 
-                i.warehouse,
-                SUM(iid.item_bags) as total_bags,
-                SUM(iid.item_arrival_weight) as stock_kg,
-                SUM(iid.item_amount) as total_value,
-                GROUP_CONCAT(DISTINCT i.product) as products_list
-            FROM `tabInward Item Detail` iid
-            INNER JOIN `tabInward` i ON iid.parent = i.name
-            WHERE i.docstatus < 2 {conditions}
-            GROUP BY i.warehouse
-        ) as inward_data ON w.name = inward_data.warehouse
-        LEFT JOIN (
-            SELECT 
-                o.warehouse,
-                SUM(oid.item_bags) as total_bags,
-                SUM(oid.item_gross_weight) as stock_kg,
-                SUM(oid.item_amount) as total_value,
-                GROUP_CONCAT(DISTINCT o.product) as products_list
-            FROM `tabOutward Item Detail` oid
-            INNER JOIN `tabOutward` o ON oid.parent = o.name
-            WHERE o.docstatus < 2
-            GROUP BY o.warehouse
-        ) as outward_data ON w.name = outward_data.warehouse
-        WHERE (inward_data.warehouse IS NOT NULL OR outward_data.warehouse IS NOT NULL)
-        {warehouse_filter}
+            (SUM(CASE WHEN {inward_condition} THEN sle.in_bags ELSE 0 END) - SUM(sle.out_bags)) as total_bags,
+            (SUM(CASE WHEN {inward_condition} THEN sle.in_qty ELSE 0 END) - SUM(sle.out_qty)) as stock_kg,
+            (SUM(CASE WHEN {inward_condition} THEN sle.in_value ELSE 0 END) - SUM(sle.out_value)) as total_value
+        FROM `tabStock Ledger Entry` sle
+        INNER JOIN `tabWarehouse` w ON w.name = sle.warehouse
+        WHERE 1 = 1 {conditions}
+        GROUP BY w.name, w.warehouse_name
         HAVING stock_kg > 0
         ORDER BY stock_kg DESC
     """.format(
         conditions=conditions,
-        warehouse_filter="AND w.name = %(warehouse)s" if filters.get("warehouse") else ""
+        inward_condition=inward_condition
     )
     
     # Execute query
     data = frappe.db.sql(query, filters, as_dict=1)
     
+    # Active product count for every warehouse in one grouped pass
+    active_products = get_active_product_counts(conditions, inward_condition, filters)
+    
     # Process calculations and formatting
     for row in data:
         # Calculate tons from KG
@@ -109,12 +94,8 @@ def get_data(filters):
         else:
             row.stock_tons = 0.0
         
-        # Calculate total unique products with remaining stock
-        row.total_products = calculate_active_products(
-            row.get('inward_products'),
-            row.get('outward_products'),
-            row.warehouse_name
-        )
+        # Total unique products with remaining stock
+        row.total_products = active_products.get(row.warehouse_name, 0)
         
         # Handle null values
         if not row.total_bags:
@@ -134,49 +115,43 @@ def get_data(filters):
     
     return data
 
-def calculate_active_products(inward_products_str, outward_products_str, warehouse):
+def get_active_product_counts(conditions, inward_condition, filters):
     """
-    Calculate number of products with remaining stock > 0
-    by checking product-level stock for each product
-    """
-    if not inward_products_str:
-        return 0
-    
-    inward_products = set(inward_products_str.split(',')) if inward_products_str else set()
-    outward_products = set(outward_products_str.split(',')) if outward_products_str else set()
+    Count products with remaining stock > 0 for every warehouse at once.
     
-    # Get all unique products
-    all_products = inward_products.union(outward_products)
-    
-    active_product_count = 0
-    
-    for product in all_products:
-        # Get inward stock for this product in this warehouse
-        inward_stock = frappe.db.sql("""
-            SELECT COALESCE(SUM(iid.item_arrival_weight), 0) as stock
-            FROM `tabInward Item Detail` iid
-            INNER JOIN `tabInward` i ON iid.parent = i.name
-            WHERE i.warehouse = %s AND i.product = %s AND i.docstatus < 2
-        """, (warehouse, product), as_dict=1)
-        
-        # Get outward stock for this product in this warehouse
-        outward_stock = frappe.db.sql("""
-            SELECT COALESCE(SUM(oid.item_gross_weight), 0) as stock
-            FROM `tabOutward Item Detail` oid
-            INNER JOIN `tabOutward` o ON oid.parent = o.name
-            WHERE o.warehouse = %s AND o.product = %s AND o.docstatus < 2
-        """, (warehouse, product), as_dict=1)
-        
-        inward_qty = inward_stock[0].stock if inward_stock else 0
-        outward_qty = outward_stock[0].stock if outward_stock else 0
-        
-        net_stock = flt(inward_qty) - flt(outward_qty)
-        
-        # Only count if product has remaining stock
-        if net_stock > 0:
-            active_product_count += 1
+    Net stock is computed per (warehouse, product) over all dates. A product is
+    counted when it had inward in the selected period or any outward, and a
+    warehouse only gets a count when it had some inward in the period.
+    """
+    rows = frappe.db.sql("""
+        SELECT
+            stock.warehouse,
+            COUNT(*) as active_products
+        FROM (
+            SELECT
+                sle.warehouse,
+                sle.product,
+                SUM(sle.in_qty) - SUM(sle.out_qty) as net_stock,
+                SUM(CASE WHEN sle.inward_count > 0 AND {inward_condition} THEN 1 ELSE 0 END) as inward_days,
+                SUM(CASE WHEN sle.outward_count > 0 THEN 1 ELSE 0 END) as outward_days
+            FROM `tabStock Ledger Entry` sle
+            WHERE 1 = 1 {conditions}
+            GROUP BY sle.warehouse, sle.product
+        ) stock
+        WHERE stock.net_stock > 0
+            AND (stock.inward_days > 0 OR stock.outward_days > 0)
+            AND stock.warehouse IN (
+                SELECT sle.warehouse
+                FROM `tabStock Ledger Entry` sle
+                WHERE sle.inward_count > 0 AND {inward_condition} {conditions}
+            )
+        GROUP BY stock.warehouse
+    """.format(
+        conditions=conditions,
+        inward_condition=inward_condition
+    ), filters, as_dict=1)
     
-    return active_product_count
+    return {row.warehouse: row.active_products for row in rows}
 
 def get_conditions(filters):
     """Build SQL WHERE conditions based on filters"""
@@ -184,64 +159,11 @@ def get_conditions(filters):
     
     # Warehouse filter
     if filters.get("warehouse"):
-        conditions.append("i.warehouse = %(warehouse)s")
-    
-    # Date filtering logic (applies to inward only)
-    date_condition = get_date_condition(filters)
-    if date_condition:
-        conditions.append(date_condition)
+        conditions.append("sle.warehouse = %(warehouse)s")
     
     return " AND " + " AND ".join(conditions) if conditions else ""
 
 def get_date_condition(filters):
-    """Build date condition based on Filter By selection"""
-    
-    filter_by = filters.get("filter_by")
-    
-    if not filter_by or filter_by == "All":
-        return ""
-    
-    from frappe.utils import today, add_days, getdate
-    
-    today_date = getdate(today())  # Convert string to date object
-    
-    if filter_by == "Today":
-        return f"DATE(i.arrival_date) = '{today()}'"
-    
-    elif filter_by == "Yesterday":
-        yesterday = add_days(today(), -1)
-        return f"DATE(i.arrival_date) = '{yesterday}'"
-    
-    elif filter_by == "Last 7 Days":
-        week_ago = add_days(today(), -7)
-        return f"DATE(i.arrival_date) BETWEEN '{week_ago}' AND '{today()}'"
-    
-    elif filter_by == "Current Month":
-        # First day of current month
-        import datetime
-        today_date_obj = getdate(today())
-        first_day = today_date_obj.replace(day=1)
-        return f"DATE(i.arrival_date) BETWEEN '{first_day}' AND '{today()}'"
-    
-    elif filter_by == "Last Month":
-        # First and last day of previous month
-        import datetime
-        today_date_obj = getdate(today())
-        first_day_current = today_date_obj.replace(day=1)
-        last_day_last_month = first_day_current - datetime.timedelta(days=1)
-        first_day_last_month = last_day_last_month.replace(day=1)
-        return f"DATE(i.arrival_date) BETWEEN '{first_day_last_month}' AND '{last_day_last_month}'"
-    
-    elif filter_by == "Custom":
-        # Use custom date range
-        date_from = filters.get("date_from")
-        date_to = filters.get("date_to")
-        
-        if date_from and date_to:
-            return f"DATE(i.arrival_date) BETWEEN '{date_from}' AND '{date_to}'"
-        elif date_from:
-            return f"DATE(i.arrival_date) >= '{date_from}'"
-        elif date_to:
-            return f"DATE(i.arrival_date) <= '{date_to}'"
-    
-    return ""
\ No newline at end of file
+    """Date condition for the Filter By selection, its dates added to filters as query values"""
+    start, end = get_date_range(filters.get("filter_by"), filters.get("date_from"), filters.get("date_to"))
+    return get_range_condition("sle.posting_date", start, end, filters)